@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
+from decimal import Decimal
 import os
 from dotenv import load_dotenv
 
@@ -122,10 +123,68 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts so concurrent postings queue up
+            # (waiting up to `timeout` seconds) instead of failing with "database is locked".
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # File-backed test database so the concurrency tests can open one connection per thread
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# How long a stored Idempotency-Key response is replayed for retried transaction requests
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+# Queue every create-transaction request for run_posting_worker and answer 202, instead of only
+# the requests that send `Prefer: respond-async`
+ASYNC_POSTING = False
+
+# Seconds an exchange rate table read stays cached in each process. Rate changes made in this
+# process are picked up at once; other processes see them when their copy expires.
+EXCHANGE_RATE_CACHE_TTL = 300
+
+# Spend limits per tier, checked before every debit and transfer (see transactions_management/limits.py).
+# `daily_amount` caps the money sent over a rolling 24 hours, in the wallet's own currency;
+# `hourly_count` caps the outgoing postings made in the current hour. Customers and merchants
+# who have not completed KYC are in the "unverified" tier.
+SPEND_LIMITS = {
+    "unverified": {"daily_amount": {"NGN": Decimal("300000"), "USD": Decimal("200"), "EUR": Decimal("200")}, "hourly_count": 30},
+    "customer": {"daily_amount": {"NGN": Decimal("5000000"), "USD": Decimal("3500"), "EUR": Decimal("3200")}, "hourly_count": 120},
+    "merchant": {"daily_amount": {"NGN": Decimal("100000000"), "USD": Decimal("70000"), "EUR": Decimal("65000")}, "hourly_count": 20000},
+}
+
+# Balance slots (see set_balance_slots) spread a busy wallet's credits over several rows. They
+# showed no throughput gain on SQLite, where every write transaction takes the same database lock,
+# so they stay off unless the database can actually run the credits concurrently. While off,
+# wallets can't be given slots and credits go to the wallet row; money already sitting in slots
+# is still counted and swept back as usual.
+BALANCE_SHARDING = False
+
+# Wallet account numbers are NUBAN-style: a 9-digit serial plus a check digit computed over this
+# institution code (see wallet_management/accounts.py). Each process reserves serials in blocks of
+# ACCOUNT_NUMBER_BLOCK_SIZE (one at a time for wallets created inside a transaction).
+ACCOUNT_NUMBER_INSTITUTION_CODE = "090"
+ACCOUNT_NUMBER_BLOCK_SIZE = 50
+
+# Transfer receivers are resolved through a per-process LRU cache of account numbers
+# (wallet_management/resolver.py): at most this many entries, each kept this many seconds.
+ACCOUNT_RESOLVER_CACHE_SIZE = 10000
+ACCOUNT_RESOLVER_CACHE_TTL = 60
+# Account numbers accepted by one batch name-enquiry request (wallet/resolve/)
+ACCOUNT_RESOLVE_BATCH_LIMIT = 500
+
+# Payment holds (authorize now, capture later) expire after PAYMENT_HOLD_TTL unless the request
+# asks for another expiry, which may be at most PAYMENT_HOLD_MAX_TTL away. Run expire_holds to
+# release lapsed holds.
+PAYMENT_HOLD_TTL = timedelta(days=7)
+PAYMENT_HOLD_MAX_TTL = timedelta(days=30)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,88 @@
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDay, TruncHour
+from .models import Transaction, ArchivedTransaction, TransactionRollup
+
+
+# Incrementally maintained hourly rollups so analytics never aggregate the raw Transaction table.
+
+def hour_bucket(moment):
+    # Buckets are whole UTC hours
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def record(records, currency):
+    # Add posted transactions to their hourly buckets. Runs inside the posting's atomic block,
+    # so the rollup and the transactions it counts commit together.
+    totals = defaultdict(lambda: [0, Decimal("0.00")])
+    for posted in records:
+        key = (hour_bucket(posted.transaction_time), posted.transaction_type)
+        totals[key][0] += 1
+        totals[key][1] += posted.amount
+
+    for (bucket, transaction_type), (count, volume) in totals.items():
+        rows = TransactionRollup.objects.filter(bucket=bucket, transaction_type=transaction_type, currency=currency)
+        if rows.update(count=F("count") + count, volume=F("volume") + volume):
+            continue
+        try:
+            # First posting in this bucket; the savepoint lets a concurrent first insert win cleanly
+            with transaction.atomic():
+                TransactionRollup.objects.create(
+                    bucket=bucket, transaction_type=transaction_type, currency=currency, count=count, volume=volume
+                )
+        except IntegrityError:
+            rows.update(count=F("count") + count, volume=F("volume") + volume)
+
+
+def rebuild(start, end):
+    # Recompute the buckets in [start, end) from the raw tables, archived rows included
+    # (backfill / repair). Returns the number of buckets written.
+    totals = defaultdict(lambda: [0, Decimal("0.00")])
+    for model in (ArchivedTransaction, Transaction):
+        buckets = (
+            model.objects.filter(transaction_time__gte=start, transaction_time__lt=end)
+            .annotate(bucket=TruncHour("transaction_time", tzinfo=dt_timezone.utc), currency=Coalesce("sender__currency", "receiver__currency"))
+            .values_list("bucket", "transaction_type", "currency")
+            .annotate(count=Count("id"), volume=Sum("amount"))
+            .order_by()
+        )
+        for bucket, transaction_type, currency, count, volume in buckets:
+            totals[bucket, transaction_type, currency][0] += count
+            totals[bucket, transaction_type, currency][1] += volume
+
+    with transaction.atomic():
+        TransactionRollup.objects.filter(bucket__gte=start, bucket__lt=end).delete()
+        created = TransactionRollup.objects.bulk_create(
+            [
+                TransactionRollup(bucket=bucket, transaction_type=transaction_type, currency=currency, count=count, volume=volume)
+                for (bucket, transaction_type, currency), (count, volume) in totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def summary(start, end, granularity="day", transaction_type=None, currency=None):
+    # Volume, count and average per period, transaction type and currency
+    rollups = TransactionRollup.objects.filter(bucket__gte=start, bucket__lt=end)
+    if transaction_type:
+        rollups = rollups.filter(transaction_type=transaction_type)
+    if currency:
+        rollups = rollups.filter(currency=currency)
+    if granularity == "day":
+        rollups = rollups.annotate(period=TruncDay("bucket"))
+    else:
+        rollups = rollups.annotate(period=F("bucket"))
+
+    rows = (
+        rollups.values("period", "transaction_type", "currency")
+        .annotate(count=Sum("count"), volume=Sum("volume"))
+        .order_by("period", "transaction_type", "currency")
+    )
+    return [
+        dict(row, average=(row["volume"] / row["count"]).quantize(Decimal("0.01")) if row["count"] else Decimal("0.00"))
+        for row in rows
+    ]
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class TransactionsManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'transactions_management'
+
+    def ready(self):
+        # Keeps the exchange rate cache in step with ExchangeRate saves and deletes
+        import transactions_management.fx
+        # Restores the search index triggers after migrations that rebuild the transaction table
+        from transactions_management.search import install_triggers
+        post_migrate.connect(install_triggers, sender=self)
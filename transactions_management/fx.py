@@ -0,0 +1,67 @@
+import threading
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import ExchangeRate
+
+
+# Exchange rates for cross-currency transfers. The whole rate table is small, so each process
+# keeps a copy in memory and a rate lookup on the posting path costs no query until the copy
+# expires (settings.EXCHANGE_RATE_CACHE_TTL) or is invalidated by a rate change.
+
+# Money a transaction adds to its receiver, in the receiver's currency
+RECEIVED_AMOUNT = Coalesce("converted_amount", "amount")
+
+CENTS = Decimal("0.01")
+
+# Same precision as ExchangeRate.rate, so the rate recorded on a transaction is the one applied
+RATE_PLACES = Decimal("0.00000001")
+
+_cache = {"rates": {}, "expires_at": 0.0}
+_lock = threading.Lock()
+
+
+def _rates():
+    if time.monotonic() < _cache["expires_at"]:
+        return _cache["rates"]
+    with _lock:
+        # Another thread may have reloaded while this one waited for the lock
+        if time.monotonic() >= _cache["expires_at"]:
+            _cache["rates"] = {
+                (base, quote): rate
+                for base, quote, rate in ExchangeRate.objects.values_list("base_currency", "quote_currency", "rate")
+            }
+            _cache["expires_at"] = time.monotonic() + settings.EXCHANGE_RATE_CACHE_TTL
+    return _cache["rates"]
+
+
+def invalidate():
+    # Drop this process's copy; the next lookup reloads the table
+    _cache["expires_at"] = 0.0
+
+
+def get_rate(base, quote):
+    # Units of `quote` per unit of `base`, or None when no rate is known for the pair.
+    # A pair only stored the other way round is served as the inverse of that rate.
+    if base == quote:
+        return Decimal("1")
+    rates = _rates()
+    rate = rates.get((base, quote))
+    if rate is None and rates.get((quote, base)):
+        rate = (1 / rates[quote, base]).quantize(RATE_PLACES)
+    return rate
+
+
+def convert(amount, rate):
+    return (amount * rate).quantize(CENTS)
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def invalidate_on_change(sender, **kwargs):
+    # Only after commit, so a concurrent reload cannot cache the old rate again
+    transaction.on_commit(invalidate)
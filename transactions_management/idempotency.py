@@ -0,0 +1,68 @@
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+def get_ttl():
+    return getattr(settings, "IDEMPOTENCY_KEY_TTL", timedelta(hours=24))
+
+
+def request_fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, cls=JSONEncoder)
+    return hashlib.sha256(f"{request.method} {request.path} {payload}".encode()).hexdigest()
+
+
+class IdempotentCreateMixin:
+    # Honours an Idempotency-Key header on create.
+    # The first successful response for a key is stored in the same database transaction as the
+    # work it describes; retries with that key get the stored response back without running
+    # validation or touching any wallet rows.
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"detail": f"{IDEMPOTENCY_HEADER} must be at most 255 characters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        stored = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+        if stored is not None:
+            if stored.expires_at > timezone.now():
+                return self.replay(stored, fingerprint)
+            stored.delete()
+
+        try:
+            with transaction.atomic():
+                response = super().create(request, *args, **kwargs)
+                IdempotencyKey.objects.create(
+                    user=request.user,
+                    key=key,
+                    request_hash=fingerprint,
+                    response_status=response.status_code,
+                    response_body=response.data,
+                    expires_at=timezone.now() + get_ttl(),
+                )
+        except IntegrityError:
+            # A concurrent request with the same key committed first. This attempt has been rolled
+            # back, so its posting never happened; answer with the winner's response instead.
+            return self.replay(IdempotencyKey.objects.get(user=request.user, key=key), fingerprint)
+        return response
+
+    def replay(self, stored, fingerprint):
+        if stored.request_hash != fingerprint:
+            return Response(
+                {"detail": f"This {IDEMPOTENCY_HEADER} was already used with a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(stored.response_body, status=stored.response_status, headers={"Idempotent-Replayed": "true"})
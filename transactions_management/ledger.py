@@ -0,0 +1,44 @@
+from decimal import Decimal
+from django.db.models import Case, DecimalField, Sum, When, F
+from .models import LedgerEntry, LedgerCheckpoint
+
+
+# Rows per INSERT when writing ledger legs
+BULK_INSERT_BATCH_SIZE = 1000
+
+# credit legs add to a wallet's balance, debit legs take from it
+SIGNED_AMOUNT = Sum(
+    Case(
+        When(direction="credit", then=F("amount")),
+        default=-F("amount"),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+)
+
+
+def legs_for(record):
+    # The two legs of a posted Transaction. A missing sender (top-up) or receiver (purchase) is
+    # recorded as a leg without a wallet. Each leg is in its own wallet's currency, so the credit
+    # leg of a cross-currency transfer carries the converted amount.
+    received = record.amount if record.converted_amount is None else record.converted_amount
+    return [
+        LedgerEntry(transaction_id=record.pk, wallet_id=record.sender_id, direction="debit", amount=record.amount),
+        LedgerEntry(transaction_id=record.pk, wallet_id=record.receiver_id, direction="credit", amount=received),
+    ]
+
+
+def record(*records):
+    # Must run inside the same atomic block as the balance change it journals
+    LedgerEntry.objects.bulk_create(
+        [leg for posted in records for leg in legs_for(posted)],
+        batch_size=BULK_INSERT_BATCH_SIZE,
+    )
+
+
+def ledger_balance(wallet):
+    # Rebuild a wallet's balance from its last checkpoint plus the entries written after it.
+    # Both lookups are index seeks, so the cost depends on recent activity only.
+    checkpoint = LedgerCheckpoint.objects.filter(wallet=wallet).values_list("balance", "last_entry_id").first()
+    balance, last_entry_id = checkpoint or (Decimal("0.00"), 0)
+    recent = LedgerEntry.objects.filter(wallet=wallet, id__gt=last_entry_id).aggregate(net=SIGNED_AMOUNT)["net"]
+    return balance + (recent or Decimal("0.00"))
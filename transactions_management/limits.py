@@ -0,0 +1,100 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .analytics import hour_bucket
+from .models import SpendCounter
+
+
+# Per-wallet spend counters, one row per wallet per UTC hour. Postings add to them in the same
+# atomic block as the balance change, so a limit check reads at most 24 small rows off the
+# (wallet, bucket) index instead of summing the wallet's transactions. Requests are checked up
+# front for a clear error, and the posting engine checks again when the money actually moves
+# (queued and scheduled postings included).
+
+# Buckets making up the rolling daily window, the current hour included
+WINDOW_HOURS = 24
+
+
+def tier(user):
+    return tier_of(user.KYC_status, user.role)
+
+
+def tier_of(kyc_status, role):
+    if not kyc_status:
+        return "unverified"
+    return role if role in settings.SPEND_LIMITS else "customer"
+
+
+def record(records):
+    # Add the outgoing side of posted transactions to their senders' current buckets. Runs inside
+    # the posting's atomic block. One upsert statement covers every (wallet, hour) touched.
+    totals = defaultdict(lambda: [0, Decimal("0.00")])
+    for posted in records:
+        if posted.sender_id is not None:
+            key = (posted.sender_id, hour_bucket(posted.transaction_time))
+            totals[key][0] += 1
+            totals[key][1] += posted.amount
+    if not totals:
+        return
+
+    quote = connection.ops.quote_name
+    meta = SpendCounter._meta
+    wallet, bucket, count, amount = (meta.get_field(name) for name in ("wallet", "bucket", "count", "amount"))
+    sql = (
+        "INSERT INTO {table} ({wallet}, {bucket}, {count}, {amount}) VALUES (%s, %s, %s, %s) "
+        "ON CONFLICT ({wallet}, {bucket}) DO UPDATE SET {count} = {table}.{count} + excluded.{count}, "
+        "{amount} = {table}.{amount} + excluded.{amount}"
+    ).format(
+        table=quote(meta.db_table), wallet=quote(wallet.column), bucket=quote(bucket.column),
+        count=quote(count.column), amount=quote(amount.column),
+    )
+    params = [
+        [wallet_id, bucket.get_db_prep_save(hour, connection), posted, amount.get_db_prep_save(sent, connection)]
+        for (wallet_id, hour), (posted, sent) in totals.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def usage_many(wallet_ids, now=None):
+    # {wallet id: (amount sent over the rolling 24 hours, postings made in the current hour)}
+    current = hour_bucket(now or timezone.now())
+    totals = {wallet_id: [Decimal("0.00"), 0] for wallet_id in wallet_ids}
+    rows = SpendCounter.objects.filter(
+        wallet_id__in=totals, bucket__gt=current - timedelta(hours=WINDOW_HOURS), bucket__lte=current
+    ).values_list("wallet_id", "bucket", "count", "amount")
+    for wallet_id, bucket, count, amount in rows:
+        totals[wallet_id][0] += amount
+        if bucket == current:
+            totals[wallet_id][1] = count
+    return {wallet_id: (sent, posted) for wallet_id, (sent, posted) in totals.items()}
+
+
+def usage(wallet, now=None):
+    return usage_many([wallet.pk], now)[wallet.pk]
+
+
+def exceeded(tier_name, currency, sent, posted, amount, postings=1):
+    # Reason a wallet of `tier_name` that has already used (sent, posted) may not send `amount`
+    # in `postings` more postings, or None
+    limits = settings.SPEND_LIMITS.get(tier_name)
+    if not limits:
+        return None
+    daily = limits["daily_amount"].get(currency)
+    if daily is not None and sent + amount > daily:
+        return f"Daily limit of {daily} {currency} reached. You can send {max(daily - sent, Decimal('0.00'))} more today."
+    if posted + postings > limits["hourly_count"]:
+        return f"Too many transactions. At most {limits['hourly_count']} are allowed per hour."
+    return None
+
+
+def check(wallet, amount, postings=1, now=None):
+    # Reason the wallet may not send `amount` in `postings` more postings right now, or None
+    tier_name = tier(wallet.user)
+    if tier_name not in settings.SPEND_LIMITS:
+        return None
+    sent, posted = usage(wallet, now)
+    return exceeded(tier_name, wallet.currency, sent, posted, amount, postings)
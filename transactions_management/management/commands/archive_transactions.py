@@ -0,0 +1,63 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from wallet_management.models import Wallet
+from transactions_management.models import Transaction, ArchivedTransaction
+
+
+ARCHIVED_FIELDS = (
+    "id", "sender_id", "receiver_id", "amount", "transaction_type", "description", "transaction_time", "batch_reference",
+    "converted_amount", "exchange_rate", "reversal_of_id",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move transactions older than --older-than days from the Transaction table to the archive "
+        "table, oldest first and in batches, so the hot table and its indexes stay small. History and "
+        "statement reads still include archived rows when the requested range reaches back to them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=365, help="Archive transactions older than this many days.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Transactions moved per database transaction.")
+
+    def handle(self, *args, **options):
+        if options["older_than"] < 1:
+            raise CommandError("--older-than must be at least 1 day.")
+        cutoff = timezone.now() - timedelta(days=options["older_than"])
+        started = time.perf_counter()
+        moved = 0
+        while True:
+            batch = self.archive_batch(cutoff, options["batch_size"])
+            if not batch:
+                break
+            moved += batch
+            self.stdout.write(f"Archived {moved} transactions...")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} transactions older than {cutoff:%Y-%m-%d %H:%M} in {time.perf_counter() - started:.1f}s "
+            f"({Transaction.objects.count()} left in the hot table)."
+        ))
+
+    def archive_batch(self, cutoff, batch_size):
+        with transaction.atomic():
+            # Oldest first along (transaction_time, id), so the archive always holds a prefix of the
+            # history and every wallet's archived rows sort before its hot rows
+            rows = list(
+                Transaction.objects.filter(transaction_time__lt=cutoff)
+                .order_by("transaction_time", "id")
+                .values(*ARCHIVED_FIELDS)[:batch_size]
+            )
+            if not rows:
+                return 0
+            ArchivedTransaction.objects.bulk_create([ArchivedTransaction(**row) for row in rows], batch_size=1000)
+            ids = [row["id"] for row in rows]
+            Transaction.objects.filter(id__in=ids).delete()
+
+            # Everything up to the last row of this batch is archived now
+            wallet_ids = {row[field] for row in rows for field in ("sender_id", "receiver_id")} - {None}
+            Wallet.objects.filter(pk__in=wallet_ids).update(archived_until=rows[-1]["transaction_time"])
+        return len(rows)
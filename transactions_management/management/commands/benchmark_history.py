@@ -0,0 +1,116 @@
+import random
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from user.models import User
+from wallet_management import accounts
+from wallet_management.models import Wallet
+from transactions_management.models import Transaction
+from transactions_management.pagination import TransactionCursorPagination
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large Transaction table inside a transaction that is rolled back afterwards, then "
+        "compare query plans and timings of the OR-filtered wallet history against the merged "
+        "sent/received index streams."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200000, help="Transactions to seed.")
+        parser.add_argument("--wallets", type=int, default=1000, help="Wallets to spread them over.")
+        parser.add_argument("--hot-share", type=float, default=0.1, help="Share of rows touching the measured wallet.")
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=25, help="Runs per measurement (median is reported).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            hot = self.seed(options["rows"], options["wallets"], options["hot_share"])
+            self.compare(hot, options["page_size"], options["repeat"])
+            # Never keep the synthetic data
+            transaction.set_rollback(True)
+
+    def seed(self, rows, wallet_count, hot_share):
+        started = time.perf_counter()
+        tag = uuid.uuid4().hex[:8]
+        users = User.objects.bulk_create(
+            [User(email=f"bench-{tag}-{i}@example.invalid", role="customer") for i in range(wallet_count)]
+        )
+        wallets = Wallet.objects.bulk_create(
+            [Wallet(user=user, account_number=number) for user, number in zip(users, accounts.reserve(len(users)))]
+        )
+        wallet_ids = [wallet.pk for wallet in wallets]
+        hot = wallets[0]
+
+        table = Transaction._meta.db_table
+        sql = (
+            f"INSERT INTO {table} (sender_id, receiver_id, amount, transaction_type, description, transaction_time) "
+            "VALUES (%s, %s, %s, %s, %s, %s)"
+        )
+        rng = random.Random(42)
+        start_time = timezone.now() - timedelta(seconds=rows)
+        amount = connection.ops.adapt_decimalfield_value(Decimal("100.00"), 12, 2)
+        with connection.cursor() as cursor:
+            batch = []
+            for i in range(rows):
+                sender, receiver = rng.sample(wallet_ids, 2)
+                if rng.random() < hot_share:
+                    if rng.random() < 0.5:
+                        sender = hot.pk
+                    else:
+                        receiver = hot.pk
+                    if sender == receiver:
+                        receiver = wallet_ids[1]
+                when = connection.ops.adapt_datetimefield_value(start_time + timedelta(seconds=i))
+                batch.append((sender, receiver, amount, "transfer", "benchmark", when))
+                if len(batch) == 10000:
+                    cursor.executemany(sql, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(sql, batch)
+            if connection.vendor == "sqlite":
+                cursor.execute("ANALYZE")
+
+        hot_rows = Transaction.objects.filter(Q(sender=hot) | Q(receiver=hot)).count()
+        self.stdout.write(
+            f"Seeded {rows} transactions over {wallet_count} wallets in {time.perf_counter() - started:.1f}s "
+            f"({hot_rows} involve the measured wallet)."
+        )
+        return hot
+
+    def compare(self, hot, page_size, repeat):
+        paginator = TransactionCursorPagination()
+        ordering = paginator.ordering
+        history = Transaction.objects.filter(Q(sender=hot) | Q(receiver=hot))
+        deep_row = history.order_by(*ordering).values("transaction_time", "id")[history.count() // 2]
+        deep_position = (deep_row["transaction_time"], deep_row["id"])
+
+        def or_filter(position):
+            queryset = history
+            if position is not None:
+                queryset = queryset.filter(paginator.position_filter(position, False))
+            return queryset.order_by(*ordering)[:page_size + 1]
+
+        def merged_streams(position):
+            paginator.view = SimpleNamespace(
+                get_keyset_branches=lambda: [Transaction.objects.filter(sender=hot), Transaction.objects.filter(receiver=hot)]
+            )
+            return paginator.get_page_rows(history, paginator.get_branches(), position, False, page_size + 1)
+
+        for label, build in (("OR filter", or_filter), ("merged index streams", merged_streams)):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{label}"))
+            self.stdout.write(build(None).explain())
+            for page, position in (("first page", None), ("middle of history", deep_position)):
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    list(build(position))
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.stdout.write(f"  {page}: median {statistics.median(timings):.2f} ms over {repeat} runs")
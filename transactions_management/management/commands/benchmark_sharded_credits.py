@@ -0,0 +1,77 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from user.models import User
+from wallet_management.models import Wallet
+from transactions_management import analytics, services
+from transactions_management.models import Transaction, LedgerEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent credits into one receiving wallet with different numbers of balance "
+        "slots. Postings are committed (SQLite is switched to WAL mode first) and everything the "
+        "benchmark created is removed afterwards; run it against a scratch copy of the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--slots", default="0,1,4,16", help="Comma-separated slot counts to compare.")
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent payers.")
+        parser.add_argument("--credits", type=int, default=250, help="Credits posted by each payer per run.")
+
+    def handle(self, *args, **options):
+        slot_counts = [int(value) for value in options["slots"].split(",")]
+        if any(slot_counts) and not settings.BALANCE_SHARDING:
+            raise CommandError("Set BALANCE_SHARDING = True to benchmark balance slots.")
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode=WAL")
+                self.stdout.write(f"SQLite journal mode: {cursor.fetchone()[0]}")
+
+        started = timezone.now()
+        # bulk_create skips the onboarding signals (no welcome email for a benchmark account)
+        user, = User.objects.bulk_create([User(email=f"bench-{uuid.uuid4().hex[:8]}@example.invalid", role="merchant")])
+        merchant, = Wallet.objects.bulk_create([Wallet(user=user, account_number=Wallet.generate_account_number())])
+        expected = Decimal("0.00")
+        try:
+            for slots in slot_counts:
+                services.set_balance_slots(merchant, slots)
+                elapsed = self.run(merchant.pk, options["threads"], options["credits"])
+                posted = options["threads"] * options["credits"]
+                expected += posted * Decimal("100.00")
+                self.stdout.write(
+                    f"{slots:>3} slots: {posted} credits in {elapsed:.2f}s ({posted / elapsed:.0f} credits/s)"
+                )
+
+            merchant.refresh_from_db()
+            total = merchant.total_balance()
+            check = self.style.SUCCESS("OK") if total == expected else self.style.ERROR(f"MISMATCH, expected {expected}")
+            self.stdout.write(f"Merchant total balance {total}: {check}")
+        finally:
+            # Ledger legs of top-ups have no sender wallet, so they are not removed by the cascade
+            LedgerEntry.objects.filter(transaction__receiver=merchant).delete()
+            Transaction.objects.filter(receiver=merchant).delete()
+            user.delete()
+            analytics.rebuild(analytics.hour_bucket(started), analytics.hour_bucket(timezone.now()) + timedelta(hours=1))
+
+    def run(self, wallet_id, threads, credits):
+        def pay():
+            # Each thread posts through its own connection, like a separate request worker
+            wallet = Wallet.objects.get(pk=wallet_id)
+            try:
+                for _ in range(credits):
+                    services.credit(wallet, "100.00", "benchmark")
+            finally:
+                connection.close()
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for future in [pool.submit(pay) for _ in range(threads)]:
+                future.result()
+        return time.perf_counter() - began
@@ -0,0 +1,78 @@
+import statistics
+import time
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from user.models import User
+from wallet_management import accounts
+from wallet_management.models import Wallet
+from transactions_management.models import Transaction
+from transactions_management.serializers import TransactionSerializer, TransactionReadSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare TransactionSerializer with the values-based TransactionReadSerializer on one page of "
+        "transactions. Rows are created inside a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Transactions per page.")
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement (median is reported).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            wallet = self.seed(options["rows"])
+            self.compare(wallet, options["repeat"])
+            # Never keep the synthetic data
+            transaction.set_rollback(True)
+
+    def seed(self, rows):
+        tag = uuid.uuid4().hex[:8]
+        users = User.objects.bulk_create(
+            [User(email=f"bench-{tag}-{i}@example.invalid", role="customer") for i in range(2)]
+        )
+        sender, receiver = Wallet.objects.bulk_create(
+            [Wallet(user=user, account_number=number) for user, number in zip(users, accounts.reserve(len(users)))]
+        )
+        Transaction.objects.bulk_create(
+            [
+                Transaction(sender=sender, receiver=receiver, amount=Decimal("100.00"), transaction_type="transfer", description=f"payment {i}")
+                for i in range(rows)
+            ]
+        )
+        return sender
+
+    def compare(self, wallet, repeat):
+        context = {"request": SimpleNamespace(user=wallet.user)}
+        model_rows = Transaction.objects.filter(sender=wallet).select_related("sender", "receiver").order_by("-transaction_time", "-id")
+        value_rows = Transaction.objects.filter(sender=wallet).order_by("-transaction_time", "-id").values(*TransactionReadSerializer.VALUES)
+
+        cases = (
+            ("TransactionSerializer", lambda rows: TransactionSerializer(rows, many=True, context=dict(context)).data, model_rows),
+            ("TransactionReadSerializer", lambda rows: TransactionReadSerializer(rows, many=True, context=dict(context)).data, value_rows),
+        )
+        results = {}
+        for label, serialize, queryset in cases:
+            loaded = list(queryset)
+            serialize_only, end_to_end = [], []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                serialize(loaded)
+                serialize_only.append((time.perf_counter() - started) * 1000)
+
+                started = time.perf_counter()
+                serialize(list(queryset.all()))
+                end_to_end.append((time.perf_counter() - started) * 1000)
+            results[label] = statistics.median(serialize_only), statistics.median(end_to_end)
+            self.stdout.write(
+                f"{label:<27} {len(loaded)} rows: serialize {results[label][0]:8.2f} ms, "
+                f"query + serialize {results[label][1]:8.2f} ms (median of {repeat})"
+            )
+
+        (old_serialize, old_total), (new_serialize, new_total) = results.values()
+        self.stdout.write(self.style.SUCCESS(
+            f"Speed-up: {old_serialize / new_serialize:.1f}x serializing, {old_total / new_total:.1f}x including the query"
+        ))
@@ -0,0 +1,67 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from transactions_management.ledger import SIGNED_AMOUNT
+from transactions_management.models import LedgerEntry, LedgerCheckpoint
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold ledger entries written since the last run into per-wallet checkpoints, so any wallet's "
+        "balance can be rebuilt from its checkpoint plus recent entries only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--settle-seconds", type=int, default=60,
+            help="Leave out entries younger than this, so transactions still committing are never skipped.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Wallets written per batch.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options["settle_seconds"])
+        previous = LedgerCheckpoint.objects.aggregate(last=Max("last_entry_id"))["last"] or 0
+        watermark = LedgerEntry.objects.filter(id__gt=previous, created_at__lte=cutoff).aggregate(last=Max("id"))["last"]
+        if watermark is None:
+            self.stdout.write("No new ledger entries to checkpoint.")
+            return
+
+        # Net movement per wallet since the previous run, computed by one grouped query
+        nets = (
+            LedgerEntry.objects.filter(id__gt=previous, id__lte=watermark, wallet__isnull=False)
+            .values_list("wallet_id")
+            .annotate(net=SIGNED_AMOUNT)
+            .order_by("wallet_id")
+        )
+        updated = 0
+        with transaction.atomic():
+            batch = []
+            for wallet_id, net in nets.iterator(chunk_size=options["batch_size"]):
+                batch.append((wallet_id, net))
+                if len(batch) == options["batch_size"]:
+                    updated += self.write_batch(batch, watermark)
+                    batch = []
+            if batch:
+                updated += self.write_batch(batch, watermark)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Checkpointed {updated} wallets at ledger entry {watermark} (previous run stopped at {previous})."
+        ))
+
+    def write_batch(self, batch, watermark):
+        existing = dict(
+            LedgerCheckpoint.objects.filter(wallet_id__in=[wallet_id for wallet_id, _ in batch]).values_list("wallet_id", "balance")
+        )
+        LedgerCheckpoint.objects.bulk_create(
+            [
+                LedgerCheckpoint(wallet_id=wallet_id, balance=existing.get(wallet_id, Decimal("0.00")) + net, last_entry_id=watermark)
+                for wallet_id, net in batch
+            ],
+            update_conflicts=True,
+            unique_fields=["wallet"],
+            update_fields=["balance", "last_entry_id", "updated_at"],
+        )
+        return len(batch)
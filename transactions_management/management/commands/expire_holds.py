@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from transactions_management import services
+
+
+class Command(BaseCommand):
+    help = "Release payment holds that expired before being captured or voided, in batches (uses the hold expiry index)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Holds expired per database transaction.")
+
+    def handle(self, *args, **options):
+        expired = 0
+        while True:
+            count = services.expire_holds(options["batch_size"])
+            expired += count
+            if count < options["batch_size"]:
+                break
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} payment holds."))
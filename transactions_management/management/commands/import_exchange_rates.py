@@ -0,0 +1,67 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from wallet_management.models import Wallet
+from transactions_management.models import ExchangeRate
+from transactions_management import fx
+
+
+CURRENCIES = {code for code, _ in Wallet.CURRENCY_CHOICES}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load exchange rates from a local CSV or JSON file and upsert them in bulk. Each rate has "
+        "base_currency, quote_currency and rate (units of quote per unit of base). CSV files need a "
+        "header row; JSON files hold a list of objects."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSON file to read.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rates written per INSERT.")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        try:
+            with path.open(newline="") as source:
+                rows = json.load(source) if path.suffix.lower() == ".json" else list(csv.DictReader(source))
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read {path}: {exc}")
+
+        # The last rate given for a pair wins
+        rates = {}
+        for number, row in enumerate(rows, start=1):
+            base, quote, rate = self.parse(row, number)
+            rates[base, quote] = rate
+        if not rates:
+            raise CommandError(f"No exchange rates in {path}.")
+
+        with transaction.atomic():
+            ExchangeRate.objects.bulk_create(
+                [ExchangeRate(base_currency=base, quote_currency=quote, rate=rate) for (base, quote), rate in rates.items()],
+                batch_size=options["batch_size"],
+                update_conflicts=True,
+                unique_fields=["base_currency", "quote_currency"],
+                update_fields=["rate", "updated_at"],
+            )
+        # Bulk writes send no model signals, so this process's cache is dropped here
+        fx.invalidate()
+        self.stdout.write(self.style.SUCCESS(f"Imported {len(rates)} exchange rates from {path}."))
+
+    def parse(self, row, number):
+        try:
+            base = str(row["base_currency"]).strip().upper()
+            quote = str(row["quote_currency"]).strip().upper()
+            rate = Decimal(str(row["rate"]).strip()).quantize(fx.RATE_PLACES)
+        except (KeyError, TypeError, InvalidOperation):
+            raise CommandError(f"Row {number}: expected base_currency, quote_currency and a numeric rate.")
+        if base not in CURRENCIES or quote not in CURRENCIES:
+            raise CommandError(f"Row {number}: unknown currency pair {base}/{quote}.")
+        if base == quote:
+            raise CommandError(f"Row {number}: base and quote currency are the same.")
+        if rate <= 0:
+            raise CommandError(f"Row {number}: rate must be greater than zero.")
+        return base, quote, rate
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from transactions_management.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records in batches (uses the expires_at index)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            ids = list(
+                IdempotencyKey.objects.filter(expires_at__lte=now).values_list("id", flat=True)[:options["batch_size"]]
+            )
+            if not ids:
+                break
+            deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys."))
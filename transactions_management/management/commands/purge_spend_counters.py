@@ -0,0 +1,23 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from transactions_management.analytics import hour_bucket
+from transactions_management.limits import WINDOW_HOURS
+from transactions_management.models import SpendCounter
+
+
+class Command(BaseCommand):
+    help = "Delete spend counter buckets that have left the rolling limit window, in batches (uses the bucket index)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = hour_bucket(timezone.now()) - timedelta(hours=WINDOW_HOURS)
+        deleted = 0
+        while True:
+            ids = list(SpendCounter.objects.filter(bucket__lte=cutoff).values_list("id", flat=True)[:options["batch_size"]])
+            if not ids:
+                break
+            deleted += SpendCounter.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired spend counter buckets."))
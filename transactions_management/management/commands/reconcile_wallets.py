@@ -0,0 +1,134 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Sum
+from wallet_management.models import Wallet, BalanceSlot
+from transactions_management.models import Transaction, ArchivedTransaction
+from transactions_management.fx import RECEIVED_AMOUNT
+
+
+CENTS = Decimal("0.01")
+
+
+def _init_worker():
+    # Each worker process needs its own database connections (and Django set up when spawned)
+    django.setup()
+    connections.close_all()
+
+
+def _totals(queryset, field, wallet_ids):
+    # Receivers are credited the converted amount of cross-currency transfers
+    amount = RECEIVED_AMOUNT if field == "receiver_id" else "amount"
+    return dict(
+        queryset.filter(**{f"{field}__in": wallet_ids})
+        .values_list(field)
+        .annotate(total=Sum(amount))
+        .order_by()
+    )
+
+
+def account_ranges(range_count):
+    # Split the wallets into `range_count` account-number ranges [low, high) of about the same size
+    # (None leaves an end open). The boundaries are read off the account number index, because the
+    # numbers are far from uniform: allocated ones all start with 0, older random ones don't.
+    total = Wallet.objects.count()
+    accounts = Wallet.objects.order_by("account_number").values_list("account_number", flat=True)
+    bounds = [None]
+    for index in range(1, range_count):
+        offset = index * total // range_count
+        boundary = next(iter(accounts[offset:offset + 1]), None)
+        if boundary is not None and boundary != bounds[-1]:
+            bounds.append(boundary)
+    bounds.append(None)
+    return list(zip(bounds, bounds[1:]))
+
+
+def reconcile_range(low, high, chunk_size):
+    # Compare stored balances with transaction history for wallets whose account number is in
+    # [low, high). Returns (wallets checked, drifted rows, seconds spent in queries).
+    checked, drifted, query_seconds = 0, [], 0.0
+    last_account = None
+    while True:
+        started = time.perf_counter()
+        wallets = Wallet.objects.all()
+        if low is not None:
+            wallets = wallets.filter(account_number__gte=low)
+        if high is not None:
+            wallets = wallets.filter(account_number__lt=high)
+        if last_account is not None:
+            wallets = wallets.filter(account_number__gt=last_account)
+        chunk = list(wallets.order_by("account_number").values_list("id", "account_number", "balance", "archived_until")[:chunk_size])
+        if not chunk:
+            break
+        wallet_ids = [wallet_id for wallet_id, _, _, _ in chunk]
+        # Two grouped aggregates per chunk, each an index range over the wallet columns
+        received = _totals(Transaction.objects, "receiver_id", wallet_ids)
+        sent = _totals(Transaction.objects, "sender_id", wallet_ids)
+        # Plus the same over the archive table, for the wallets that have archived rows
+        archived_ids = [wallet_id for wallet_id, _, _, archived_until in chunk if archived_until is not None]
+        if archived_ids:
+            for totals, field in ((received, "receiver_id"), (sent, "sender_id")):
+                for wallet_id, total in _totals(ArchivedTransaction.objects, field, archived_ids).items():
+                    totals[wallet_id] = totals.get(wallet_id, Decimal("0.00")) + total
+        # Sharded wallets keep part of their balance in slot rows
+        slots = dict(
+            BalanceSlot.objects.filter(wallet_id__in=wallet_ids).values_list("wallet_id").annotate(total=Sum("balance")).order_by()
+        )
+        query_seconds += time.perf_counter() - started
+
+        for wallet_id, account_number, balance, _ in chunk:
+            balance += slots.get(wallet_id, Decimal("0.00"))
+            expected = (received.get(wallet_id, Decimal("0.00")) - sent.get(wallet_id, Decimal("0.00"))).quantize(CENTS)
+            if expected != balance:
+                drifted.append((account_number, balance, expected))
+        checked += len(chunk)
+        last_account = chunk[-1][1]
+    return checked, drifted, query_seconds
+
+
+class Command(BaseCommand):
+    help = (
+        "Check every Wallet.balance against its transaction history (money received minus money sent) "
+        "using grouped aggregate queries, and report wallets that have drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Wallets compared per pair of aggregate queries.")
+        parser.add_argument("--workers", type=int, default=1, help="Processes to spread account-number ranges over.")
+        parser.add_argument("--ranges", type=int, default=0, help="Account-number ranges to split into (default: 4 per worker).")
+        parser.add_argument("--show", type=int, default=20, help="Drifted wallets to list.")
+        parser.add_argument("--fail-on-drift", action="store_true", help="Exit with an error when any wallet has drifted.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        workers = max(options["workers"], 1)
+        range_count = options["ranges"] or workers * 4
+        ranges = [(low, high, options["chunk_size"]) for low, high in account_ranges(range_count)]
+
+        if workers == 1:
+            results = [reconcile_range(*bounds) for bounds in ranges]
+        else:
+            # Forked workers must not share the parent's open connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                results = list(pool.map(reconcile_range, *zip(*ranges)))
+
+        checked = sum(result[0] for result in results)
+        drifted = [row for result in results for row in result[1]]
+        query_seconds = sum(result[2] for result in results)
+        elapsed = time.perf_counter() - started
+
+        for account_number, balance, expected in sorted(drifted, key=lambda row: abs(row[1] - row[2]), reverse=True)[:options["show"]]:
+            self.stdout.write(f"  {account_number}: stored {balance}, expected {expected}, drift {balance - expected}")
+        total_drift = sum((balance - expected for _, balance, expected in drifted), Decimal("0.00"))
+        self.stdout.write(
+            f"Checked {checked} wallets in {elapsed:.2f}s ({checked / elapsed if elapsed else 0:.0f} wallets/s, "
+            f"{query_seconds:.2f}s in queries across {len(ranges)} ranges, {workers} worker(s))."
+        )
+        summary = f"{len(drifted)} wallets drifted, net drift {total_drift}."
+        if drifted and options["fail_on_drift"]:
+            raise CommandError(summary)
+        self.stdout.write(self.style.WARNING(summary) if drifted else self.style.SUCCESS(summary))
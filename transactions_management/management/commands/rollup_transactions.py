@@ -0,0 +1,36 @@
+from datetime import datetime, time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from transactions_management import analytics
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the hourly transaction rollups behind the admin analytics API from the raw "
+        "Transaction table, e.g. to backfill history or repair buckets."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="First day to rebuild (YYYY-MM-DD). Defaults to the last --hours hours.")
+        parser.add_argument("--hours", type=int, default=24, help="Hours to rebuild when --since is not given.")
+        parser.add_argument(
+            "--include-current-hour", action="store_true",
+            help="Also rebuild the hour still receiving postings (by default only closed hours are touched).",
+        )
+
+    def handle(self, *args, **options):
+        end = analytics.hour_bucket(timezone.now())
+        if options["include_current_hour"]:
+            end += timedelta(hours=1)
+
+        if options["since"]:
+            since = parse_date(options["since"])
+            if since is None:
+                raise CommandError("--since must be a date in YYYY-MM-DD format.")
+            start = analytics.hour_bucket(timezone.make_aware(datetime.combine(since, time.min)))
+        else:
+            start = end - timedelta(hours=options["hours"])
+
+        written = analytics.rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} rollup buckets between {start:%Y-%m-%d %H:00} and {end:%Y-%m-%d %H:00}."))
@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from transactions_management import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply transactions queued by the API in async mode. Postings are taken oldest first in "
+        "batches, each batch in one database transaction with one balance update per wallet. "
+        "Several workers can run side by side."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=outbox.BATCH_SIZE, help="Postings applied per database transaction.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--once", action="store_true", help="Drain the queue and exit instead of polling.")
+
+    def handle(self, *args, **options):
+        total_posted = total_failed = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                posted, failed = outbox.process_batch(options["batch_size"])
+                if posted or failed:
+                    total_posted += posted
+                    total_failed += failed
+                    self.stdout.write(f"Applied {posted + failed} postings ({failed} failed) in {time.perf_counter() - started:.3f}s.")
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Worker stopped: {total_posted} posted, {total_failed} failed."))
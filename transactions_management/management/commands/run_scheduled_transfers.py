@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from transactions_management import schedules
+
+
+class Command(BaseCommand):
+    help = (
+        "Post every scheduled transfer that is due, in batches, and move each schedule on to its next "
+        "occurrence. Meant to run from cron every few minutes; several instances can run at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=schedules.BATCH_SIZE, help="Schedules posted per database transaction.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        started = time.perf_counter()
+        total_posted = total_failed = 0
+        while True:
+            posted, failed = schedules.run_due(now, options["batch_size"])
+            if not posted and not failed:
+                break
+            total_posted += posted
+            total_failed += failed
+
+        elapsed = time.perf_counter() - started
+        total = total_posted + total_failed
+        self.stdout.write(self.style.SUCCESS(
+            f"Ran {total} scheduled transfers ({total_posted} posted, {total_failed} failed) in {elapsed:.1f}s"
+            f" ({total / elapsed if elapsed else 0:.0f}/s)."
+        ))
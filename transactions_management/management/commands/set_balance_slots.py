@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from wallet_management.models import Wallet
+from transactions_management import services
+
+
+class Command(BaseCommand):
+    help = (
+        "Shard a busy receiving wallet's balance over N slot rows so concurrent credits stop queueing "
+        "on one row (0 turns sharding off). Slot balances are folded back first, so the total is unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("account_number")
+        parser.add_argument("slots", type=int, help="Slot rows to spread credits over (0 to turn sharding off).")
+
+    def handle(self, *args, **options):
+        if not 0 <= options["slots"] <= 256:
+            raise CommandError("slots must be between 0 and 256.")
+        try:
+            wallet = Wallet.objects.get(account_number=options["account_number"])
+        except Wallet.DoesNotExist:
+            raise CommandError("Wallet not found.")
+
+        try:
+            services.set_balance_slots(wallet, options["slots"])
+        except services.PostingError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Wallet {wallet.account_number} now uses {wallet.balance_slots} balance slots (total balance {wallet.total_balance()})."
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions_management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='batch_reference',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions_management', '0002_transaction_batch_reference'),
+        ('wallet_management', '0007_alter_wallet_options_alter_wallet_balance_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_time', 'id'], name='txn_time_id_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions_management', '0003_transaction_time_id_index'),
+        ('wallet_management', '0007_alter_wallet_options_alter_wallet_balance_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='receiver',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='received_transactions', to='wallet_management.wallet'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='sender',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sent_transactions', to='wallet_management.wallet'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['sender', 'transaction_time', 'id'], name='txn_sender_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['receiver', 'transaction_time', 'id'], name='txn_receiver_time_idx'),
+        ),
+    ]
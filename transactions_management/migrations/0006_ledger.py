@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_checkpoints(apps, schema_editor):
+    # Balances that predate the journal become each wallet's opening checkpoint
+    Wallet = apps.get_model('wallet_management', 'Wallet')
+    LedgerCheckpoint = apps.get_model('transactions_management', 'LedgerCheckpoint')
+    LedgerCheckpoint.objects.bulk_create(
+        [
+            LedgerCheckpoint(wallet_id=wallet_id, balance=balance, last_entry_id=0)
+            for wallet_id, balance in Wallet.objects.values_list('id', 'balance').iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions_management', '0005_idempotencykey'),
+        ('wallet_management', '0007_alter_wallet_options_alter_wallet_balance_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('last_entry_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('wallet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_checkpoint', to='wallet_management.wallet')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('direction', models.CharField(choices=[('debit', 'Debit'), ('credit', 'Credit')], max_length=6)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('transaction', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='ledger_entries', to='transactions_management.transaction')),
+                ('wallet', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='wallet_management.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['wallet', 'id'], name='ledger_wallet_id_idx')],
+            },
+        ),
+        migrations.RunPython(open_checkpoints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions_management', '0006_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('transaction_type', models.CharField(choices=[('credit', 'Credit'), ('debit', 'Debit'), ('transfer', 'Transfer')], max_length=20)),
+                ('currency', models.CharField(choices=[('NGN', 'Nigerian Naira'), ('USD', 'US Dollar'), ('EUR', 'Euro')], max_length=3)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('volume', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'transaction_type', 'currency'), name='unique_rollup_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions_management', '0008_pendingposting'),
+        ('wallet_management', '0009_wallet_archived_until'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('transaction_type', models.CharField(choices=[('credit', 'Credit'), ('debit', 'Debit'), ('transfer', 'Transfer')], max_length=20)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('transaction_time', models.DateTimeField()),
+                ('batch_reference', models.UUIDField(blank=True, null=True)),
+                ('receiver', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wallet_management.wallet')),
+                ('sender', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wallet_management.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['transaction_time', 'id'], name='archive_time_id_idx'), models.Index(fields=['sender', 'transaction_time', 'id'], name='archive_sender_time_idx'), models.Index(fields=['receiver', 'transaction_time', 'id'], name='archive_receiver_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions_management', '0009_archivedtransaction'),
+        ('wallet_management', '0009_wallet_archived_until'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], max_length=10)),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('occurrence', models.PositiveIntegerField(default=0)),
+                ('next_run_at', models.DateTimeField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('last_status', models.CharField(blank=True, max_length=10)),
+                ('last_error', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_transaction', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='transactions_management.transaction')),
+                ('receiver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wallet_management.wallet')),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_transfers', to='wallet_management.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('is_active', True)), fields=['next_run_at', 'id'], name='schedule_due_idx')],
+            },
+        ),
+    ]
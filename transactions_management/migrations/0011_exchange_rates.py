@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions_management', '0010_scheduledtransfer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtransaction',
+            name='converted_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedtransaction',
+            name='exchange_rate',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=18, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='converted_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='exchange_rate',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=18, null=True),
+        ),
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_currency', models.CharField(choices=[('NGN', 'Nigerian Naira'), ('USD', 'US Dollar'), ('EUR', 'Euro')], max_length=3)),
+                ('quote_currency', models.CharField(choices=[('NGN', 'Nigerian Naira'), ('USD', 'US Dollar'), ('EUR', 'Euro')], max_length=3)),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('base_currency', 'quote_currency'), name='unique_exchange_rate_pair')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions_management', '0011_exchange_rates'),
+        ('wallet_management', '0009_wallet_archived_until'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('wallet', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='spend_counters', to='wallet_management.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='spend_counter_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('wallet', 'bucket'), name='unique_spend_counter_bucket')],
+            },
+        ),
+    ]
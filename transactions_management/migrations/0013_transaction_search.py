@@ -0,0 +1,64 @@
+from django.db import migrations
+
+
+# SQLite FTS5 index over Transaction.description. It is an external-content table: it stores the
+# index only, reads the text back from the transaction table, and triggers keep it in step.
+# The prefix indexes make searches for the start of a word as cheap as whole-word searches.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE transactions_management_transaction_search USING fts5(
+        description, content='transactions_management_transaction', content_rowid='id', prefix='2 3 4'
+    )
+    """,
+    """
+    CREATE TRIGGER transactions_management_transaction_search_insert
+    AFTER INSERT ON transactions_management_transaction BEGIN
+        INSERT INTO transactions_management_transaction_search (rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER transactions_management_transaction_search_delete
+    AFTER DELETE ON transactions_management_transaction BEGIN
+        INSERT INTO transactions_management_transaction_search (transactions_management_transaction_search, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER transactions_management_transaction_search_update
+    AFTER UPDATE OF description ON transactions_management_transaction BEGIN
+        INSERT INTO transactions_management_transaction_search (transactions_management_transaction_search, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO transactions_management_transaction_search (rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    # Index the transactions that already exist
+    "INSERT INTO transactions_management_transaction_search (transactions_management_transaction_search) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS transactions_management_transaction_search_insert",
+    "DROP TRIGGER IF EXISTS transactions_management_transaction_search_delete",
+    "DROP TRIGGER IF EXISTS transactions_management_transaction_search_update",
+    "DROP TABLE IF EXISTS transactions_management_transaction_search",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # Other databases fall back to a plain description filter (see search.py)
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions_management', '0012_spendcounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_SQL), run(DROP_SQL)),
+    ]
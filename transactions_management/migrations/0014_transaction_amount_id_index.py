@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions_management', '0013_transaction_search'),
+        ('wallet_management', '0009_wallet_archived_until'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['amount', 'id'], name='txn_amount_id_idx'),
+        ),
+    ]
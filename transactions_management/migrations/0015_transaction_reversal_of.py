@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions_management', '0014_transaction_amount_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtransaction',
+            name='reversal_of',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='transactions_management.transaction'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='reversal_of',
+            field=models.OneToOneField(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='reversal', to='transactions_management.transaction'),
+        ),
+    ]
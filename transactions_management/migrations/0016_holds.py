@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions_management', '0015_transaction_reversal_of'),
+        ('wallet_management', '0010_wallet_held_balance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('captured_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('authorized', 'Authorized'), ('captured', 'Captured'), ('voided', 'Voided'), ('expired', 'Expired')], default='authorized', max_length=10)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('settled_at', models.DateTimeField(blank=True, null=True)),
+                ('merchant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='merchant_holds', to='wallet_management.wallet')),
+                ('transaction', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='transactions_management.transaction')),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='wallet_management.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'authorized')), fields=['expires_at', 'id'], name='hold_expiry_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.db import models
+from rest_framework.utils.encoders import JSONEncoder
 from user.models import User
 from wallet_management.models import Wallet
 
@@ -12,12 +14,36 @@ class Transaction(models.Model):
 
     )
 
-    sender = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='sent_transactions', null=True, blank=True)
-    receiver = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='received_transactions', null=True, blank=True)
+    # Indexed through the composite (wallet, transaction_time, id) indexes below
+    sender = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='sent_transactions', null=True, blank=True, db_index=False)
+    receiver = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='received_transactions', null=True, blank=True, db_index=False)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPES)
     description = models.TextField(null=True, blank=True)
     transaction_time = models.DateTimeField(auto_now_add=True)
+    # Shared by every transaction posted in the same bulk transfer request
+    batch_reference = models.UUIDField(null=True, blank=True, db_index=True)
+    # Cross-currency transfers: `amount` leaves the sender in its currency and `converted_amount`
+    # reaches the receiver in theirs, at `exchange_rate`. Both are empty when nothing was converted.
+    converted_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    exchange_rate = models.DecimalField(max_digits=18, decimal_places=8, null=True, blank=True)
+    # Set on the compensating entry posted by a reversal. One-to-one, so the unique index makes a
+    # second reversal of the same transaction impossible. No database constraint, so archiving
+    # the original never touches its reversal.
+    reversal_of = models.OneToOneField(
+        'self', on_delete=models.DO_NOTHING, db_constraint=False, related_name='reversal', null=True, blank=True
+    )
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order for the admin transaction list
+            models.Index(fields=["transaction_time", "id"], name="txn_time_id_idx"),
+            # Wallet history is read as two index-ordered streams (sent and received)
+            models.Index(fields=["sender", "transaction_time", "id"], name="txn_sender_time_idx"),
+            models.Index(fields=["receiver", "transaction_time", "id"], name="txn_receiver_time_idx"),
+            # Keyset pagination for the admin list ordered by amount
+            models.Index(fields=["amount", "id"], name="txn_amount_id_idx"),
+        ]
 
 
     def get_transaction_summary(self):
@@ -42,3 +68,258 @@ class Transaction(models.Model):
     def __str__(self):
         return self.get_transaction_summary()
 
+
+
+# Cold storage for old transactions, filled by archive_transactions. Rows keep their original id,
+# so ledger legs and links to a transaction still resolve after it has been archived. Those links
+# (ledger legs, reversals, postings, schedules, holds) are declared with db_constraint=False, so
+# deleting archived rows from Transaction never touches the tables that point at them. Archiving
+# moves the oldest rows first, so every archived row sorts before every row left in Transaction.
+class ArchivedTransaction(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    sender = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='+', null=True, blank=True, db_index=False)
+    receiver = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='+', null=True, blank=True, db_index=False)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
+    description = models.TextField(null=True, blank=True)
+    transaction_time = models.DateTimeField()
+    batch_reference = models.UUIDField(null=True, blank=True)
+    converted_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    exchange_rate = models.DecimalField(max_digits=18, decimal_places=8, null=True, blank=True)
+    reversal_of = models.ForeignKey(Transaction, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', null=True, blank=True, db_index=False)
+
+    class Meta:
+        indexes = [
+            # Same indexes as the hot table
+            models.Index(fields=["transaction_time", "id"], name="archive_time_id_idx"),
+            models.Index(fields=["sender", "transaction_time", "id"], name="archive_sender_time_idx"),
+            models.Index(fields=["receiver", "transaction_time", "id"], name="archive_receiver_time_idx"),
+        ]
+
+    # Same summary as a live transaction
+    get_transaction_summary = Transaction.get_transaction_summary
+    __str__ = Transaction.__str__
+
+
+
+# Append-only double-entry journal: every Transaction writes one debit leg (the wallet money leaves)
+# and one credit leg (the wallet money arrives in). A leg without a wallet is money entering or
+# leaving the system, e.g. a top-up or a purchase.
+class LedgerEntry(models.Model):
+    DIRECTIONS = (
+        ('debit', 'Debit'),
+        ('credit', 'Credit'),
+    )
+
+    # No database constraint so the journal can outlive transactions moved out of the hot table
+    transaction = models.ForeignKey(Transaction, on_delete=models.DO_NOTHING, db_constraint=False, related_name='ledger_entries')
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='ledger_entries', null=True, blank=True, db_index=False)
+    direction = models.CharField(max_length=6, choices=DIRECTIONS)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Entries of one wallet after a checkpoint are an index range scan
+            models.Index(fields=["wallet", "id"], name="ledger_wallet_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.direction.title()} {self.amount} - transaction {self.transaction_id}"
+
+
+# Balance of a wallet as of ledger entry `last_entry_id`; refreshed by `manage.py checkpoint_ledger`
+class LedgerCheckpoint(models.Model):
+    wallet = models.OneToOneField(Wallet, on_delete=models.CASCADE, related_name='ledger_checkpoint')
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    last_entry_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.wallet_id} - {self.balance} @ {self.last_entry_id}"
+
+# Stored responses for requests sent with an Idempotency-Key header
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField()
+    # Same encoder DRF renders with, so a replay is byte-for-byte the original body
+    response_body = models.JSONField(encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # Also the index used to look keys up
+            models.UniqueConstraint(fields=["user", "key"], name="unique_idempotency_key_per_user"),
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key}"
+
+
+
+# Hourly totals per transaction type and currency, maintained on every posting (see analytics.py)
+class TransactionRollup(models.Model):
+    bucket = models.DateTimeField()
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
+    currency = models.CharField(max_length=3, choices=Wallet.CURRENCY_CHOICES)
+    count = models.PositiveBigIntegerField(default=0)
+    volume = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves range scans by bucket for the analytics API
+            models.UniqueConstraint(fields=["bucket", "transaction_type", "currency"], name="unique_rollup_bucket"),
+        ]
+
+    def __str__(self):
+        return f"{self.bucket:%Y-%m-%d %H:00} {self.transaction_type} {self.currency}: {self.count} / {self.volume}"
+
+
+
+# Money sent and postings made by one wallet per UTC hour, maintained on every posting and read
+# by the spend limit checks (see limits.py)
+class SpendCounter(models.Model):
+    # Indexed through the (wallet, bucket) constraint below
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='spend_counters', db_index=False)
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index a limit check reads the last 24 buckets of a wallet from
+            models.UniqueConstraint(fields=["wallet", "bucket"], name="unique_spend_counter_bucket"),
+        ]
+        indexes = [
+            # For purge_spend_counters
+            models.Index(fields=["bucket"], name="spend_counter_bucket_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.wallet_id} {self.bucket:%Y-%m-%d %H:00}: {self.count} / {self.amount}"
+
+
+
+# A posting accepted by the API in async mode, waiting for run_posting_worker (see outbox.py)
+class PendingPosting(models.Model):
+    STATUSES = (
+        ('pending', 'Pending'),
+        ('posted', 'Posted'),
+        ('failed', 'Failed'),
+    )
+
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='pending_postings')
+    receiver = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    description = models.TextField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    error = models.CharField(max_length=255, blank=True)
+    transaction = models.ForeignKey(Transaction, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers only ever scan the queue head, so processed rows stay out of the index
+            models.Index(fields=["id"], condition=models.Q(status="pending"), name="posting_pending_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type} {self.amount} from {self.wallet_id} ({self.status})"
+
+
+
+# Standing order: `amount` moves from `wallet` to `receiver` every period from `starts_at` on,
+# posted by run_scheduled_transfers (see schedules.py)
+class ScheduledTransfer(models.Model):
+    FREQUENCIES = (
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+    )
+
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='scheduled_transfers')
+    receiver = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='+')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    description = models.TextField(null=True, blank=True)
+    frequency = models.CharField(max_length=10, choices=FREQUENCIES)
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField(null=True, blank=True)
+    # Occurrences are counted from starts_at, so monthly runs keep their day of the month
+    occurrence = models.PositiveIntegerField(default=0)
+    next_run_at = models.DateTimeField()
+    is_active = models.BooleanField(default=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_status = models.CharField(max_length=10, blank=True)
+    last_error = models.CharField(max_length=255, blank=True)
+    last_transaction = models.ForeignKey(Transaction, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Read by services.post_batch: standing orders are always transfers
+    transaction_type = 'transfer'
+
+    class Meta:
+        indexes = [
+            # Due schedules are read straight off this index; cancelled ones are left out of it
+            models.Index(fields=["next_run_at", "id"], condition=models.Q(is_active=True), name="schedule_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.frequency} {self.amount} from {self.wallet_id} to {self.receiver_id}"
+
+
+
+# Two-phase merchant payment: authorizing reserves `amount` of the customer's wallet (raising
+# Wallet.held_balance); the merchant later captures it, which posts the transfer, or voids it. Holds
+# still authorized at `expires_at` are released by expire_holds.
+class Hold(models.Model):
+    STATUSES = (
+        ('authorized', 'Authorized'),
+        ('captured', 'Captured'),
+        ('voided', 'Voided'),
+        ('expired', 'Expired'),
+    )
+
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='holds')
+    merchant = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='merchant_holds')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    captured_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    description = models.TextField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='authorized')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    settled_at = models.DateTimeField(null=True, blank=True)
+    transaction = models.ForeignKey(Transaction, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Expiry sweeps read straight off this index; settled holds are left out of it
+            models.Index(fields=["expires_at", "id"], condition=models.Q(status="authorized"), name="hold_expiry_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.status} hold of {self.amount} on {self.wallet_id} for {self.merchant_id}"
+
+
+# Units of `quote_currency` that one unit of `base_currency` buys. Transfers read rates through
+# the in-process cache in fx.py, not from this table directly.
+class ExchangeRate(models.Model):
+    base_currency = models.CharField(max_length=3, choices=Wallet.CURRENCY_CHOICES)
+    quote_currency = models.CharField(max_length=3, choices=Wallet.CURRENCY_CHOICES)
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["base_currency", "quote_currency"], name="unique_exchange_rate_pair"),
+        ]
+
+    def __str__(self):
+        return f"1 {self.base_currency} = {self.rate} {self.quote_currency}"
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import PendingPosting, Transaction
+from . import services
+
+
+# Asynchronous posting: in async mode the API only records the posting here and answers 202;
+# run_posting_worker applies queued postings in batches, one database transaction per batch.
+
+ASYNC_PREFERENCE = "respond-async"
+
+# Postings claimed per worker transaction
+BATCH_SIZE = 500
+
+
+def wants_async(request):
+    # Async mode is on for everyone via settings.ASYNC_POSTING, or per request with
+    # the standard `Prefer: respond-async` header
+    return getattr(settings, "ASYNC_POSTING", False) or ASYNC_PREFERENCE in request.headers.get("Prefer", "")
+
+
+def enqueue(wallet, transaction_type, amount, receiver=None, description=""):
+    return PendingPosting.objects.create(
+        wallet=wallet, receiver=receiver, transaction_type=transaction_type, amount=amount, description=description
+    )
+
+
+def process_batch(batch_size=BATCH_SIZE):
+    # Apply the oldest queued postings in one database transaction and return (posted, failed).
+    # Rows claimed by another worker are skipped, so several workers can drain the queue together.
+    with transaction.atomic():
+        postings = list(
+            PendingPosting.objects.select_for_update(skip_locked=True).filter(status="pending").order_by("id")[:batch_size]
+        )
+        if not postings:
+            return 0, 0
+
+        now = timezone.now()
+        for posting, result in zip(postings, services.post_batch(postings)):
+            posting.processed_at = now
+            if isinstance(result, Transaction):
+                posting.status, posting.transaction = "posted", result
+            else:
+                posting.status, posting.error = "failed", result
+        PendingPosting.objects.bulk_update(postings, ["status", "error", "transaction", "processed_at"], batch_size=services.BULK_INSERT_BATCH_SIZE)
+    posted = sum(posting.status == "posted" for posting in postings)
+    return posted, len(postings) - posted
+
+
+class AsyncPostingMixin:
+    # In async mode a valid create request is queued and answered with 202 Accepted and the URL
+    # to poll; otherwise the posting happens inside the request as before.
+
+    def create(self, request, *args, **kwargs):
+        if not wants_async(request):
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        posting = enqueue(
+            request.user.wallet,
+            data["transaction_type"],
+            data["amount"],
+            receiver=data.get("receiver"),
+            description=data.get("description", ""),
+        )
+        status_url = reverse("posting-status", args=[posting.pk])
+        return Response(
+            {"message": "Transaction accepted for processing.", "posting_id": posting.pk, "status": posting.status, "status_url": status_url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": status_url, "Preference-Applied": ASYNC_PREFERENCE},
+        )
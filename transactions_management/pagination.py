@@ -0,0 +1,196 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class TransactionCursorPagination(CursorPagination):
+    # Keyset pagination on (transaction_time, id), newest first, or on (field, id) for a field
+    # picked through the view's OrderingFilter.
+    # The cursor carries the position of the last row served, so every page is an index range
+    # scan of `page_size` rows no matter how deep the client has paged, rows inserted while
+    # paging never shift or duplicate entries across pages, and no page ever counts the table.
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-transaction_time", "-id")
+    # Keyset field and direction; set per request from the view's ordering
+    key_field = "transaction_time"
+    descending = True
+    # First chunk read when a row matcher is filtering the page (doubles on every further read)
+    match_chunk_size = 200
+    max_match_chunk_size = 10000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.key_field, self.descending = self.get_keyset_ordering(request, queryset, view)
+        self.position, self.reverse = self.decode_cursor(request, queryset.model)
+
+        rows = self.get_rows(queryset, self.position, self.reverse, self.page_size + 1)
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = self.position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+        return self.page
+
+    def get_keyset_ordering(self, request, queryset, view):
+        # (field, descending) for this request: the first field chosen with the view's
+        # OrderingFilter (`?ordering=-amount`), otherwise `ordering`. Ties are broken by id in the
+        # same direction, so the view should have an index on (field, id) for every ordering field.
+        ordering = None
+        for backend in getattr(view, "filter_backends", ()):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+        field = (ordering or self.ordering)[0]
+        return field.lstrip("-"), field.startswith("-")
+
+    def get_page_ordering(self, reverse):
+        sign = "-" if self.descending != reverse else ""
+        return (sign + self.key_field, sign + "id")
+
+    def get_rows(self, queryset, position, reverse, limit):
+        # The archive holds the oldest rows, so it only lines up with newest-first time pages
+        archive = self.get_archive() if (self.key_field, self.descending) == ("transaction_time", True) else None
+        if archive is None:
+            return list(self.get_page_rows(queryset, self.get_branches(), position, reverse, limit))
+
+        # Archived rows all sort before the hot ones, so a page is read from the hot table and only
+        # topped up from the archive once it runs past the watermark (the other way round when
+        # paging back towards newer rows). Pages inside the hot range never touch the archive.
+        archived_until, archive_queryset, archive_branches = archive
+        hot, cold = (queryset, self.get_branches()), (archive_queryset, archive_branches)
+        if reverse:
+            sources = [hot] if position[0] > archived_until else [cold, hot]
+        else:
+            sources = [cold] if position is not None and position[0] < archived_until else [hot, cold]
+        rows = []
+        for source, branches in sources:
+            rows += self.get_page_rows(source, branches, position, reverse, limit - len(rows))
+            if len(rows) == limit:
+                break
+        return rows
+
+    def get_page_rows(self, queryset, branches, position, reverse, limit):
+        ordering = self.get_page_ordering(reverse)
+        if branches:
+            # Merge index-ordered streams: each branch contributes at most `limit` ids through its
+            # own index range scan, and only those candidates are fetched and sorted.
+            candidates = Q()
+            for branch in branches:
+                if position is not None:
+                    branch = branch.filter(self.position_filter(position, reverse))
+                candidates |= Q(pk__in=branch.order_by(*ordering).values("pk")[:limit])
+            queryset = queryset.filter(candidates)
+        elif position is not None:
+            queryset = queryset.filter(self.position_filter(position, reverse))
+        match = self.get_matcher()
+        if match is None:
+            return queryset.order_by(*ordering)[:limit]
+        return self.get_matching_rows(queryset.order_by(*ordering), match, reverse, limit)
+
+    def get_matching_rows(self, queryset, match, reverse, limit):
+        # Read row keys in keyset order, a chunk at a time, and keep those `match` accepts until
+        # the page is full; only the rows that made it onto the page are then fetched in full.
+        # Each chunk is one index range scan plus one matcher call.
+        keys = queryset.values_list(self.key_field, "id")
+        page_ids, chunk_size, position = [], self.match_chunk_size, None
+        while len(page_ids) < limit:
+            chunk = keys if position is None else keys.filter(self.position_filter(position, reverse))
+            chunk = list(chunk[:chunk_size])
+            if not chunk:
+                break
+            matched = match([pk for _, pk in chunk])
+            page_ids += [pk for _, pk in chunk if pk in matched][:limit - len(page_ids)]
+            if len(chunk) < chunk_size:
+                break
+            position = chunk[-1]
+            chunk_size = min(chunk_size * 2, self.max_match_chunk_size)
+        return queryset.filter(pk__in=page_ids) if page_ids else []
+
+    def get_branches(self):
+        # Views whose queryset is an OR of several indexed filters (e.g. sent OR received) can
+        # expose them through `get_keyset_branches()` so each one is scanned separately.
+        get_keyset_branches = getattr(self.view, "get_keyset_branches", None)
+        return get_keyset_branches() if get_keyset_branches else None
+
+    def get_matcher(self):
+        # A filter that cannot be expressed as an indexed queryset filter (e.g. a common full-text
+        # search term) can leave `keyset_match` on the view: a callable taking a list of row ids
+        # and returning the set of those that belong on the page.
+        return getattr(self.view, "keyset_match", None)
+
+    def get_archive(self):
+        # Views with an archive table return (watermark, archive queryset, archive branches) from
+        # `get_keyset_archive()`, or None when nothing they list has been archived
+        get_keyset_archive = getattr(self.view, "get_keyset_archive", None)
+        return get_keyset_archive() if get_keyset_archive else None
+
+    def position_filter(self, position, reverse):
+        # Rows strictly after the cursor in page order, or before it when paging back (the leading
+        # key comparison is kept as a plain range so it can drive the index scan)
+        value, pk = position
+        field = self.key_field
+        if self.descending != reverse:
+            return Q(**{f"{field}__lte": value}) & (Q(**{f"{field}__lt": value}) | Q(id__lt=pk))
+        return Q(**{f"{field}__gte": value}) & (Q(**{f"{field}__gt": value}) | Q(id__gt=pk))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.edge_position(-1), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.edge_position(0), reverse=True)
+
+    def edge_position(self, index):
+        # A cursor past the last row, or one whose rows have since been archived, gives an empty
+        # page; its links then continue from the cursor's own position
+        if not self.page:
+            return self.position
+        return self.row_position(self.page[index])
+
+    def row_position(self, row):
+        if isinstance(row, dict):
+            return row[self.key_field], row["id"]
+        return getattr(row, self.key_field), row.pk
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")).decode("ascii"))
+            if self.key_field == "transaction_time":
+                value = parse_datetime(data["t"])
+            else:
+                value = model._meta.get_field(self.key_field).to_python(data["v"])
+            pk = int(data["id"])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (value, pk), bool(data.get("r"))
+
+    def encode_cursor(self, position, reverse):
+        value, pk = position
+        if self.key_field == "transaction_time":
+            data = {"t": value.isoformat(), "id": pk}
+        else:
+            data = {"v": str(value), "id": pk}
+        if reverse:
+            data["r"] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
@@ -0,0 +1,82 @@
+import calendar
+from datetime import timedelta
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import ScheduledTransfer, Transaction
+from . import services
+
+
+# Standing orders: run_scheduled_transfers posts due schedules in batches through the posting
+# engine and moves each one on to its next occurrence in the same database transaction, so a
+# schedule can never be posted twice for one occurrence.
+
+# Schedules posted per database transaction
+BATCH_SIZE = 1000
+
+# Written back after every run
+RUN_FIELDS = ("occurrence", "next_run_at", "is_active", "last_run_at", "last_status", "last_error", "last_transaction")
+
+
+def occurrence_time(schedule, occurrence):
+    if schedule.frequency == "daily":
+        return schedule.starts_at + timedelta(days=occurrence)
+    if schedule.frequency == "weekly":
+        return schedule.starts_at + timedelta(weeks=occurrence)
+    # Monthly: same day of the month (in local time), or the last day of shorter months
+    starts_at = timezone.localtime(schedule.starts_at)
+    months = starts_at.month - 1 + occurrence
+    year, month = starts_at.year + months // 12, months % 12 + 1
+    return starts_at.replace(year=year, month=month, day=min(starts_at.day, calendar.monthrange(year, month)[1]))
+
+
+def advance(schedule, now):
+    # Move on to the first occurrence after `now`. Occurrences missed while no worker was running
+    # are skipped rather than posted in a burst.
+    schedule.occurrence += 1
+    schedule.next_run_at = occurrence_time(schedule, schedule.occurrence)
+    while schedule.next_run_at <= now:
+        schedule.occurrence += 1
+        schedule.next_run_at = occurrence_time(schedule, schedule.occurrence)
+    if schedule.ends_at is not None and schedule.next_run_at > schedule.ends_at:
+        schedule.is_active = False
+
+
+def run_due(now, batch_size=BATCH_SIZE):
+    # Post one batch of schedules due at `now` and return (posted, failed).
+    # Rows claimed by another worker are skipped, so several workers can run at once.
+    with transaction.atomic():
+        schedules = list(
+            ScheduledTransfer.objects.select_for_update(skip_locked=True)
+            .filter(is_active=True, next_run_at__lte=now)
+            .order_by("next_run_at", "id")[:batch_size]
+        )
+        if not schedules:
+            return 0, 0
+
+        posted = 0
+        for schedule, result in zip(schedules, services.post_batch(schedules)):
+            schedule.last_run_at = now
+            if isinstance(result, Transaction):
+                schedule.last_status, schedule.last_error, schedule.last_transaction = "posted", "", result
+                posted += 1
+            else:
+                schedule.last_status, schedule.last_error = "failed", result
+            advance(schedule, now)
+        save_runs(schedules)
+    return posted, len(schedules) - posted
+
+
+def save_runs(schedules):
+    # One prepared UPDATE executed for every schedule. bulk_update() would build a CASE per column
+    # with a branch per row, which costs more than the postings themselves at this batch size.
+    meta = ScheduledTransfer._meta
+    fields = [meta.get_field(name) for name in RUN_FIELDS]
+    quote = connection.ops.quote_name
+    sql = "UPDATE {} SET {} WHERE {} = %s".format(
+        quote(meta.db_table), ", ".join(f"{quote(field.column)} = %s" for field in fields), quote(meta.pk.column)
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            sql,
+            [[field.get_db_prep_save(getattr(schedule, field.attname), connection) for field in fields] + [schedule.pk] for schedule in schedules],
+        )
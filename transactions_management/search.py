@@ -0,0 +1,104 @@
+from django.db import connection, connections
+from rest_framework.filters import SearchFilter
+
+
+# Full-text search over transaction descriptions, backed by the SQLite FTS5 table created in
+# migration 0013 and kept in sync by triggers on every insert, update and delete.
+
+FTS_TABLE = "transactions_management_transaction_search"
+
+# Same triggers as migration 0013
+TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON transactions_management_transaction BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON transactions_management_transaction BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF description ON transactions_management_transaction BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO {FTS_TABLE} (rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+]
+
+# A search matching at most this many transactions is answered by fetching the matches by id.
+# Above it the paginator walks the list in index order instead and keeps the rows that match,
+# which for a common term only takes a few chunks to fill a page.
+SEEK_LIMIT = 2000
+
+
+def install_triggers(sender, using="default", **kwargs):
+    # post_migrate handler. To apply some schema changes (e.g. adding a unique column) Django
+    # rebuilds a SQLite table, which drops its triggers; this puts them back. Rows keep their ids
+    # in a rebuild, so the index itself is still valid.
+    db = connections[using]
+    if db.vendor != "sqlite":
+        return
+    with db.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+        if cursor.fetchone() is None:
+            return
+        for statement in TRIGGERS:
+            cursor.execute(statement)
+
+
+def available():
+    return connection.vendor == "sqlite"
+
+
+def match_expression(terms):
+    # Every term must appear as a word; the last one may also be the start of a word, so
+    # "electricity tok" finds "Electricity token". Terms are quoted so FTS5 operators in user
+    # input are taken literally.
+    quoted = ['"{}"'.format(term.replace('"', '""')) for term in terms]
+    return " ".join(quoted) + "*"
+
+
+def matching_ids(expression, limit=None, low=None, high=None):
+    sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+    params = [expression]
+    if low is not None:
+        # Rowid ranges are applied inside the FTS index, so only that stretch of it is read
+        sql += " AND rowid BETWEEN %s AND %s"
+        params += [low, high]
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def matcher(expression):
+    # Given the ids of a chunk of candidate rows, return those whose description matches
+    def match(ids):
+        return set(matching_ids(expression, low=min(ids), high=max(ids))).intersection(ids) if ids else set()
+    return match
+
+
+class TransactionSearchFilter(SearchFilter):
+    # `?search=` for transaction lists, combinable with any other filter. Rare terms narrow the
+    # queryset to the matching ids; common terms leave it as is and hand the paginator a matcher
+    # (`view.keyset_match`) to apply chunk by chunk.
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or not available():
+            return super().filter_queryset(request, queryset, view)
+
+        expression = match_expression(terms)
+        ids = matching_ids(expression, limit=SEEK_LIMIT + 1)
+        if len(ids) <= SEEK_LIMIT:
+            # Few enough to read by primary key
+            return queryset.filter(pk__in=ids)
+        view.keyset_match = matcher(expression)
+        return queryset
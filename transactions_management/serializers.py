@@ -1,28 +1,50 @@
+from decimal import Decimal
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Transaction
+from .models import Transaction, PendingPosting, ScheduledTransfer, Hold
 from wallet_management.models import Wallet
+from wallet_management.serializers import AccountNumberField, AccountNumberTextField
+from . import limits, services
+
+
+CENTS = Decimal("0.01")
+
+RATE_PLACES = Decimal("0.00000001")
+
+
+def current_balance(context):
+    # The logged-in user's balance is the same for every row of a list, so it is looked up once
+    # and kept in the serializer context shared by all rows.
+    if 'current_balance' not in context:
+        request = context.get('request')
+        wallet = getattr(request.user, 'wallet', None) if request else None
+        context['current_balance'] = wallet.total_balance() if wallet else None
+    return context['current_balance']
 
 
 class TransactionSerializer(serializers.ModelSerializer):
     sender = serializers.SlugRelatedField(slug_field="account_number", read_only=True)
-    receiver = serializers.SlugRelatedField(slug_field="account_number", queryset=Wallet.objects.all(), required=False)
+    receiver = AccountNumberField(required=False)
     summary = serializers.SerializerMethodField()
     current_balance = serializers.SerializerMethodField()
 
     class Meta:
         model = Transaction
-        fields = ['id', 'sender', 'receiver', 'amount', 'transaction_type', 'description', 'transaction_time', 'summary', 'current_balance']
-        read_only_fields = ['id', 'transaction_time', 'summary', 'sender', 'current_balance']
+        fields = [
+            'id', 'sender', 'receiver', 'amount', 'converted_amount', 'exchange_rate', 'transaction_type', 'description',
+            'transaction_time', 'reversal_of', 'summary', 'current_balance',
+        ]
+        read_only_fields = [
+            'id', 'converted_amount', 'exchange_rate', 'transaction_time', 'reversal_of', 'summary', 'sender', 'current_balance',
+        ]
 
     def get_summary(self, obj):
         return f" A {obj.transaction_type.title()} of {obj.amount} has been made for {obj.description}"
     
     def get_current_balance(self, obj):
         #Return the balance of the logged-in user's wallet after the transaction has been processed.
-        request = self.context.get('request')
-        if request and hasattr(request.user, 'wallet'):
-            return request.user.wallet.balance
-        return None
+        return current_balance(self.context)
 
     def validate(self, attrs):
         request = self.context['request']
@@ -43,48 +65,216 @@ class TransactionSerializer(serializers.ModelSerializer):
             if receiver_wallet == user_wallet:
                 raise serializers.ValidationError({"receiver": "You cannot transfer to your own wallet."})
                 
-            if user_wallet.balance < amount:
+            if user_wallet.available_balance() < amount:
                 raise serializers.ValidationError({"balance": "Insufficient funds for this transfer. Try a lower amount."})
             
-        # Debit Validation        
-        if transaction_type == "debit" and user_wallet.balance < amount:
+        # Debit Validation (money on hold for merchants can't be spent)
+        if transaction_type == "debit" and user_wallet.available_balance() < amount:
             raise serializers.ValidationError({"balance": "Insufficient funds for debit transaction."})
+
+        # Tier limits on money leaving the wallet, read from the hourly spend counters
+        if transaction_type in ("transfer", "debit"):
+            reason = limits.check(user_wallet, amount)
+            if reason:
+                raise serializers.ValidationError({"limit": reason})
         return attrs
             
     def create(self, validated_data):
         request = self.context['request']
-        user_wallet= request.user.wallet
-        
-        receiver_wallet = validated_data.get('receiver')
-        amount = validated_data['amount']
-        transaction_type = validated_data['transaction_type']
+        user_wallet = request.user.wallet
 
-        sender_wallet = user_wallet if transaction_type in ['debit', 'transfer'] else None
+        # Balance updates and the transaction record are posted atomically by the posting engine
+        try:
+            return services.post_transaction(
+                user_wallet,
+                validated_data['transaction_type'],
+                validated_data['amount'],
+                receiver=validated_data.get('receiver'),
+                description=validated_data.get("description", ""),
+            )
+        except services.InsufficientFunds:
+            raise serializers.ValidationError({"balance": "Insufficient funds for this transaction. Try a lower amount."})
+        except services.LimitExceeded as exc:
+            raise serializers.ValidationError({"limit": str(exc)})
+        except services.PostingError as exc:
+            raise serializers.ValidationError({"detail": str(exc)})
 
-      # Perform balance updates 
-        if transaction_type == 'transfer':
-            # Deduct from sender
-            user_wallet.balance -= amount
-            # Credit receiver
-            receiver_wallet.balance += amount
-            user_wallet.save()
-            receiver_wallet.save()
-
-        elif transaction_type == 'credit':
-            user_wallet.balance += amount
-            user_wallet.save()
-
-        elif transaction_type == 'debit':
-            if user_wallet.balance < amount:
-                raise serializers.ValidationError({"balance": "insufficient funds for debit transaction."})
-            user_wallet.balance -= amount
-            user_wallet.save()
-
-        # Save transaction record
-        return Transaction.objects.create(
-            sender = sender_wallet,
-            receiver = receiver_wallet if transaction_type in ['credit', 'transfer'] else None,
-            amount = amount,
-            transaction_type = transaction_type,
-            description = validated_data.get("description", "")
-        )
\ No newline at end of file
+
+
+
+class TransactionReadListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Per-page constants are resolved once instead of once per row
+        tz = timezone.get_current_timezone()
+        balance = current_balance(self.context)
+        return [self.child.format_row(row, tz, balance) for row in data]
+
+
+class TransactionReadSerializer(serializers.BaseSerializer):
+    # Read-only fast path for list endpoints. Rows come from `queryset.values(*TransactionReadSerializer.VALUES)`
+    # as plain dicts, so there is no per-row model instantiation or ModelSerializer field introspection.
+    # Output matches TransactionSerializer field for field.
+    VALUES = (
+        "id", "sender__account_number", "receiver__account_number", "amount", "converted_amount", "exchange_rate",
+        "transaction_type", "description", "transaction_time", "reversal_of",
+    )
+
+    class Meta:
+        list_serializer_class = TransactionReadListSerializer
+
+    def to_representation(self, row):
+        return self.format_row(row, timezone.get_current_timezone(), current_balance(self.context))
+
+    def format_row(self, row, tz, balance):
+        amount, converted_amount, exchange_rate = row["amount"], row["converted_amount"], row["exchange_rate"]
+        # Same ISO 8601 rendering as serializers.DateTimeField
+        transaction_time = row["transaction_time"].astimezone(tz).isoformat()
+        if transaction_time.endswith("+00:00"):
+            transaction_time = transaction_time[:-6] + "Z"
+        return {
+            "id": row["id"],
+            "sender": row["sender__account_number"],
+            "receiver": row["receiver__account_number"],
+            "amount": f"{amount.quantize(CENTS):f}",
+            "converted_amount": None if converted_amount is None else f"{converted_amount.quantize(CENTS):f}",
+            "exchange_rate": None if exchange_rate is None else f"{exchange_rate.quantize(RATE_PLACES):f}",
+            "transaction_type": row["transaction_type"],
+            "description": row["description"],
+            "transaction_time": transaction_time,
+            "reversal_of": row["reversal_of"],
+            "summary": f" A {row['transaction_type'].title()} of {amount} has been made for {row['description']}",
+            "current_balance": balance,
+        }
+
+
+class PendingPostingSerializer(serializers.ModelSerializer):
+    receiver = serializers.SlugRelatedField(slug_field="account_number", read_only=True)
+
+    class Meta:
+        model = PendingPosting
+        fields = ["id", "status", "transaction_type", "amount", "receiver", "description", "error", "transaction", "created_at", "processed_at"]
+        read_only_fields = fields
+
+
+class ScheduledTransferSerializer(serializers.ModelSerializer):
+    receiver = AccountNumberField()
+
+    class Meta:
+        model = ScheduledTransfer
+        fields = [
+            "id", "receiver", "amount", "description", "frequency", "starts_at", "ends_at",
+            "next_run_at", "is_active", "last_run_at", "last_status", "last_error", "created_at",
+        ]
+        read_only_fields = ["id", "next_run_at", "is_active", "last_run_at", "last_status", "last_error", "created_at"]
+
+    def validate(self, attrs):
+        if attrs["amount"] < services.MINIMUM_AMOUNT:
+            raise serializers.ValidationError({"amount": f"Amount must be {services.MINIMUM_AMOUNT} and above"})
+        if attrs["receiver"] == self.context["request"].user.wallet:
+            raise serializers.ValidationError({"receiver": "You cannot transfer to your own wallet."})
+        if attrs["starts_at"] < timezone.now():
+            raise serializers.ValidationError({"starts_at": "The first transfer cannot be in the past."})
+        if attrs.get("ends_at") and attrs["ends_at"] < attrs["starts_at"]:
+            raise serializers.ValidationError({"ends_at": "End date must be after the first transfer."})
+        return attrs
+
+    def create(self, validated_data):
+        return ScheduledTransfer.objects.create(
+            wallet=self.context["request"].user.wallet, next_run_at=validated_data["starts_at"], **validated_data
+        )
+
+
+class BulkTransferLineSerializer(serializers.Serializer):
+    receiver = AccountNumberTextField()
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    description = serializers.CharField(required=False, allow_blank=True, default="")
+
+
+class BulkTransferSerializer(serializers.Serializer):
+    # Lines are validated for shape only; receivers, funds and spend limits are checked set-wise by the
+    # posting engine, against the lines it actually posts
+    transfers = BulkTransferLineSerializer(many=True, allow_empty=False, max_length=10000)
+
+
+class HoldSerializer(serializers.ModelSerializer):
+    wallet = serializers.SlugRelatedField(slug_field="account_number", read_only=True)
+    merchant = AccountNumberField(role="merchant")
+    expires_at = serializers.DateTimeField(required=False)
+
+    class Meta:
+        model = Hold
+        fields = [
+            "id", "wallet", "merchant", "amount", "captured_amount", "description", "status", "expires_at",
+            "created_at", "settled_at", "transaction",
+        ]
+        read_only_fields = ["id", "wallet", "captured_amount", "status", "created_at", "settled_at", "transaction"]
+
+    def validate(self, attrs):
+        wallet = self.context["request"].user.wallet
+        now = timezone.now()
+        if attrs["amount"] < services.MINIMUM_AMOUNT:
+            raise serializers.ValidationError({"amount": f"Amount must be {services.MINIMUM_AMOUNT} and above"})
+        if attrs["merchant"] == wallet:
+            raise serializers.ValidationError({"merchant": "You cannot authorize a payment to your own wallet."})
+        attrs.setdefault("expires_at", now + settings.PAYMENT_HOLD_TTL)
+        if attrs["expires_at"] <= now:
+            raise serializers.ValidationError({"expires_at": "Expiry must be in the future."})
+        if attrs["expires_at"] > now + settings.PAYMENT_HOLD_MAX_TTL:
+            raise serializers.ValidationError({"expires_at": f"A hold can last at most {settings.PAYMENT_HOLD_MAX_TTL.days} days."})
+        if wallet.available_balance() < attrs["amount"]:
+            raise serializers.ValidationError({"balance": "Insufficient funds to authorize this payment."})
+        # The captured payment will leave the wallet, so it counts against the spend limits now,
+        # together with the wallet's other open holds
+        reason = limits.check(wallet, attrs["amount"] + wallet.held_balance)
+        if reason:
+            raise serializers.ValidationError({"limit": reason})
+        return attrs
+
+    def create(self, validated_data):
+        try:
+            return services.authorize_hold(
+                self.context["request"].user.wallet,
+                validated_data["merchant"],
+                validated_data["amount"],
+                validated_data["expires_at"],
+                description=validated_data.get("description") or "",
+            )
+        except services.InsufficientFunds:
+            raise serializers.ValidationError({"balance": "Insufficient funds to authorize this payment."})
+        except services.LimitExceeded as exc:
+            raise serializers.ValidationError({"limit": str(exc)})
+        except services.PostingError as exc:
+            raise serializers.ValidationError({"detail": str(exc)})
+
+
+class HoldCaptureSerializer(serializers.Serializer):
+    # Leave out to capture the full amount held
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+
+
+class ReversalSerializer(serializers.Serializer):
+    reason = serializers.CharField(required=False, allow_blank=True, default="", max_length=200)
+
+
+class StatementQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    output = serializers.ChoiceField(choices=["csv", "ndjson"], default="csv")
+
+    def validate(self, attrs):
+        if attrs.get("start") and attrs.get("end") and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError({"end": "End date must be on or after the start date."})
+        return attrs
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    granularity = serializers.ChoiceField(choices=["day", "hour"], default="day")
+    transaction_type = serializers.ChoiceField(choices=[choice for choice, _ in Transaction.TRANSACTION_TYPES], required=False)
+    currency = serializers.ChoiceField(choices=[choice for choice, _ in Wallet.CURRENCY_CHOICES], required=False)
+
+    def validate(self, attrs):
+        if attrs.get("start") and attrs.get("end") and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError({"end": "End date must be on or after the start date."})
+        return attrs
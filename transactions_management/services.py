@@ -0,0 +1,619 @@
+import random
+import uuid
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.utils import timezone
+from wallet_management.models import Wallet, BalanceSlot
+from .models import Hold, Transaction
+from . import analytics, fx, ledger, limits
+
+
+# Posting engine: every balance change goes through here so that the wallet updates and the
+# transaction record are written as one atomic unit.
+
+class PostingError(Exception):
+    pass
+
+
+class InsufficientFunds(PostingError):
+    pass
+
+
+class AlreadyReversed(PostingError):
+    pass
+
+
+class HoldNotActive(PostingError):
+    pass
+
+
+class LimitExceeded(PostingError):
+    pass
+
+
+# Smallest amount accepted for a single posting line
+MINIMUM_AMOUNT = Decimal("100")
+
+# Rows per INSERT when bulk-creating transactions
+BULK_INSERT_BATCH_SIZE = 1000
+
+# Credits are applied in batches of this many wallets per UPDATE statement
+CREDIT_BATCH_SIZE = 500
+
+# Transaction type of the compensating entry for each type reversed
+REVERSAL_TYPES = {"transfer": "transfer", "credit": "debit", "debit": "credit"}
+
+
+def _credit_wallets(changes, wallet_ids, now):
+    if not wallet_ids:
+        return
+    if len(wallet_ids) == 1:
+        amount = changes[wallet_ids[0]]
+    else:
+        # One UPDATE ... SET balance = balance + CASE id WHEN ... END for the whole batch
+        amount = Case(
+            *[When(pk=wallet_id, then=Value(changes[wallet_id])) for wallet_id in wallet_ids],
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+    if Wallet.objects.filter(pk__in=wallet_ids).update(balance=F("balance") + amount, updated_at=now) != len(wallet_ids):
+        raise PostingError("Wallet not found.")
+
+
+def _debit_wallet(wallet_id, amount, now):
+    # UPDATE ... WHERE balance >= held_balance + amount: the funds check and the write are one
+    # statement, so concurrent debits can never overdraw the wallet or spend money on hold.
+    rows = Wallet.objects.filter(pk=wallet_id, balance__gte=F("held_balance") - amount)
+    if rows.update(balance=F("balance") + amount, updated_at=now):
+        return
+    # Part of a sharded wallet's money may still be sitting in its slots
+    if not (_sweep_slots(wallet_id, now) and rows.update(balance=F("balance") + amount, updated_at=now)):
+        raise InsufficientFunds("Insufficient funds for this transaction.")
+
+
+def _write_locked_balances(changes, wallet_ids, now):
+    # One prepared UPDATE executed for every wallet, for callers that already hold the row locks.
+    # With thousands of wallets this is far cheaper than CASE batches or one ORM update per row.
+    # The WHERE still keeps every row from going below its held amount, failing the whole batch if it would.
+    if not wallet_ids:
+        return
+    quote = connection.ops.quote_name
+    meta = Wallet._meta
+    balance, updated_at = meta.get_field("balance"), meta.get_field("updated_at")
+    sql = "UPDATE {table} SET {balance} = {balance} + %s, {updated_at} = %s WHERE {pk} = %s AND {balance} + %s >= {held}".format(
+        table=quote(meta.db_table), balance=quote(balance.column), updated_at=quote(updated_at.column), pk=quote(meta.pk.column),
+        held=quote(meta.get_field("held_balance").column),
+    )
+    written_at = updated_at.get_db_prep_save(now, connection)
+    params = []
+    for wallet_id in wallet_ids:
+        amount = balance.get_db_prep_save(changes[wallet_id], connection)
+        params.append([amount, written_at, wallet_id, amount])
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+        if cursor.rowcount != len(params):
+            raise InsufficientFunds("Insufficient funds for this transaction.")
+
+
+def _credit_slot(wallet_id, amount, slots):
+    # Sharded wallets take credits on a random slot row so concurrent receivers don't all queue
+    # on the wallet row. Returns False when the slot is gone (sharding was turned off meanwhile).
+    rows = BalanceSlot.objects.filter(wallet_id=wallet_id, slot=random.randrange(slots))
+    return rows.update(balance=F("balance") + amount) == 1
+
+
+def _sweep_slots(wallet_id, now):
+    # Fold everything credited to the wallet's slots back onto the wallet row. All slot rows are
+    # locked first, so a credit landing meanwhile waits for this transaction instead of being lost.
+    # Returns the amount moved.
+    slots = dict(BalanceSlot.objects.select_for_update().filter(wallet_id=wallet_id).values_list("id", "balance"))
+    swept = sum(slots.values(), Decimal("0.00"))
+    if swept:
+        BalanceSlot.objects.filter(pk__in=[slot_id for slot_id, amount in slots.items() if amount]).update(balance=Decimal("0.00"))
+        Wallet.objects.filter(pk=wallet_id).update(balance=F("balance") + swept, updated_at=now)
+    return swept
+
+
+def apply_balance_changes(changes, sharded=None, locked=False):
+    # `changes` maps wallet id -> signed amount; `sharded` maps the ids of wallets with balance
+    # slots to their slot count.
+    # Rows are updated in ascending id order so two postings touching the same wallets always
+    # take their row locks in the same order and cannot deadlock each other. A caller that already
+    # holds every row lock and has checked the funds (`locked`, see post_batch) gets all plain
+    # wallet rows written in one go instead.
+    now = timezone.now()
+    sharded = (sharded or {}) if settings.BALANCE_SHARDING else {}
+    if locked:
+        changes = dict(changes)
+        for wallet_id in sorted(sharded.keys() & changes.keys()):
+            amount = changes.pop(wallet_id)
+            if amount < 0:
+                _debit_wallet(wallet_id, amount, now)
+            elif not _credit_slot(wallet_id, amount, sharded[wallet_id]):
+                _credit_wallets({wallet_id: amount}, [wallet_id], now)
+        _write_locked_balances(changes, sorted(changes), now)
+        return
+
+    credits = []
+    for wallet_id in sorted(changes):
+        amount = changes[wallet_id]
+        if amount >= 0:
+            if wallet_id in sharded and _credit_slot(wallet_id, amount, sharded[wallet_id]):
+                continue
+            credits.append(wallet_id)
+            if len(credits) == CREDIT_BATCH_SIZE:
+                _credit_wallets(changes, credits, now)
+                credits = []
+            continue
+
+        _credit_wallets(changes, credits, now)
+        credits = []
+        _debit_wallet(wallet_id, amount, now)
+    _credit_wallets(changes, credits, now)
+
+
+def conversion(amount, from_currency, to_currency):
+    # (converted amount, rate) for money moving between two currencies, (None, None) within one.
+    # The rate is read once and the same value is applied to the balances and recorded.
+    if from_currency == to_currency:
+        return None, None
+    rate = fx.get_rate(from_currency, to_currency)
+    if rate is None:
+        raise PostingError(f"No exchange rate from {from_currency} to {to_currency}.")
+    converted = fx.convert(amount, rate)
+    if converted <= 0:
+        raise PostingError(f"Amount is too small to convert to {to_currency}.")
+    return converted, rate
+
+
+def set_balance_slots(wallet, slots):
+    # Turn sharded balances on (slots > 0), resize them, or turn them off (slots == 0).
+    # Slot balances are folded into the wallet row first, so the total never changes.
+    if slots and not settings.BALANCE_SHARDING:
+        raise PostingError("Balance sharding is turned off (settings.BALANCE_SHARDING).")
+    with transaction.atomic():
+        _sweep_slots(wallet.pk, timezone.now())
+        BalanceSlot.objects.filter(wallet_id=wallet.pk, slot__gte=slots).delete()
+        BalanceSlot.objects.bulk_create(
+            [BalanceSlot(wallet_id=wallet.pk, slot=slot) for slot in range(slots)], ignore_conflicts=True
+        )
+        Wallet.objects.filter(pk=wallet.pk).update(balance_slots=slots)
+    wallet.refresh_from_db(fields=["balance", "balance_slots", "updated_at"])
+
+
+def _check_limits(wallet, amount, postings=1):
+    # Spend limits are enforced again inside the posting's atomic block, after the sender's row has
+    # been written (and so locked): concurrent postings from one wallet see each other's counters
+    reason = limits.check(wallet, amount, postings)
+    if reason:
+        raise LimitExceeded(reason)
+
+
+def post_transaction(wallet, transaction_type, amount, receiver=None, description=""):
+    # Post a credit, debit or transfer initiated by `wallet` and return the Transaction record.
+    # Money leaving the wallet counts against its spend limits.
+    amount = Decimal(amount)
+    converted_amount = exchange_rate = None
+
+    if transaction_type == "transfer":
+        if receiver is None or receiver.pk == wallet.pk:
+            raise PostingError("A transfer needs a receiver wallet different from the sender.")
+        sender, recipient = wallet, receiver
+    elif transaction_type == "credit":
+        sender, recipient = None, wallet
+    elif transaction_type == "debit":
+        sender, recipient = wallet, None
+    else:
+        raise PostingError(f"Unknown transaction type: {transaction_type}")
+
+    with transaction.atomic():
+        # Currencies and slot counts are read from the rows, never taken from the instances passed
+        # in: a receiver resolved from the account number cache carries neither
+        parties = {
+            wallet_id: (slots, currency)
+            for wallet_id, slots, currency in Wallet.objects.filter(
+                pk__in=[party.pk for party in (sender, recipient) if party is not None]
+            ).values_list("pk", "balance_slots", "currency")
+        }
+        if wallet.pk not in parties:
+            raise PostingError("Wallet not found.")
+        if recipient is not None and recipient.pk not in parties:
+            # A receiver resolved from the cache may have been deleted since
+            raise PostingError("Receiver account not found.")
+        currency = parties[wallet.pk][1]
+        changes = {}
+        if sender is not None:
+            changes[sender.pk] = -amount
+        if recipient is not None:
+            if sender is not None:
+                converted_amount, exchange_rate = conversion(amount, currency, parties[recipient.pk][1])
+            changes[recipient.pk] = converted_amount or amount
+        apply_balance_changes(changes, {wallet_id: slots for wallet_id, (slots, _) in parties.items() if slots})
+        if sender is not None:
+            _check_limits(sender, amount)
+        record = Transaction.objects.create(
+            sender=sender,
+            receiver=recipient,
+            amount=amount,
+            transaction_type=transaction_type,
+            description=description,
+            converted_amount=converted_amount,
+            exchange_rate=exchange_rate,
+        )
+        ledger.record(record)
+        analytics.record([record], currency)
+        limits.record([record])
+
+    # Keep the caller's in-memory wallet in step with the row we just updated
+    wallet.refresh_from_db(fields=["balance", "updated_at"])
+    return record
+
+
+def credit(wallet, amount, description=""):
+    return post_transaction(wallet, "credit", amount, description=description)
+
+
+def debit(wallet, amount, description=""):
+    return post_transaction(wallet, "debit", amount, description=description)
+
+
+def transfer(sender, receiver, amount, description=""):
+    return post_transaction(sender, "transfer", amount, receiver=receiver, description=description)
+
+
+def post_bulk_transfer(wallet, lines):
+    # Post many transfers from `wallet` in one database transaction.
+    # `lines` is a list of dicts with "receiver" (account number), "amount" and "description".
+    # Returns (batch_reference, results) where results has one entry per input line; lines that
+    # cannot be posted are reported as failed and the rest of the batch still goes through.
+    account_numbers = {str(line["receiver"]) for line in lines}
+    receivers = list(
+        Wallet.objects.filter(account_number__in=account_numbers).values_list("account_number", "pk", "balance_slots", "currency")
+    )
+    wallet_ids = {account_number: pk for account_number, pk, _, _ in receivers}
+    currencies = {pk: currency for _, pk, _, currency in receivers}
+    sharded = {pk: slots for _, pk, slots, _ in receivers if slots}
+
+    results = []
+    changes = {}
+    total = Decimal("0.00")
+    for index, line in enumerate(lines):
+        account_number = str(line["receiver"])
+        result = {"line": index, "receiver": account_number, "amount": line["amount"], "status": "failed", "transaction_id": None}
+        results.append(result)
+
+        try:
+            amount = Decimal(line["amount"])
+        except (InvalidOperation, TypeError):
+            result["error"] = "Invalid amount."
+            continue
+        receiver_id = wallet_ids.get(account_number)
+        if receiver_id is None:
+            result["error"] = "Receiver account not found."
+        elif receiver_id == wallet.pk:
+            result["error"] = "You cannot transfer to your own wallet."
+        elif amount < MINIMUM_AMOUNT:
+            result["error"] = f"Amount must be {MINIMUM_AMOUNT} and above"
+        else:
+            try:
+                converted_amount, exchange_rate = conversion(amount, wallet.currency, currencies[receiver_id])
+            except PostingError as exc:
+                result["error"] = str(exc)
+                continue
+            result["status"] = "posted"
+            result["receiver_id"] = receiver_id
+            result["conversion"] = converted_amount, exchange_rate
+            changes[receiver_id] = changes.get(receiver_id, Decimal("0.00")) + (converted_amount or amount)
+            total += amount
+
+    posted = [result for result in results if result["status"] == "posted"]
+    if not posted:
+        raise PostingError("No valid transfer lines in this batch.")
+    # Validate total funds once for the whole batch instead of per line
+    if wallet.available_balance() < total:
+        raise InsufficientFunds("Insufficient funds for this batch.")
+
+    batch_reference = uuid.uuid4()
+    changes[wallet.pk] = -total
+    with transaction.atomic():
+        apply_balance_changes(changes, sharded)
+        _check_limits(wallet, total, len(posted))
+        records = Transaction.objects.bulk_create(
+            [
+                Transaction(
+                    sender_id=wallet.pk,
+                    receiver_id=result["receiver_id"],
+                    amount=Decimal(result["amount"]),
+                    transaction_type="transfer",
+                    description=lines[result["line"]].get("description", ""),
+                    batch_reference=batch_reference,
+                    converted_amount=result["conversion"][0],
+                    exchange_rate=result["conversion"][1],
+                )
+                for result in posted
+            ],
+            batch_size=BULK_INSERT_BATCH_SIZE,
+        )
+        ledger.record(*records)
+        analytics.record(records, wallet.currency)
+        limits.record(records)
+
+    for result, record in zip(posted, records):
+        del result["receiver_id"], result["conversion"]
+        result["transaction_id"] = record.pk
+    wallet.refresh_from_db(fields=["balance", "updated_at"])
+    return batch_reference, results
+
+
+def posting_parties(transaction_type, wallet_id, receiver_id=None):
+    # (sender id, receiver id) of the Transaction that `wallet_id` initiates, as in post_transaction
+    if transaction_type == "transfer":
+        return wallet_id, receiver_id
+    if transaction_type == "credit":
+        return None, wallet_id
+    return wallet_id, None
+
+
+def post_batch(postings):
+    # Post many independent postings (queued or scheduled) in the caller's atomic block. Each item
+    # needs wallet_id, receiver_id, transaction_type, amount and description.
+    # Every wallet involved is locked once and gets a single net balance update, instead of one
+    # lock round trip per posting. The postings are replayed in order against in-memory balances,
+    # so each still gets its own funds and spend-limit check and a failure only affects that
+    # posting.
+    # Returns one entry per posting: its Transaction, or the reason it was rejected.
+    parties = [posting_parties(posting.transaction_type, posting.wallet_id, posting.receiver_id) for posting in postings]
+    wallet_ids = {wallet_id for pair in parties for wallet_id in pair if wallet_id is not None}
+    wallets = {}
+    tiers = {}
+    for wallet_id, balance, held, slots, currency, kyc_status, role in (
+        Wallet.objects.select_for_update(of=("self",)).filter(pk__in=wallet_ids).order_by("pk")
+        .values_list("pk", "balance", "held_balance", "balance_slots", "currency", "user__KYC_status", "user__role")
+    ):
+        wallets[wallet_id] = (balance - held, slots, currency)
+        tiers[wallet_id] = limits.tier_of(kyc_status, role)
+    # Spend limits are replayed like the balances: usage read once, then counted posting by posting
+    usage = {
+        wallet_id: list(used)
+        for wallet_id, used in limits.usage_many([sender_id for sender_id, _ in parties if sender_id in wallets]).items()
+    }
+    # Money on hold for merchants can't be spent
+    available = {wallet_id: balance for wallet_id, (balance, _, _) in wallets.items()}
+    for wallet_id, total in (
+        BalanceSlot.objects.filter(wallet_id__in=wallet_ids).values_list("wallet_id").annotate(total=Sum("balance")).order_by()
+    ):
+        available[wallet_id] += total
+
+    changes = defaultdict(Decimal)
+    results = []
+    accepted = []
+    for posting, (sender_id, receiver_id) in zip(postings, parties):
+        if any(wallet_id not in wallets for wallet_id in (sender_id, receiver_id) if wallet_id is not None):
+            results.append("Wallet not found.")
+            continue
+        converted_amount = exchange_rate = None
+        if sender_id is not None and receiver_id is not None:
+            try:
+                converted_amount, exchange_rate = conversion(posting.amount, wallets[sender_id][2], wallets[receiver_id][2])
+            except PostingError as exc:
+                results.append(str(exc))
+                continue
+        if sender_id is not None:
+            if available[sender_id] < posting.amount:
+                results.append("Insufficient funds for this transaction.")
+                continue
+            sent, posted = usage[sender_id]
+            reason = limits.exceeded(tiers[sender_id], wallets[sender_id][2], sent, posted, posting.amount)
+            if reason:
+                results.append(reason)
+                continue
+            usage[sender_id] = [sent + posting.amount, posted + 1]
+            available[sender_id] -= posting.amount
+            changes[sender_id] -= posting.amount
+        if receiver_id is not None:
+            available[receiver_id] += converted_amount or posting.amount
+            changes[receiver_id] += converted_amount or posting.amount
+        record = Transaction(
+            sender_id=sender_id,
+            receiver_id=receiver_id,
+            amount=posting.amount,
+            transaction_type=posting.transaction_type,
+            description=posting.description,
+            converted_amount=converted_amount,
+            exchange_rate=exchange_rate,
+        )
+        results.append(record)
+        accepted.append((posting, record))
+
+    apply_balance_changes(changes, {wallet_id: slots for wallet_id, (_, slots, _) in wallets.items() if slots}, locked=True)
+    Transaction.objects.bulk_create([record for _, record in accepted], batch_size=BULK_INSERT_BATCH_SIZE)
+    ledger.record(*[record for _, record in accepted])
+    by_currency = defaultdict(list)
+    for posting, record in accepted:
+        by_currency[wallets[posting.wallet_id][2]].append(record)
+    for currency, records in by_currency.items():
+        analytics.record(records, currency)
+    limits.record([record for _, record in accepted])
+    return results
+
+
+def _compensation(original, description, batch_reference):
+    # The entry that undoes `original`: the parties swap places and each wallet gets back exactly
+    # what the original moved, in its own currency
+    if original.converted_amount is None:
+        amount, converted_amount, exchange_rate = original.amount, None, None
+    else:
+        amount, converted_amount = original.converted_amount, original.amount
+        exchange_rate = (original.amount / original.converted_amount).quantize(fx.RATE_PLACES)
+    return Transaction(
+        sender_id=original.receiver_id,
+        receiver_id=original.sender_id,
+        amount=amount,
+        transaction_type=REVERSAL_TYPES[original.transaction_type],
+        description=description,
+        batch_reference=batch_reference,
+        converted_amount=converted_amount,
+        exchange_rate=exchange_rate,
+        reversal_of_id=original.pk,
+    )
+
+
+def reverse_transactions(originals, reason="", batch_reference=None):
+    # Post a compensating transaction for each of `originals` in one database transaction, all or
+    # nothing: if any wallet that has to give money back is short, nothing is reversed.
+    # Returns the compensating transactions.
+    if any(original.reversal_of_id is not None for original in originals):
+        raise PostingError("A reversal cannot itself be reversed.")
+    if Transaction.objects.filter(reversal_of__in=[original.pk for original in originals]).exists():
+        raise AlreadyReversed("This transaction has already been reversed.")
+
+    reversals = [
+        _compensation(original, f"Reversal of transaction {original.pk}" + (f": {reason}" if reason else ""), batch_reference)
+        for original in originals
+    ]
+    changes = defaultdict(Decimal)
+    for reversal in reversals:
+        if reversal.sender_id is not None:
+            changes[reversal.sender_id] -= reversal.amount
+        if reversal.receiver_id is not None:
+            changes[reversal.receiver_id] += reversal.converted_amount or reversal.amount
+    wallets = {
+        wallet_id: (slots, currency)
+        for wallet_id, slots, currency in Wallet.objects.filter(pk__in=changes).values_list("pk", "balance_slots", "currency")
+    }
+
+    try:
+        with transaction.atomic():
+            apply_balance_changes(changes, {wallet_id: slots for wallet_id, (slots, _) in wallets.items() if slots})
+            Transaction.objects.bulk_create(reversals, batch_size=BULK_INSERT_BATCH_SIZE)
+            ledger.record(*reversals)
+            by_currency = defaultdict(list)
+            for reversal in reversals:
+                # Amounts are in the currency of the wallet the money leaves (or arrives in, for a top-up)
+                by_currency[wallets[reversal.sender_id or reversal.receiver_id][1]].append(reversal)
+            for currency, records in by_currency.items():
+                analytics.record(records, currency)
+            # Not added to the spend counters: reversals are posted by operations staff and
+            # don't use up the wallet's own limits
+    except IntegrityError:
+        # Another reversal of one of these transactions committed first
+        raise AlreadyReversed("This transaction has already been reversed.")
+    return reversals
+
+
+def reverse_transaction(original, reason=""):
+    return reverse_transactions([original], reason)[0]
+
+
+def reverse_batch(batch_reference, reason=""):
+    # Reverse every transaction of a bulk transfer that hasn't been reversed yet. The reversals
+    # share a new batch reference of their own. Returns (reversal batch reference, reversals).
+    originals = list(
+        Transaction.objects.filter(batch_reference=batch_reference, reversal_of__isnull=True, reversal__isnull=True).order_by("id")
+    )
+    if not originals:
+        raise PostingError("Nothing left to reverse in this batch.")
+    reversal_reference = uuid.uuid4()
+    return reversal_reference, reverse_transactions(originals, reason, reversal_reference)
+
+
+def _release_holds(totals, now):
+    # Give held money back to the wallets' available balance; `totals` maps wallet id -> amount
+    wallet_ids = sorted(totals)
+    for start in range(0, len(wallet_ids), CREDIT_BATCH_SIZE):
+        batch = wallet_ids[start:start + CREDIT_BATCH_SIZE]
+        if len(batch) == 1:
+            amount = totals[batch[0]]
+        else:
+            amount = Case(
+                *[When(pk=wallet_id, then=Value(totals[wallet_id])) for wallet_id in batch],
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        Wallet.objects.filter(pk__in=batch).update(held_balance=F("held_balance") - amount, updated_at=now)
+
+
+def _settle_hold(hold, status, now, **fields):
+    # UPDATE ... WHERE status = 'authorized': whichever of capture, void or expiry gets there first
+    # settles the hold, and every other attempt sees zero rows updated
+    rows = Hold.objects.filter(pk=hold.pk, status="authorized")
+    if status == "captured":
+        # A hold past its expiry can still be voided or expired, never captured
+        rows = rows.filter(expires_at__gt=now)
+    if not rows.update(status=status, settled_at=now, **fields):
+        raise HoldNotActive("This hold is no longer active.")
+    _release_holds({hold.wallet_id: hold.amount}, now)
+
+
+def authorize_hold(wallet, merchant, amount, expires_at, description=""):
+    # Reserve `amount` of `wallet` for `merchant` until `expires_at` and return the Hold. The
+    # balance stays where it is; only held_balance rises, so debits can no longer spend it.
+    amount = Decimal(amount)
+    if merchant.pk == wallet.pk:
+        raise PostingError("A hold needs a merchant wallet different from the customer's.")
+    now = timezone.now()
+    with transaction.atomic():
+        # Same single-statement funds check as _debit_wallet, against the available balance
+        rows = Wallet.objects.filter(pk=wallet.pk, balance__gte=F("held_balance") + amount)
+        if not rows.update(held_balance=F("held_balance") + amount, updated_at=now):
+            if not (_sweep_slots(wallet.pk, now) and rows.update(held_balance=F("held_balance") + amount, updated_at=now)):
+                raise InsufficientFunds("Insufficient funds to authorize this payment.")
+        # Everything the wallet's open holds promise merchants, this one included, has to fit in the
+        # spend limits on top of what was already sent. Holds record nothing in the spend counters
+        # themselves; the capture is checked again when the money moves.
+        _check_limits(wallet, Wallet.objects.filter(pk=wallet.pk).values_list("held_balance", flat=True).get())
+        hold = Hold.objects.create(wallet=wallet, merchant=merchant, amount=amount, description=description, expires_at=expires_at)
+    wallet.refresh_from_db(fields=["balance", "held_balance", "updated_at"])
+    return hold
+
+
+def capture_hold(hold, amount=None):
+    # Capture `amount` (default: all of it) of an authorized hold: the hold is released and the
+    # transfer to the merchant posted in one database transaction. Whatever isn't captured goes
+    # back to the customer's available balance. Returns the Transaction.
+    amount = hold.amount if amount is None else Decimal(amount)
+    if not 0 < amount <= hold.amount:
+        raise PostingError("Capture amount must be more than zero and no more than the amount held.")
+    now = timezone.now()
+    if hold.expires_at <= now:
+        raise HoldNotActive("This hold has expired.")
+    with transaction.atomic():
+        _settle_hold(hold, "captured", now, captured_amount=amount)
+        # Checked against the spend limits like any transfer: authorizing a hold records no usage
+        record = post_transaction(hold.wallet, "transfer", amount, receiver=hold.merchant, description=hold.description or "")
+        Hold.objects.filter(pk=hold.pk).update(transaction=record)
+    hold.refresh_from_db()
+    hold.wallet.refresh_from_db(fields=["balance", "held_balance", "updated_at"])
+    return record
+
+
+def void_hold(hold):
+    # Cancel an authorized hold and give the money back to the customer's available balance
+    with transaction.atomic():
+        _settle_hold(hold, "voided", timezone.now())
+    hold.refresh_from_db()
+
+
+def expire_holds(batch_size=1000, now=None):
+    # Release up to `batch_size` holds that passed their expiry while still authorized, in one
+    # database transaction: one UPDATE marks them expired and each wallet's held_balance drops by
+    # its total in a CASE batch. Returns the number of holds expired.
+    now = now or timezone.now()
+    with transaction.atomic():
+        # Claimed rows are locked, so a capture or void racing with the sweep waits for it and then
+        # finds the hold settled; workers skip each other's rows
+        expired = list(
+            Hold.objects.select_for_update(skip_locked=True)
+            .filter(status="authorized", expires_at__lte=now)
+            .order_by("expires_at", "id")
+            .values_list("pk", "wallet_id", "amount")[:batch_size]
+        )
+        if not expired:
+            return 0
+        Hold.objects.filter(pk__in=[hold_id for hold_id, _, _ in expired], status="authorized").update(status="expired", settled_at=now)
+        totals = defaultdict(Decimal)
+        for _, wallet_id, amount in expired:
+            totals[wallet_id] += amount
+        _release_holds(totals, now)
+    return len(expired)
@@ -0,0 +1,120 @@
+import csv
+import heapq
+import itertools
+import io
+import json
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Max, Sum
+from .models import Transaction, ArchivedTransaction
+from .fx import RECEIVED_AMOUNT
+
+
+# Statement export: rows are streamed from the database in chunks and written out as they arrive,
+# so memory stays flat no matter how many transactions the statement covers.
+
+STATEMENT_FIELDS = ["id", "transaction_time", "transaction_type", "direction", "counterparty", "amount", "balance", "description"]
+
+# Rows fetched per database round trip and written per response chunk
+CHUNK_SIZE = 2000
+
+ROW_VALUES = ("id", "transaction_time", "transaction_type", "amount", "converted_amount", "description", "sender_id", "sender__account_number", "receiver__account_number")
+
+
+def _sources(wallet, start):
+    # Tables holding the wallet's transactions from `start` onwards, oldest first. The archive only
+    # holds rows up to the wallet's archived_until mark, so later ranges never touch it.
+    if wallet.archived_until is not None and (start is None or start <= wallet.archived_until):
+        return [ArchivedTransaction, Transaction]
+    return [Transaction]
+
+
+def _net_flow(model, wallet, start, last_id):
+    # Money received minus money sent by `wallet` from `start` onwards (every posting has the
+    # wallet as receiver when it adds funds and as sender when it removes them). Money received
+    # through a currency conversion counts at the converted amount.
+    received = model.objects.filter(receiver=wallet, id__lte=last_id)
+    sent = model.objects.filter(sender=wallet, id__lte=last_id)
+    if start is not None:
+        received = received.filter(transaction_time__gte=start)
+        sent = sent.filter(transaction_time__gte=start)
+    total_in = received.aggregate(total=Sum(RECEIVED_AMOUNT))["total"] or Decimal("0.00")
+    total_out = sent.aggregate(total=Sum("amount"))["total"] or Decimal("0.00")
+    return total_in - total_out
+
+
+def opening_position(wallet, start):
+    # Balance at `start`, the id of the newest transaction included in the statement and the tables
+    # to read. All are read in one transaction so the running balance lines up with the rows streamed.
+    with transaction.atomic():
+        last_id = Transaction.objects.aggregate(last=Max("id"))["last"] or 0
+        wallet = type(wallet).objects.get(pk=wallet.pk)
+        sources = _sources(wallet, start)
+        flow = sum((_net_flow(model, wallet, start, last_id) for model in sources), Decimal("0.00"))
+        return wallet.total_balance() - flow, last_id, sources
+
+
+def statement_rows(wallet, start=None, end=None):
+    # Yield the wallet's transactions oldest first with a running balance.
+    # Sent and received rows are read as two index-ordered streams and merged on the fly, so the
+    # first rows are produced immediately instead of after a full sort.
+    balance, last_id, sources = opening_position(wallet, start)
+    merged = []
+    for model in sources:
+        streams = []
+        for branch in (model.objects.filter(sender=wallet), model.objects.filter(receiver=wallet)):
+            branch = branch.filter(id__lte=last_id)
+            if start is not None:
+                branch = branch.filter(transaction_time__gte=start)
+            if end is not None:
+                branch = branch.filter(transaction_time__lt=end)
+            streams.append(branch.order_by("transaction_time", "id").values(*ROW_VALUES).iterator(chunk_size=CHUNK_SIZE))
+        merged.append(heapq.merge(*streams, key=lambda row: (row["transaction_time"], row["id"])))
+
+    # Archived rows all precede the hot ones, so the archive stream is simply read first
+    for row in itertools.chain(*merged):
+        outgoing = row["sender_id"] == wallet.pk
+        amount = row["amount"] if outgoing or row["converted_amount"] is None else row["converted_amount"]
+        balance += -amount if outgoing else amount
+        yield {
+            "id": row["id"],
+            "transaction_time": row["transaction_time"].isoformat(),
+            "transaction_type": row["transaction_type"],
+            "direction": "debit" if outgoing else "credit",
+            "counterparty": (row["receiver__account_number"] if outgoing else row["sender__account_number"]) or "",
+            "amount": f"{amount:f}",
+            "balance": f"{balance:f}",
+            "description": row["description"] or "",
+        }
+
+
+def _chunked(lines):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) == CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_csv(rows):
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=STATEMENT_FIELDS)
+
+    def lines():
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            # Hand over whatever the writer produced and reuse the buffer
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+        yield output.getvalue()
+
+    return _chunked(lines())
+
+
+def stream_ndjson(rows):
+    return _chunked(json.dumps(row) + "\n" for row in rows)
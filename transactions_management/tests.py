@@ -1,3 +1,1076 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import csv
+import io
+import json
+import random
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Sum
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from user.models import User
+from wallet_management.models import Wallet
+from wallet_management import resolver
+from .models import Transaction, ArchivedTransaction, ExchangeRate, Hold, LedgerEntry, LedgerCheckpoint, PendingPosting, ScheduledTransfer, SpendCounter
+from .ledger import ledger_balance
+from .pagination import TransactionCursorPagination
+from .serializers import TransactionSerializer, TransactionReadSerializer
+from . import fx, limits, outbox, schedules, search, services
+from .management.commands import reconcile_wallets
 
-# Create your tests here.
+
+def make_wallet(email, balance="0.00", role="customer"):
+    user = User.objects.create_user(email=email, password="Str0ngPass!", first_name="Test", last_name="User", role=role)
+    Wallet.objects.filter(user=user).update(balance=Decimal(balance))
+    return Wallet.objects.get(user=user)
+
+
+class PostingServiceTests(TestCase):
+    def setUp(self):
+        self.alice = make_wallet("alice@example.com", "1000.00")
+        self.bob = make_wallet("bob@example.com", "0.00")
+
+    def test_transfer_moves_funds_and_records_transaction(self):
+        record = services.transfer(self.alice, self.bob, "400.00", "rent")
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.balance, Decimal("600.00"))
+        self.assertEqual(self.bob.balance, Decimal("400.00"))
+        self.assertEqual((record.sender, record.receiver), (self.alice, self.bob))
+
+    def test_insufficient_funds_rolls_back(self):
+        with self.assertRaises(services.InsufficientFunds):
+            services.transfer(self.alice, self.bob, "1000.01")
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.balance, Decimal("1000.00"))
+        self.assertEqual(self.bob.balance, Decimal("0.00"))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_credit_is_recorded_against_the_wallet(self):
+        record = services.credit(self.bob, "250.00")
+        self.assertEqual(self.bob.balance, Decimal("250.00"))
+        self.assertEqual(record.receiver, self.bob)
+
+
+@override_settings(BALANCE_SHARDING=True)
+class ShardedBalanceTests(TestCase):
+    def setUp(self):
+        self.merchant = make_wallet("shop@example.com", role="merchant")
+        self.payer = make_wallet("buyer@example.com")
+        services.credit(self.merchant, "200.00")
+        services.credit(self.payer, "5000.00")
+        services.set_balance_slots(self.merchant, 4)
+
+    def test_credits_land_on_slots_and_reads_include_them(self):
+        for _ in range(5):
+            services.transfer(self.payer, self.merchant, "300.00")
+        self.merchant.refresh_from_db()
+        self.assertEqual(self.merchant.balance, Decimal("200.00"))
+        self.assertEqual(self.merchant.total_balance(), Decimal("1700.00"))
+        self.assertEqual(self.merchant.slots.count(), 4)
+
+        out = io.StringIO()
+        call_command("reconcile_wallets", stdout=out)
+        self.assertIn("0 wallets drifted", out.getvalue())
+
+    def test_debit_sweeps_slots_when_wallet_row_is_short(self):
+        services.transfer(self.payer, self.merchant, "1000.00")
+        services.debit(self.merchant, "1100.00")
+        self.assertEqual(self.merchant.balance, Decimal("100.00"))
+        self.assertEqual(self.merchant.total_balance(), Decimal("100.00"))
+        with self.assertRaises(services.InsufficientFunds):
+            services.debit(self.merchant, "100.01")
+
+    def test_turning_sharding_off_keeps_the_total(self):
+        services.transfer(self.payer, self.merchant, "700.00")
+        services.set_balance_slots(self.merchant, 0)
+        self.assertEqual((self.merchant.balance, self.merchant.balance_slots), (Decimal("900.00"), 0))
+        self.assertFalse(self.merchant.slots.exists())
+        # A posting that still sees the old slot count falls back to the wallet row
+        stale = Wallet.objects.get(pk=self.merchant.pk)
+        stale.balance_slots = 4
+        services.credit(stale, "100.00")
+        self.assertEqual(stale.balance, Decimal("1000.00"))
+
+    def test_turning_the_setting_off_stops_crediting_slots(self):
+        services.transfer(self.payer, self.merchant, "700.00")
+        with override_settings(BALANCE_SHARDING=False):
+            services.transfer(self.payer, self.merchant, "300.00")
+            self.merchant.refresh_from_db()
+            # The new credit went to the wallet row; the earlier one is still counted from its slot
+            self.assertEqual((self.merchant.balance, self.merchant.total_balance()), (Decimal("500.00"), Decimal("1200.00")))
+            services.debit(self.merchant, "1200.00")
+            self.assertEqual(self.merchant.total_balance(), Decimal("0.00"))
+
+            with self.assertRaises(services.PostingError):
+                services.set_balance_slots(self.merchant, 2)
+            with self.assertRaises(CommandError):
+                call_command("set_balance_slots", self.merchant.account_number, "2", stdout=io.StringIO())
+            services.set_balance_slots(self.merchant, 0)
+        self.assertFalse(self.merchant.slots.exists())
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.alice = make_wallet("ledger-a@example.com")
+        self.bob = make_wallet("ledger-b@example.com")
+
+    def test_every_posting_writes_balanced_legs(self):
+        services.credit(self.alice, "1000.00")
+        services.transfer(self.alice, self.bob, "300.00")
+        services.debit(self.bob, "100.00")
+
+        self.assertEqual(LedgerEntry.objects.count(), 6)
+        for record in Transaction.objects.all():
+            legs = {leg.direction: leg for leg in record.ledger_entries.all()}
+            self.assertEqual(legs["debit"].amount, legs["credit"].amount)
+            self.assertEqual((legs["debit"].wallet_id, legs["credit"].wallet_id), (record.sender_id, record.receiver_id))
+
+    def test_balance_rebuilds_from_checkpoint_plus_recent_entries(self):
+        services.credit(self.alice, "1000.00")
+        services.transfer(self.alice, self.bob, "300.00")
+        call_command("checkpoint_ledger", settle_seconds=0, stdout=io.StringIO())
+        self.assertEqual(LedgerCheckpoint.objects.get(wallet=self.alice).balance, Decimal("700.00"))
+
+        services.transfer(self.bob, self.alice, "150.00")
+        services.debit(self.alice, "200.00")
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(ledger_balance(self.alice), self.alice.balance)
+        self.assertEqual(ledger_balance(self.bob), self.bob.balance)
+
+        # Running again only folds in what happened since the previous checkpoint
+        call_command("checkpoint_ledger", settle_seconds=0, stdout=io.StringIO())
+        self.assertEqual(LedgerCheckpoint.objects.get(wallet=self.alice).balance, Decimal("650.00"))
+        self.assertEqual(LedgerCheckpoint.objects.get(wallet=self.bob).balance, Decimal("150.00"))
+
+
+class ReconcileWalletsTests(TestCase):
+    def test_reports_only_drifted_wallets(self):
+        alice, bob = make_wallet("recon-a@example.com"), make_wallet("recon-b@example.com")
+        services.credit(alice, "1000.00")
+        services.transfer(alice, bob, "400.00")
+        Wallet.objects.filter(pk=bob.pk).update(balance=Decimal("450.00"))
+
+        out = io.StringIO()
+        call_command("reconcile_wallets", chunk_size=1, stdout=out)
+        self.assertIn(f"{bob.account_number}: stored 450.00, expected 400.00, drift 50.00", out.getvalue())
+        self.assertNotIn(alice.account_number, out.getvalue())
+        self.assertIn("1 wallets drifted", out.getvalue())
+
+    def test_ranges_split_wallets_evenly(self):
+        # Allocated numbers all start with 0, older random ones are spread over 10**9 and up
+        wallets = [make_wallet(f"recon{i}@example.com") for i in range(10)]
+        Wallet.objects.filter(pk__in=[wallet.pk for wallet in wallets[:2]]).update(account_number=F("id") + 9000000000)
+        ranges = reconcile_wallets.account_ranges(4)
+        self.assertEqual((ranges[0][0], ranges[-1][1]), (None, None))
+        sizes = [reconcile_wallets.reconcile_range(low, high, 3)[0] for low, high in ranges]
+        self.assertEqual(sum(sizes), Wallet.objects.count())
+        self.assertLessEqual(max(sizes) - min(sizes), 1)
+
+        out = io.StringIO()
+        call_command("reconcile_wallets", ranges=4, stdout=out)
+        self.assertIn(f"Checked {Wallet.objects.count()} wallets", out.getvalue())
+        self.assertIn("across 4 ranges", out.getvalue())
+
+
+class TransactionAnalyticsTests(TestCase):
+    def setUp(self):
+        self.alice = make_wallet("stats-a@example.com")
+        self.bob = make_wallet("stats-b@example.com")
+        services.credit(self.alice, "1000.00")
+        services.credit(self.alice, "500.00")
+        services.transfer(self.alice, self.bob, "300.00")
+        self.admin = User.objects.create_user(email="stats-ops@example.com", password="Str0ngPass!", role="admin", is_staff=True)
+        self.client = APIClient()
+
+    def rows(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse("admin-transaction-analytics"))
+        self.assertEqual(response.status_code, 200)
+        return {row["transaction_type"]: row for row in response.data["results"]}
+
+    def test_summary_is_served_from_rollups(self):
+        rows = self.rows()
+        self.assertEqual((rows["credit"]["count"], rows["credit"]["volume"], rows["credit"]["average"]), (2, Decimal("1500.00"), Decimal("750.00")))
+        self.assertEqual((rows["transfer"]["count"], rows["transfer"]["volume"]), (1, Decimal("300.00")))
+        self.assertEqual(rows["transfer"]["currency"], "NGN")
+
+    def test_rebuild_matches_incremental_rollups(self):
+        before = self.rows()
+        call_command("rollup_transactions", hours=2, include_current_hour=True, stdout=io.StringIO())
+        self.assertEqual(self.rows(), before)
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(self.alice.user)
+        self.assertEqual(self.client.get(reverse("admin-transaction-analytics")).status_code, 403)
+
+
+class BulkTransferTests(TestCase):
+    def setUp(self):
+        self.payer = make_wallet("payer@example.com", "100000.00", role="merchant")
+        self.staff = [make_wallet(f"staff{i}@example.com") for i in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.payer.user)
+
+    def test_bulk_transfer_posts_valid_lines_and_reports_failures(self):
+        lines = [{"receiver": wallet.account_number, "amount": "1000.00", "description": "salary"} for wallet in self.staff]
+        lines.append({"receiver": "0000000000", "amount": "1000.00"})
+        response = self.client.post(reverse("bulk_transfer"), {"transfers": lines}, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["posted"], response.data["failed"]), (3, 1))
+        self.assertEqual(response.data["results"][3]["error"], "Receiver account not found.")
+        self.payer.refresh_from_db()
+        self.assertEqual(self.payer.balance, Decimal("97000.00"))
+        self.assertEqual(Transaction.objects.filter(batch_reference=response.data["batch_reference"]).count(), 3)
+        for wallet in self.staff:
+            wallet.refresh_from_db()
+            self.assertEqual(wallet.balance, Decimal("1000.00"))
+
+    def test_spend_limits_count_only_the_lines_posted(self):
+        Wallet.objects.filter(pk=self.payer.pk).update(balance=Decimal("1000000.00"))
+        # Unverified payers may send 300,000 a day; the unknown receivers' lines are never posted
+        lines = [{"receiver": "0000000000", "amount": "400000.00"}, {"receiver": self.staff[0].account_number, "amount": "1000.00"}]
+        response = self.client.post(reverse("bulk_transfer"), {"transfers": lines}, format="json")
+        self.assertEqual((response.status_code, response.data["posted"], response.data["failed"]), (201, 1, 1))
+        self.assertEqual(limits.usage(self.payer), (Decimal("1000.00"), 1))
+
+        lines = [{"receiver": wallet.account_number, "amount": "150000.00"} for wallet in self.staff]
+        response = self.client.post(reverse("bulk_transfer"), {"transfers": lines}, format="json")
+        self.assertEqual((response.status_code, list(response.data)), (400, ["limit"]))
+
+    def test_account_numbers_sent_as_json_numbers_keep_their_leading_zeros(self):
+        receiver = self.staff[0].account_number
+        self.assertTrue(receiver.startswith("0"))
+        payload = {"receiver": int(receiver), "amount": "1000.00", "transaction_type": "transfer"}
+        self.assertEqual(self.client.post(reverse("create_transaction"), payload, format="json").status_code, 201)
+        lines = [{"receiver": int(receiver), "amount": "1000.00"}]
+        response = self.client.post(reverse("bulk_transfer"), {"transfers": lines}, format="json")
+        self.assertEqual((response.status_code, response.data["posted"]), (201, 1))
+        self.staff[0].refresh_from_db()
+        self.assertEqual(self.staff[0].balance, Decimal("2000.00"))
+
+    def test_bulk_transfer_rejects_batch_over_available_funds(self):
+        lines = [{"receiver": wallet.account_number, "amount": "40000.00"} for wallet in self.staff]
+        response = self.client.post(reverse("bulk_transfer"), {"transfers": lines}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
+
+
+class TransactionHistoryPaginationTests(TestCase):
+    def setUp(self):
+        self.wallet = make_wallet("history@example.com", "100000.00")
+        self.other = make_wallet("other@example.com")
+        for _ in range(25):
+            services.transfer(self.wallet, self.other, "100.00")
+        self.client = APIClient()
+        self.client.force_authenticate(self.wallet.user)
+
+    def test_cursor_pages_are_stable_under_new_inserts(self):
+        first = self.client.get(reverse("transaction-history"), {"page_size": 10})
+        self.assertEqual(len(first.data["results"]), 10)
+        self.assertIsNone(first.data["previous"])
+
+        # A transaction posted between page requests must not shift the following pages
+        services.credit(self.wallet, "500.00")
+        second = self.client.get(first.data["next"])
+        third = self.client.get(second.data["next"])
+        self.assertEqual(len(third.data["results"]), 5)
+        self.assertIsNone(third.data["next"])
+
+        ids = [row["id"] for page in (first, second, third) for row in page.data["results"]]
+        expected = list(Transaction.objects.filter(sender=self.wallet).order_by("-transaction_time", "-id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+
+        back = self.client.get(third.data["previous"])
+        self.assertEqual([row["id"] for row in back.data["results"]], [row["id"] for row in second.data["results"]])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse("transaction-history"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_past_the_end_gives_an_empty_page(self):
+        last = self.client.get(reverse("transaction-history"), {"page_size": 25})
+        self.assertIsNone(last.data["next"])
+        oldest = Transaction.objects.order_by("transaction_time", "id").first()
+        paginator = TransactionCursorPagination()
+        paginator.base_url = "http://testserver" + reverse("transaction-history")
+        past_end = paginator.encode_cursor((oldest.transaction_time, oldest.pk), reverse=False)
+
+        response = self.client.get(past_end)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["results"], response.data["next"]), ([], None))
+        # Paging back from there continues with the rows just newer than the cursor
+        back = self.client.get(response.data["previous"])
+        self.assertEqual(back.status_code, 200)
+        ids = [row["id"] for row in back.data["results"]]
+        newer = Transaction.objects.order_by("transaction_time", "id").values_list("id", flat=True)[1:len(ids) + 1]
+        self.assertEqual(ids, list(reversed(newer)))
+
+    def test_stale_admin_cursor_after_archiving(self):
+        admin = User.objects.create_user(email="archivist@example.com", password="Str0ngPass!", role="admin", is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        first = client.get(reverse("admin-transactions"), {"page_size": 10})
+
+        # Everything the next link points at moves to the archive table
+        Transaction.objects.update(transaction_time=timezone.now() - timedelta(days=400))
+        call_command("archive_transactions", stdout=io.StringIO())
+        response = client.get(first.data["next"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["results"], response.data["next"]), ([], None))
+        self.assertIsNotNone(response.data["previous"])
+
+
+class TransactionListQueryCountTests(TestCase):
+    # Serializing a page must cost a constant number of queries regardless of its size
+
+    def setUp(self):
+        self.wallet = make_wallet("reader@example.com", "1000000.00")
+        self.peer = make_wallet("peer@example.com")
+        self.admin = User.objects.create_user(email="ops@example.com", password="Str0ngPass!", role="admin", is_staff=True)
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        # Fresh instance so related objects cached during setUp don't hide queries
+        self.client.force_authenticate(User.objects.get(pk=user.pk))
+
+    def post_transfers(self, count):
+        for _ in range(count):
+            services.transfer(self.wallet, self.peer, "100.00")
+            services.credit(self.wallet, "100.00")
+
+    def test_history_query_count_is_constant(self):
+        for count in (2, 20):
+            self.post_transfers(count)
+            self.authenticate(self.wallet.user)
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse("transaction-history"), {"page_size": 50})
+            self.assertEqual(len(response.data["results"]), Transaction.objects.count())
+
+    def test_detail_query_count(self):
+        self.post_transfers(1)
+        record = Transaction.objects.get(transaction_type="transfer")
+        self.authenticate(self.wallet.user)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("transaction-detail", args=[record.pk]))
+        self.assertEqual(response.data["receiver"], self.peer.account_number)
+
+    def test_read_serializer_matches_model_serializer(self):
+        self.post_transfers(2)
+        services.debit(self.wallet, "150.00", "airtime")
+        request = SimpleNamespace(user=self.wallet.user)
+        queryset = Transaction.objects.order_by("-transaction_time", "-id")
+        expected = TransactionSerializer(queryset, many=True, context={"request": request}).data
+        rows = TransactionReadSerializer(queryset.values(*TransactionReadSerializer.VALUES), many=True, context={"request": request}).data
+        self.assertEqual([dict(row) for row in expected], rows)
+
+    def test_admin_list_query_count_is_constant(self):
+        for count in (2, 20):
+            self.post_transfers(count)
+            self.authenticate(self.admin)
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse("admin-transactions"), {"page_size": 50})
+            self.assertEqual(len(response.data["results"]), Transaction.objects.count())
+
+
+class AdminTransactionOrderingTests(TestCase):
+    def setUp(self):
+        self.wallet = make_wallet("orderer@example.com", "1000000.00")
+        self.peer = make_wallet("order-peer@example.com")
+        admin = User.objects.create_user(email="ledger-admin@example.com", password="Str0ngPass!", role="admin", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        for amount in ("500.00", "150.00", "500.00", "900.00", "150.00", "300.00", "120.00"):
+            services.transfer(self.wallet, self.peer, amount)
+
+    def walk(self, ordering, follow="next"):
+        response = self.client.get(reverse("admin-transactions"), {"ordering": ordering, "page_size": 2})
+        pages = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([row["id"] for row in response.data["results"]])
+            if not response.data[follow]:
+                return pages
+            response = self.client.get(response.data[follow])
+
+    def test_pages_follow_the_requested_ordering(self):
+        by_amount = list(Transaction.objects.order_by("amount", "id").values_list("id", flat=True))
+        self.assertEqual([pk for page in self.walk("amount") for pk in page], by_amount)
+        self.assertEqual([pk for page in self.walk("-amount") for pk in page], by_amount[::-1])
+
+    def test_previous_links_walk_back_over_the_same_pages(self):
+        forward = self.walk("-amount")
+        response = self.client.get(reverse("admin-transactions"), {"ordering": "-amount", "page_size": 2})
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+        backward = [[row["id"] for row in response.data["results"]]]
+        while response.data["previous"]:
+            response = self.client.get(response.data["previous"])
+            backward.append([row["id"] for row in response.data["results"]])
+        self.assertEqual(backward[::-1], forward)
+
+    def test_pages_never_count_the_table(self):
+        with CaptureQueriesContext(connections["default"]) as queries:
+            self.walk("amount")
+        self.assertFalse([query["sql"] for query in queries if "COUNT(" in query["sql"].upper()])
+
+
+class TransactionSearchTests(TestCase):
+    def setUp(self):
+        self.wallet = make_wallet("searcher@example.com", "1000000.00")
+        self.peer = make_wallet("landlord@example.com")
+        admin = User.objects.create_user(email="auditor@example.com", password="Str0ngPass!", role="admin", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        for month in range(5):
+            services.transfer(self.wallet, self.peer, "1000.00", f"Rent for month {month}")
+            services.debit(self.wallet, "200.00", "Electricity token")
+        services.credit(self.wallet, "500.00", "Rent refund")
+
+    def search(self, **params):
+        response = self.client.get(reverse("admin-transactions"), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_search_matches_words_and_prefixes(self):
+        self.assertEqual(len(self.search(search="rent").data["results"]), 6)
+        self.assertEqual(len(self.search(search="elec").data["results"]), 5)
+        self.assertEqual([row["description"] for row in self.search(search="rent month 3").data["results"]], ["Rent for month 3"])
+
+    def test_search_combines_with_filters(self):
+        results = self.search(search="rent", transaction_type="transfer").data["results"]
+        self.assertEqual(len(results), 5)
+        self.assertFalse(self.search(search="rent", receiver=self.wallet.pk, transaction_type="debit").data["results"])
+
+    def test_common_terms_are_matched_while_paging(self):
+        expected = list(
+            Transaction.objects.filter(description__icontains="rent").order_by("-transaction_time", "-id").values_list("id", flat=True)
+        )
+        with mock.patch.object(search, "SEEK_LIMIT", 2), mock.patch.object(TransactionCursorPagination, "match_chunk_size", 2):
+            seen, response = [], self.search(search="rent", page_size=4)
+            while True:
+                seen += [row["id"] for row in response.data["results"]]
+                if not response.data["next"]:
+                    break
+                response = self.client.get(response.data["next"])
+        self.assertEqual(seen, expected)
+
+    def test_index_follows_deletes(self):
+        Transaction.objects.filter(transaction_type="debit").delete()
+        self.assertFalse(self.search(search="electricity").data["results"])
+
+
+class ArchiveTransactionsTests(TestCase):
+    def setUp(self):
+        self.wallet = make_wallet("archive@example.com")
+        self.peer = make_wallet("archive-peer@example.com")
+        services.credit(self.wallet, "5000.00")
+        for amount in ("100.00", "200.00", "300.00", "400.00", "500.00"):
+            services.transfer(self.wallet, self.peer, amount)
+        # The credit and the first three transfers are a year old
+        self.ids = list(Transaction.objects.order_by("id").values_list("id", flat=True))
+        long_ago = timezone.now() - timedelta(days=400)
+        for offset, pk in enumerate(self.ids[:4]):
+            Transaction.objects.filter(pk=pk).update(transaction_time=long_ago + timedelta(minutes=offset))
+
+        call_command("archive_transactions", older_than=365, batch_size=3, stdout=io.StringIO())
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.wallet.user.pk))
+
+    def test_old_rows_move_to_the_archive(self):
+        self.assertEqual(list(ArchivedTransaction.objects.order_by("id").values_list("id", flat=True)), self.ids[:4])
+        self.assertEqual(list(Transaction.objects.order_by("id").values_list("id", flat=True)), self.ids[4:])
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.archived_until, ArchivedTransaction.objects.get(pk=self.ids[3]).transaction_time)
+
+        out = io.StringIO()
+        call_command("reconcile_wallets", stdout=out)
+        self.assertIn("0 wallets drifted", out.getvalue())
+        self.assertEqual(self.client.get(reverse("transaction-detail", args=[self.ids[0]])).status_code, 200)
+
+    def test_history_pages_continue_into_the_archive(self):
+        seen, url = [], reverse("transaction-history") + "?page_size=2"
+        while url:
+            page = self.client.get(url).data
+            seen += [row["id"] for row in page["results"]]
+            url = page["next"]
+        self.assertEqual(seen, self.ids[::-1])
+
+        # And back again from the oldest page
+        back = self.client.get(page["previous"]).data
+        self.assertEqual([row["id"] for row in back["results"]], self.ids[2:4][::-1])
+
+    def test_recent_pages_do_not_read_the_archive(self):
+        with CaptureQueriesContext(connections["default"]) as queries:
+            self.client.get(reverse("transaction-history"), {"page_size": 1})
+        self.assertFalse(any("archivedtransaction" in query["sql"] for query in queries.captured_queries))
+
+    def test_statement_includes_archived_rows(self):
+        response = self.client.get(reverse("transaction-statement"))
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual([int(row["id"]) for row in rows], self.ids)
+        self.assertEqual([row["balance"] for row in rows], ["5000.00", "4900.00", "4700.00", "4400.00", "4000.00", "3500.00"])
+
+
+class StatementExportTests(TestCase):
+    def setUp(self):
+        self.wallet = make_wallet("statement@example.com", "0.00")
+        self.peer = make_wallet("landlord@example.com", "0.00")
+        self.client = APIClient()
+        self.client.force_authenticate(self.wallet.user)
+
+    def test_csv_statement_has_running_balance(self):
+        services.credit(self.wallet, "5000.00", "salary")
+        services.transfer(self.wallet, self.peer, "1500.00", "rent")
+        services.transfer(self.peer, self.wallet, "200.00", "refund")
+        response = self.client.get(reverse("transaction-statement"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual([row["balance"] for row in rows], ["5000.00", "3500.00", "3700.00"])
+        self.assertEqual([row["direction"] for row in rows], ["credit", "debit", "credit"])
+        self.assertEqual(rows[1]["counterparty"], self.peer.account_number)
+
+    def test_ndjson_statement_opens_at_balance_on_start_date(self):
+        services.credit(self.wallet, "5000.00")
+        Transaction.objects.update(transaction_time=timezone.now() - timedelta(days=10))
+        services.debit(self.wallet, "1000.00")
+        start = (timezone.now() - timedelta(days=1)).date()
+        response = self.client.get(reverse("transaction-statement"), {"output": "ndjson", "start": start.isoformat()})
+
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual((lines[0]["amount"], lines[0]["balance"]), ("1000.00", "4000.00"))
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.wallet = make_wallet("retry@example.com", "1000.00")
+        self.peer = make_wallet("payee@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.wallet.user.pk))
+        self.payload = {"receiver": self.peer.account_number, "amount": "300.00", "transaction_type": "transfer", "description": "dinner"}
+
+    def post(self, payload, key="key-1"):
+        return self.client.post(reverse("create_transaction"), payload, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_original_response_without_posting_again(self):
+        first = self.post(self.payload)
+        self.assertEqual(first.status_code, 201)
+
+        # One indexed key lookup: no validation, no wallet reads or writes
+        with self.assertNumQueries(1):
+            retry = self.post(self.payload)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("700.00"))
+
+    def test_key_reused_with_different_payload_is_rejected(self):
+        self.post(self.payload)
+        response = self.post(dict(self.payload, amount="400.00"))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_failed_request_is_not_stored(self):
+        response = self.post(dict(self.payload, amount="5000.00"))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post(self.payload).status_code, 201)
+
+
+class AsyncPostingTests(TestCase):
+    def setUp(self):
+        self.wallet = make_wallet("queued@example.com", "1000.00")
+        self.peer = make_wallet("queued-payee@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.wallet.user.pk))
+
+    def post(self, amount):
+        payload = {"receiver": self.peer.account_number, "amount": amount, "transaction_type": "transfer"}
+        return self.client.post(reverse("create_transaction"), payload, format="json", HTTP_PREFER="respond-async")
+
+    def test_queued_posting_is_applied_by_the_worker(self):
+        response = self.post("600.00")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response["Location"], response.data["status_url"])
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(self.client.get(response.data["status_url"]).data["status"], "pending")
+
+        call_command("run_posting_worker", once=True, stdout=io.StringIO())
+        posting = self.client.get(response.data["status_url"]).data
+        self.assertEqual(posting["status"], "posted")
+        self.assertEqual(Transaction.objects.get().pk, posting["transaction"])
+        self.wallet.refresh_from_db()
+        self.peer.refresh_from_db()
+        self.assertEqual((self.wallet.balance, self.peer.balance), (Decimal("400.00"), Decimal("600.00")))
+
+    def test_each_posting_in_a_batch_gets_its_own_funds_check(self):
+        first, second, third = self.post("600.00"), self.post("600.00"), self.post("400.00")
+        call_command("run_posting_worker", once=True, stdout=io.StringIO())
+
+        statuses = [self.client.get(response.data["status_url"]).data for response in (first, second, third)]
+        self.assertEqual([posting["status"] for posting in statuses], ["posted", "failed", "posted"])
+        self.assertEqual(statuses[1]["error"], "Insufficient funds for this transaction.")
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("0.00"))
+        self.assertEqual(LedgerEntry.objects.count(), 4)
+
+
+class ScheduledTransferTests(TestCase):
+    def setUp(self):
+        self.wallet = make_wallet("landlord-payer@example.com", "1000.00")
+        self.landlord = make_wallet("landlord@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.wallet.user.pk))
+
+    def schedule(self, amount, starts_at, frequency="monthly"):
+        return ScheduledTransfer.objects.create(
+            wallet=self.wallet, receiver=self.landlord, amount=Decimal(amount), frequency=frequency,
+            description="rent", starts_at=starts_at, next_run_at=starts_at,
+        )
+
+    def test_create_through_the_api(self):
+        starts_at = timezone.now() + timedelta(days=1)
+        payload = {"receiver": self.landlord.account_number, "amount": "400.00", "frequency": "weekly", "starts_at": starts_at.isoformat()}
+        response = self.client.post(reverse("scheduled-transfers"), payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        schedule = ScheduledTransfer.objects.get(pk=response.data["id"])
+        self.assertEqual((schedule.wallet, schedule.next_run_at), (self.wallet, starts_at))
+
+        self.assertEqual(self.client.delete(reverse("scheduled-transfer-detail", args=[schedule.pk])).status_code, 204)
+        schedule.refresh_from_db()
+        self.assertFalse(schedule.is_active)
+
+    def test_due_schedules_are_posted_and_moved_on(self):
+        now = timezone.now()
+        rent = self.schedule("600.00", now - timedelta(hours=1))
+        later = self.schedule("100.00", now + timedelta(hours=1))
+        overdrawn = self.schedule("600.00", now - timedelta(minutes=30), frequency="daily")
+
+        self.assertEqual(schedules.run_due(now), (1, 1))
+        self.assertEqual(schedules.run_due(now), (0, 0))
+        rent.refresh_from_db()
+        overdrawn.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual((rent.last_status, rent.occurrence), ("posted", 1))
+        self.assertEqual(rent.next_run_at, schedules.occurrence_time(rent, 1))
+        self.assertEqual(rent.last_transaction.receiver, self.landlord)
+        self.assertEqual((overdrawn.last_status, overdrawn.last_error), ("failed", "Insufficient funds for this transaction."))
+        self.assertEqual(overdrawn.next_run_at, overdrawn.starts_at + timedelta(days=1))
+        self.assertIsNone(later.last_run_at)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("400.00"))
+
+    def test_monthly_runs_keep_their_day_of_the_month(self):
+        schedule = self.schedule("100.00", timezone.make_aware(timezone.datetime(2026, 1, 31, 9, 0)))
+        days = [schedules.occurrence_time(schedule, occurrence).date().isoformat() for occurrence in range(4)]
+        self.assertEqual(days, ["2026-01-31", "2026-02-28", "2026-03-31", "2026-04-30"])
+
+
+class ExchangeRateTests(TestCase):
+    def setUp(self):
+        self.naira = make_wallet("naira@example.com")
+        self.dollar = make_wallet("dollar@example.com")
+        Wallet.objects.filter(pk=self.dollar.pk).update(currency="USD")
+        self.dollar.refresh_from_db()
+        services.credit(self.naira, "500000.00")
+        ExchangeRate.objects.create(base_currency="USD", quote_currency="NGN", rate=Decimal("1500"))
+        # Test transactions roll back without running on-commit callbacks, so reset the cache by hand
+        fx.invalidate()
+        self.addCleanup(fx.invalidate)
+
+    def test_transfer_converts_into_receiver_currency(self):
+        record = services.transfer(self.naira, self.dollar, "150000.00", "tuition")
+        self.dollar.refresh_from_db()
+        self.assertEqual(self.naira.balance, Decimal("350000.00"))
+        self.assertEqual(self.dollar.balance, Decimal("100.00"))
+        self.assertEqual((record.converted_amount, record.exchange_rate), (Decimal("100.00"), Decimal("0.00066667")))
+        self.assertEqual(ledger_balance(self.dollar), Decimal("100.00"))
+
+        out = io.StringIO()
+        call_command("reconcile_wallets", stdout=out)
+        self.assertIn("0 wallets drifted", out.getvalue())
+
+    def test_transfer_uses_the_receiver_currency_read_at_posting_time(self):
+        resolver.clear()
+        self.addCleanup(resolver.clear)
+        payee = make_wallet("payee@example.com")
+        resolver.resolve(payee.account_number)
+        # A bulk update fires no signals, so the resolver still has the naira wallet cached
+        Wallet.objects.filter(pk=payee.pk).update(currency="USD")
+        serializer = TransactionSerializer(
+            data={"transaction_type": "transfer", "receiver": payee.account_number, "amount": "150000.00"},
+            context={"request": SimpleNamespace(user=self.naira.user)},
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        record = serializer.save()
+        self.assertEqual(record.converted_amount, Decimal("100.00"))
+        self.assertEqual(Wallet.objects.get(pk=payee.pk).balance, Decimal("100.00"))
+
+    def test_transfer_to_a_deleted_cached_receiver_is_rejected(self):
+        resolver.clear()
+        self.addCleanup(resolver.clear)
+        payee = make_wallet("gone@example.com")
+        receiver = resolver.wallet(resolver.resolve(payee.account_number))
+        # Deleted by another process: this one's cache still has the entry
+        Wallet.objects.filter(pk=payee.pk).delete()
+        with self.assertRaisesMessage(services.PostingError, "Receiver account not found."):
+            services.transfer(self.naira, receiver, "1000.00")
+        self.assertEqual(self.naira.balance, Decimal("500000.00"))
+
+    def test_transfer_without_rate_is_rejected(self):
+        euro = make_wallet("euro@example.com")
+        Wallet.objects.filter(pk=euro.pk).update(currency="EUR")
+        euro.refresh_from_db()
+        with self.assertRaises(services.PostingError):
+            services.transfer(self.naira, euro, "1000.00")
+        self.assertEqual(Transaction.objects.filter(transaction_type="transfer").count(), 0)
+
+    def test_cached_rate_lookups_skip_the_database(self):
+        self.assertEqual(fx.get_rate("USD", "NGN"), Decimal("1500"))
+        with self.assertNumQueries(0):
+            fx.get_rate("USD", "NGN")
+            fx.get_rate("NGN", "USD")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.filter(base_currency="USD").update(rate=Decimal("1600"))
+            ExchangeRate.objects.get(base_currency="USD").save()
+        self.assertEqual(fx.get_rate("USD", "NGN"), Decimal("1600"))
+
+    def test_import_command_upserts_rates_from_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "rates.csv"
+            path.write_text("base_currency,quote_currency,rate\nUSD,NGN,1550.5\nEUR,USD,1.08\n")
+            call_command("import_exchange_rates", str(path), stdout=io.StringIO())
+
+        self.assertEqual(ExchangeRate.objects.count(), 2)
+        self.assertEqual(fx.get_rate("USD", "NGN"), Decimal("1550.5"))
+        self.assertEqual(fx.get_rate("EUR", "USD"), Decimal("1.08"))
+
+
+class SpendLimitTests(TestCase):
+    def setUp(self):
+        self.wallet = make_wallet("spender@example.com", "1000000.00")
+        self.peer = make_wallet("payee@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.wallet.user)
+
+    def send(self, amount):
+        payload = {"receiver": self.peer.account_number, "amount": amount, "transaction_type": "transfer"}
+        return self.client.post(reverse("create_transaction"), payload, format="json")
+
+    def test_postings_update_the_hourly_counter(self):
+        services.transfer(self.wallet, self.peer, "1000.00")
+        services.debit(self.wallet, "500.00")
+        services.credit(self.wallet, "9000.00")
+        self.assertEqual(limits.usage(self.wallet), (Decimal("1500.00"), 2))
+        self.assertEqual(SpendCounter.objects.get(wallet=self.wallet).count, 2)
+
+    def test_holds_cannot_get_around_the_daily_limit(self):
+        merchant = make_wallet("checkout@example.com", role="merchant")
+        expires_at = timezone.now() + timedelta(days=1)
+        first = services.authorize_hold(self.wallet, merchant, "250000.00", expires_at)
+        # Open holds count together, before anything is captured
+        with self.assertRaises(services.LimitExceeded):
+            services.authorize_hold(self.wallet, merchant, "250000.00", expires_at)
+        response = self.client.post(reverse("holds"), {"merchant": merchant.account_number, "amount": "250000.00"}, format="json")
+        self.assertEqual((response.status_code, list(response.data)), (400, ["limit"]))
+
+        services.capture_hold(first)
+        with self.assertRaises(services.LimitExceeded):
+            services.authorize_hold(self.wallet, merchant, "250000.00", expires_at)
+
+        # Money sent after authorizing is checked again when the hold is captured
+        second = services.authorize_hold(self.wallet, merchant, "40000.00", expires_at)
+        services.transfer(self.wallet, self.peer, "30000.00")
+        with self.assertRaises(services.LimitExceeded):
+            services.capture_hold(second)
+        second.refresh_from_db()
+        self.assertEqual(second.status, "authorized")
+        self.assertEqual(limits.usage(self.wallet)[0], Decimal("280000.00"))
+
+    def test_buckets_roll_over_by_the_hour(self):
+        start = limits.hour_bucket(timezone.now()) + timedelta(minutes=50)
+        for offset in (timedelta(0), timedelta(minutes=20)):
+            limits.record([SimpleNamespace(sender_id=self.wallet.pk, transaction_time=start + offset, amount=Decimal("1000.00"))])
+
+        self.assertEqual(SpendCounter.objects.filter(wallet=self.wallet).count(), 2)
+        self.assertEqual(limits.usage(self.wallet, start), (Decimal("1000.00"), 1))
+        self.assertEqual(limits.usage(self.wallet, start + timedelta(minutes=20)), (Decimal("2000.00"), 1))
+        # Each bucket stays in the rolling window for 24 hours after its hour ends
+        self.assertEqual(limits.usage(self.wallet, start + timedelta(hours=23, minutes=5)), (Decimal("2000.00"), 0))
+        self.assertEqual(limits.usage(self.wallet, start + timedelta(hours=24, minutes=5)), (Decimal("1000.00"), 0))
+        self.assertEqual(limits.usage(self.wallet, start + timedelta(hours=24, minutes=20)), (Decimal("0.00"), 0))
+
+    def test_limit_check_is_one_query(self):
+        services.transfer(self.wallet, self.peer, "1000.00")
+        wallet = Wallet.objects.select_related("user").get(pk=self.wallet.pk)
+        with self.assertNumQueries(1):
+            self.assertIsNone(limits.check(wallet, Decimal("1000.00")))
+
+    def test_daily_limit_depends_on_kyc_tier(self):
+        self.assertEqual(self.send("250000.00").status_code, 201)
+        response = self.send("100000.00")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Daily limit", response.data["limit"][0])
+
+        User.objects.filter(pk=self.wallet.user.pk).update(KYC_status=True)
+        self.client.force_authenticate(User.objects.get(pk=self.wallet.user.pk))
+        self.assertEqual(self.send("100000.00").status_code, 201)
+
+    @override_settings(SPEND_LIMITS={"unverified": {"daily_amount": {}, "hourly_count": 2}})
+    def test_velocity_limit(self):
+        self.assertEqual(self.send("100.00").status_code, 201)
+        self.assertEqual(self.send("100.00").status_code, 201)
+        response = self.send("100.00")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Too many transactions", response.data["limit"][0])
+
+    def test_limits_are_enforced_when_queued_postings_run(self):
+        # Each request passes the up-front check; the worker must stop at the daily limit
+        for _ in range(5):
+            payload = {"receiver": self.peer.account_number, "amount": "250000.00", "transaction_type": "transfer"}
+            response = self.client.post(reverse("create_transaction"), payload, format="json", HTTP_PREFER="respond-async")
+            self.assertEqual(response.status_code, 202)
+        self.assertEqual(outbox.process_batch(), (1, 4))
+        self.assertEqual(Wallet.objects.get(pk=self.peer.pk).balance, Decimal("250000.00"))
+        self.assertTrue(all("Daily limit" in posting.error for posting in PendingPosting.objects.filter(status="failed")))
+
+        now = timezone.now()
+        schedule = ScheduledTransfer.objects.create(
+            wallet=self.wallet, receiver=self.peer, amount=Decimal("100000.00"), frequency="daily", starts_at=now, next_run_at=now
+        )
+        self.assertEqual(schedules.run_due(now), (0, 1))
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.last_status, "failed")
+        self.assertIn("Daily limit", schedule.last_error)
+
+        # Posting directly is checked too, so racing requests can't slip past the limit
+        with self.assertRaises(services.LimitExceeded):
+            services.transfer(self.wallet, self.peer, "100000.00")
+        self.assertEqual(limits.usage(self.wallet)[0], Decimal("250000.00"))
+
+
+class ReversalTests(TestCase):
+    def setUp(self):
+        self.payer = make_wallet("payroll@example.com", role="merchant")
+        services.credit(self.payer, "100000.00")
+        self.staff = [make_wallet(f"employee{i}@example.com") for i in range(3)]
+        admin = User.objects.create_user(email="ops-desk@example.com", password="Str0ngPass!", role="admin", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def balances(self):
+        return [Wallet.objects.get(pk=wallet.pk).balance for wallet in [self.payer, *self.staff]]
+
+    def test_reversal_restores_balances_once(self):
+        original = services.transfer(self.payer, self.staff[0], "2500.00", "wrong account")
+        response = self.client.post(reverse("transaction-reverse", args=[original.pk]), {"reason": "sent in error"}, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["reversal_of"], original.pk)
+        self.assertEqual((response.data["sender"], response.data["receiver"]), (self.staff[0].account_number, self.payer.account_number))
+        self.assertEqual(self.balances(), [Decimal("100000.00")] + [Decimal("0.00")] * 3)
+        self.assertEqual(ledger_balance(self.staff[0]), Decimal("0.00"))
+
+        again = self.client.post(reverse("transaction-reverse", args=[original.pk]), format="json")
+        self.assertEqual(again.status_code, 409)
+        with self.assertRaises(services.PostingError):
+            services.reverse_transaction(Transaction.objects.get(reversal_of=original))
+
+    def test_batch_reversal_is_all_or_nothing(self):
+        lines = [{"receiver": wallet.account_number, "amount": "1000.00"} for wallet in self.staff]
+        batch_reference, _ = services.post_bulk_transfer(self.payer, lines)
+        services.debit(self.staff[2], "600.00")
+
+        url = reverse("batch-reverse", args=[batch_reference])
+        response = self.client.post(url, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transaction.objects.filter(reversal_of__isnull=False).exists())
+
+        services.credit(self.staff[2], "600.00")
+        response = self.client.post(url, {"reason": "duplicate payroll"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["reversed"], response.data["total_amount"]), (3, Decimal("3000.00")))
+        self.assertEqual(self.balances(), [Decimal("100000.00"), Decimal("0.00"), Decimal("0.00"), Decimal("0.00")])
+        self.assertEqual(Transaction.objects.filter(batch_reference=response.data["reversal_batch_reference"]).count(), 3)
+        self.assertEqual(self.client.post(url, format="json").status_code, 400)
+
+        out = io.StringIO()
+        call_command("reconcile_wallets", stdout=out)
+        self.assertIn("0 wallets drifted", out.getvalue())
+
+
+class HoldTests(TestCase):
+    def setUp(self):
+        self.customer = make_wallet("shopper@example.com", "10000.00")
+        self.merchant = make_wallet("store@example.com", role="merchant")
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer.user)
+        self.merchant_client = APIClient()
+        self.merchant_client.force_authenticate(self.merchant.user)
+
+    def refreshed(self, wallet):
+        return Wallet.objects.get(pk=wallet.pk)
+
+    def test_authorize_capture_and_void(self):
+        response = self.client.post(reverse("holds"), {"merchant": self.merchant.account_number, "amount": "3000.00", "description": "order 17"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["status"], "authorized")
+        hold_id = response.data["id"]
+        self.assertEqual((self.refreshed(self.customer).balance, self.refreshed(self.customer).held_balance), (Decimal("10000.00"), Decimal("3000.00")))
+
+        # Held money can't be spent, by the API or by the posting engine
+        response = self.client.post(reverse("create_transaction"), {"transaction_type": "debit", "amount": "8000.00"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        with self.assertRaises(services.InsufficientFunds):
+            services.debit(self.refreshed(self.customer), "8000.00")
+
+        # Only the merchant captures, once; the uncaptured part goes back to the customer
+        self.assertEqual(self.client.post(reverse("hold-capture", args=[hold_id]), format="json").status_code, 404)
+        response = self.merchant_client.post(reverse("hold-capture", args=[hold_id]), {"amount": "2000.00"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["status"], response.data["captured_amount"]), ("captured", "2000.00"))
+        captured = Transaction.objects.get(pk=response.data["transaction"])
+        self.assertEqual((captured.sender_id, captured.receiver_id, captured.amount), (self.customer.pk, self.merchant.pk, Decimal("2000.00")))
+        customer = self.refreshed(self.customer)
+        self.assertEqual((customer.balance, customer.held_balance), (Decimal("8000.00"), Decimal("0.00")))
+        self.assertEqual(self.refreshed(self.merchant).balance, Decimal("2000.00"))
+        self.assertEqual(self.merchant_client.post(reverse("hold-capture", args=[hold_id]), format="json").status_code, 409)
+
+        hold = services.authorize_hold(customer, self.merchant, "5000.00", timezone.now() + timedelta(days=1))
+        response = self.merchant_client.post(reverse("hold-void", args=[hold.pk]), format="json")
+        self.assertEqual((response.status_code, response.data["status"]), (200, "voided"))
+        self.assertEqual(self.refreshed(self.customer).held_balance, Decimal("0.00"))
+        with self.assertRaises(services.HoldNotActive):
+            services.capture_hold(hold)
+
+        with self.assertRaises(services.InsufficientFunds):
+            services.authorize_hold(customer, self.merchant, "8000.01", timezone.now() + timedelta(days=1))
+        self.assertEqual(len(self.client.get(reverse("holds")).data), 2)
+
+    def test_expire_holds_releases_in_batches(self):
+        past = timezone.now() - timedelta(minutes=1)
+        lapsed = [services.authorize_hold(self.customer, self.merchant, "1000.00", past) for _ in range(3)]
+        services.authorize_hold(self.customer, self.merchant, "500.00", timezone.now() + timedelta(days=1))
+        with self.assertRaises(services.HoldNotActive):
+            services.capture_hold(lapsed[0])
+
+        out = io.StringIO()
+        call_command("expire_holds", "--batch-size", "2", stdout=out)
+        self.assertIn("Expired 3 payment holds", out.getvalue())
+        self.assertEqual(Hold.objects.filter(status="expired").count(), 3)
+        self.assertEqual(self.refreshed(self.customer).held_balance, Decimal("500.00"))
+        self.assertEqual(services.expire_holds(), 0)
+
+    @override_settings(BALANCE_SHARDING=True)
+    def test_holds_count_slot_balances_and_bind_batched_postings(self):
+        # The merchant's takings sit in balance slots; authorizing against them sweeps the slots first
+        services.set_balance_slots(self.merchant, 4)
+        for _ in range(4):
+            services.credit(self.merchant, "1000.00")
+        supplier = make_wallet("supplier@example.com")
+        services.authorize_hold(self.merchant, supplier, "3500.00", timezone.now() + timedelta(days=1))
+        self.assertEqual(self.refreshed(self.merchant).available_balance(), Decimal("500.00"))
+
+        postings = [
+            SimpleNamespace(wallet_id=self.merchant.pk, receiver_id=supplier.pk, transaction_type="transfer", amount=Decimal(amount), description="")
+            for amount in ("600.00", "400.00")
+        ]
+        results = services.post_batch(postings)
+        self.assertEqual(results[0], "Insufficient funds for this transaction.")
+        self.assertIsInstance(results[1], Transaction)
+        self.assertEqual(self.refreshed(self.merchant).available_balance(), Decimal("100.00"))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.wallet = make_wallet("poller@example.com", "5000.00")
+        self.merchant = make_wallet("kiosk@example.com", role="merchant")
+        services.transfer(self.wallet, self.merchant, "500.00")
+        self.client = APIClient()
+        self.client.force_authenticate(self.wallet.user)
+
+    @override_settings(BALANCE_SHARDING=True)
+    def test_unchanged_history_is_not_modified(self):
+        url = reverse("transaction-history")
+        response = self.client.get(url)
+        etag = response["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.content), (304, b""))
+        # Another page is another representation
+        self.assertNotEqual(self.client.get(url, {"page_size": 1})["ETag"], etag)
+
+        # A credit into a balance slot leaves the wallet row alone but still changes the history
+        services.set_balance_slots(self.merchant, 2)
+        merchant_client = APIClient()
+        merchant_client.force_authenticate(self.merchant.user)
+        etag = merchant_client.get(url)["ETag"]
+        services.transfer(self.wallet, self.merchant, "200.00")
+        response = merchant_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_wallet_retrieve_is_not_modified_until_it_changes(self):
+        url = reverse("wallet")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        services.authorize_hold(self.wallet, self.merchant, "1000.00", timezone.now() + timedelta(days=1))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["available_balance"], "3500.00")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+
+class ConcurrentPostingTests(TransactionTestCase):
+    WALLETS = 5
+    TRANSFERS = 300
+
+    def setUp(self):
+        self.wallets = [make_wallet(f"user{i}@example.com", "10000.00") for i in range(self.WALLETS)]
+
+    def _random_transfer(self, seed):
+        rng = random.Random(seed)
+        sender, receiver = rng.sample(self.wallets, 2)
+        try:
+            services.transfer(Wallet.objects.get(pk=sender.pk), receiver, Decimal(rng.randint(100, 5000)))
+        except (services.InsufficientFunds, services.LimitExceeded):
+            pass
+        finally:
+            connections.close_all()
+
+    def test_concurrent_transfers_conserve_total_balance(self):
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(self._random_transfer, range(self.TRANSFERS)))
+
+        wallets = Wallet.objects.filter(pk__in=[w.pk for w in self.wallets])
+        self.assertEqual(wallets.aggregate(total=Sum("balance"))["total"], Decimal("10000.00") * self.WALLETS)
+        self.assertFalse(wallets.filter(balance__lt=0).exists())
+        self.assertTrue(Transaction.objects.exists())
+
+        # Every wallet must match its starting balance plus the transfers actually recorded
+        for wallet in wallets:
+            received = Transaction.objects.filter(receiver=wallet).aggregate(s=Sum("amount"))["s"] or 0
+            sent = Transaction.objects.filter(sender=wallet).aggregate(s=Sum("amount"))["s"] or 0
+            self.assertEqual(wallet.balance, Decimal("10000.00") + received - sent)
+            # Racing postings cannot get past the hourly count either
+            self.assertLessEqual(Transaction.objects.filter(sender=wallet).count(), settings.SPEND_LIMITS["unverified"]["hourly_count"])
@@ -1,14 +1,36 @@
 from django.urls import path
 from .views import (
     CreateTransactionView,
+    PostingStatusView,
+    ScheduledTransferListView,
+    ScheduledTransferDetailView,
+    HoldListView,
+    HoldCaptureView,
+    HoldVoidView,
+    BulkTransferView,
     TransactionHistoryView,
+    StatementExportView,
     TransactionDetailView,
-    AdminTransactionListView
+    ReverseTransactionView,
+    ReverseBatchView,
+    AdminTransactionListView,
+    AdminTransactionAnalyticsView,
 )
 
 urlpatterns = [
     path('create/', CreateTransactionView.as_view(), name="create_transaction"),
+    path('postings/<int:pk>/', PostingStatusView.as_view(), name="posting-status"),
+    path('schedules/', ScheduledTransferListView.as_view(), name="scheduled-transfers"),
+    path('schedules/<int:pk>/', ScheduledTransferDetailView.as_view(), name="scheduled-transfer-detail"),
+    path('holds/', HoldListView.as_view(), name="holds"),
+    path('holds/<int:pk>/capture/', HoldCaptureView.as_view(), name="hold-capture"),
+    path('holds/<int:pk>/void/', HoldVoidView.as_view(), name="hold-void"),
+    path('bulk/', BulkTransferView.as_view(), name="bulk_transfer"),
     path("history/", TransactionHistoryView.as_view(), name="transaction-history"),
+    path("statement/", StatementExportView.as_view(), name="transaction-statement"),
     path("<int:pk>/", TransactionDetailView.as_view(), name="transaction-detail"),
+    path("<int:pk>/reverse/", ReverseTransactionView.as_view(), name="transaction-reverse"),
+    path("batches/<uuid:batch_reference>/reverse/", ReverseBatchView.as_view(), name="batch-reverse"),
     path("admin/all/", AdminTransactionListView.as_view(), name="admin-transactions"),
+    path("admin/analytics/", AdminTransactionAnalyticsView.as_view(), name="admin-transaction-analytics"),
 ]
\ No newline at end of file
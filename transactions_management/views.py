@@ -1,13 +1,25 @@
 
 # Create your views here.
-from rest_framework import generics, permissions
-from .models import Transaction
-from .serializers import TransactionSerializer
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from .models import Transaction, ArchivedTransaction, PendingPosting, ScheduledTransfer, Hold
+from .serializers import TransactionSerializer, TransactionReadSerializer, BulkTransferSerializer, StatementQuerySerializer, AnalyticsQuerySerializer, PendingPostingSerializer, ScheduledTransferSerializer, ReversalSerializer, HoldSerializer, HoldCaptureSerializer
+from . import analytics, services, statements
+from .idempotency import IdempotentCreateMixin, IDEMPOTENCY_HEADER
+from .outbox import AsyncPostingMixin
+from .etags import ConditionalWalletMixin
 from django.db.models import Q
-from drf_spectacular.utils import extend_schema, OpenApiExample
+from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.filters import OrderingFilter
 from user.permissions import CanTransact, IsAdmin
-from rest_framework.pagination import PageNumberPagination
+from .pagination import TransactionCursorPagination
+from .search import TransactionSearchFilter
 
     
 @extend_schema(
@@ -16,16 +28,37 @@ from rest_framework.pagination import PageNumberPagination
     description=("Allows an authenticated user to perform a **credit**, **debit**,"
         "or **transfer** transaction.\n\n"
         "**Transfer:** Provide the receiver's account number.\n"
-        "**Credit/Debit:** The sender is automatically detected from the logged-in user."
+        "**Credit/Debit:** The sender is automatically detected from the logged-in user.\n\n"
+        "Send an `Idempotency-Key` header to make retries safe: repeating a request with the same key "
+        "returns the original response instead of posting the transaction again.\n\n"
+        "Send `Prefer: respond-async` to have the transaction queued instead: the response is "
+        "**202 Accepted** with a `status_url` to poll while a posting worker applies it."
     ),
+    parameters=[
+        OpenApiParameter(
+            name=IDEMPOTENCY_HEADER,
+            type=str,
+            location=OpenApiParameter.HEADER,
+            required=False,
+            description="Unique value per intended transaction (for example a UUID generated by the client).",
+        ),
+        OpenApiParameter(
+            name="Prefer",
+            type=str,
+            location=OpenApiParameter.HEADER,
+            required=False,
+            enum=["respond-async"],
+            description="Queue the transaction and answer 202 instead of posting it within the request.",
+        ),
+    ],
     request=TransactionSerializer,
-    responses={201: TransactionSerializer, 400: dict},
+    responses={201: TransactionSerializer, 202: dict, 400: dict},
     examples=[
         OpenApiExample(
             name="Transfer Transaction",
-            description = "Send money to another user's wallet using their account number.",
+            description = "Send money to another user's wallet using their account number, as a string.",
             value={
-                "receiver": 1234567890,
+                "receiver": "0000000014",
                 "amount": 1000.00,
                 "transaction_type": "transfer",
                 "description": "string",
@@ -52,7 +85,7 @@ from rest_framework.pagination import PageNumberPagination
         ),
     ],
 )
-class CreateTransactionView(generics.CreateAPIView):
+class CreateTransactionView(IdempotentCreateMixin, AsyncPostingMixin, generics.CreateAPIView):
   
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated, CanTransact]
@@ -62,22 +95,278 @@ class CreateTransactionView(generics.CreateAPIView):
         return {"request": self.request}
 
 
+@extend_schema(
+    tags=["Transactions"],
+    summary="Check the status of a queued transaction",
+    description="Status of a transaction accepted with `Prefer: respond-async`: pending, posted (with the transaction id) or failed (with the reason).",
+    responses={200: PendingPostingSerializer, 404: dict},
+)
+class PostingStatusView(generics.RetrieveAPIView):
+    serializer_class = PendingPostingSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return PendingPosting.objects.filter(wallet__user=self.request.user).select_related("receiver")
+
+
+@extend_schema(
+    tags=["Transactions"],
+    summary="List or create standing orders",
+    description=(
+        "Scheduled transfers from your wallet: `amount` is sent to `receiver` daily, weekly or monthly from "
+        "`starts_at` until `ends_at` (or until cancelled). A run that finds insufficient funds is recorded "
+        "in `last_status` / `last_error` and the schedule moves on to its next date."
+    ),
+    request=ScheduledTransferSerializer,
+    responses={200: ScheduledTransferSerializer(many=True), 201: ScheduledTransferSerializer, 400: dict},
+)
+class ScheduledTransferListView(generics.ListCreateAPIView):
+    serializer_class = ScheduledTransferSerializer
+    permission_classes = [permissions.IsAuthenticated, CanTransact]
+
+    def get_queryset(self):
+        return ScheduledTransfer.objects.filter(wallet__user=self.request.user).select_related("receiver").order_by("-created_at")
+
+
+@extend_schema(
+    tags=["Transactions"],
+    summary="View or cancel a standing order",
+    description="DELETE cancels the schedule; transfers already made are not affected.",
+    responses={200: ScheduledTransferSerializer, 204: None, 404: dict},
+)
+class ScheduledTransferDetailView(generics.RetrieveDestroyAPIView):
+    serializer_class = ScheduledTransferSerializer
+    permission_classes = [permissions.IsAuthenticated, CanTransact]
+
+    def get_queryset(self):
+        return ScheduledTransfer.objects.filter(wallet__user=self.request.user).select_related("receiver")
+
+    def perform_destroy(self, instance):
+        # Kept for its run history, just never picked up again
+        instance.is_active = False
+        instance.save(update_fields=["is_active"])
+
+
+@extend_schema(
+    tags=["Transactions"],
+    summary="List or authorize payment holds",
+    description=(
+        "POST reserves `amount` of your wallet for the merchant wallet `merchant` until `expires_at` "
+        "(default 7 days, at most 30). Held money still counts in your balance but cannot be spent until the "
+        "merchant captures or voids the hold, or it expires. Your open holds together must fit within your "
+        "spend limits.\n\n"
+        "GET lists the holds on your wallet and, for merchants, the holds made in your favour."
+    ),
+    request=HoldSerializer,
+    responses={200: HoldSerializer(many=True), 201: HoldSerializer, 400: dict},
+)
+class HoldListView(generics.ListCreateAPIView):
+    serializer_class = HoldSerializer
+    permission_classes = [permissions.IsAuthenticated, CanTransact]
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Hold.objects.none()
+        user = self.request.user
+        return (
+            Hold.objects.filter(Q(wallet__user=user) | Q(merchant__user=user))
+            .select_related("wallet", "merchant")
+            .order_by("-created_at")
+        )
+
+
+def merchant_hold(request, pk):
+    # Only the merchant a hold was made out to can capture or void it
+    return get_object_or_404(Hold.objects.select_related("wallet", "merchant"), pk=pk, merchant__user=request.user)
+
+
+@extend_schema(
+    tags=["Transactions"],
+    summary="Capture a payment hold",
+    description=(
+        "Merchant only. Transfers `amount` (default: the full amount held) from the customer's wallet to yours and "
+        "releases the rest of the hold. A hold can be captured once, before it expires. The capture counts "
+        "against the customer's spend limits like any transfer."
+    ),
+    request=HoldCaptureSerializer,
+    responses={200: HoldSerializer, 400: dict, 404: dict, 409: dict},
+)
+class HoldCaptureView(APIView):
+    permission_classes = [permissions.IsAuthenticated, CanTransact]
+
+    def post(self, request, pk):
+        hold = merchant_hold(request, pk)
+        serializer = HoldCaptureSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            services.capture_hold(hold, serializer.validated_data.get("amount"))
+        except services.HoldNotActive as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        except services.LimitExceeded as exc:
+            return Response({"limit": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except services.PostingError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(HoldSerializer(hold).data)
+
+
+@extend_schema(
+    tags=["Transactions"],
+    summary="Void a payment hold",
+    description="Merchant only. Cancels an uncaptured hold and gives the money back to the customer's available balance.",
+    request=None,
+    responses={200: HoldSerializer, 404: dict, 409: dict},
+)
+class HoldVoidView(APIView):
+    permission_classes = [permissions.IsAuthenticated, CanTransact]
+
+    def post(self, request, pk):
+        hold = merchant_hold(request, pk)
+        try:
+            services.void_hold(hold)
+        except services.HoldNotActive as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(HoldSerializer(hold).data)
+
+
+@extend_schema(
+    tags=["Transactions"],
+    summary="Post many transfers in one request (bulk payout / payroll)",
+    description=(
+        "Sends up to 10,000 transfers from the logged-in user's wallet in a single database transaction.\n\n"
+        "Receivers are resolved in one lookup and total funds are checked once for the whole batch. "
+        "Lines with an unknown receiver or an invalid amount are reported as **failed** and skipped; "
+        "every other line is posted. Each line in the response carries its status and transaction id."
+    ),
+    request=BulkTransferSerializer,
+    responses={201: dict, 400: dict},
+    examples=[
+        OpenApiExample(
+            name="Payroll batch",
+            value={
+                "transfers": [
+                    {"receiver": "0000000014", "amount": 150000.00, "description": "October salary"},
+                    {"receiver": "0000000021", "amount": 98000.00, "description": "October salary"},
+                ]
+            },
+            request_only=True,
+        ),
+    ],
+)
+class BulkTransferView(generics.GenericAPIView):
+
+    serializer_class = BulkTransferSerializer
+    permission_classes = [permissions.IsAuthenticated, CanTransact]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        wallet = request.user.wallet
+
+        try:
+            batch_reference, results = services.post_bulk_transfer(wallet, serializer.validated_data["transfers"])
+        except services.InsufficientFunds as exc:
+            return Response({"balance": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except services.LimitExceeded as exc:
+            return Response({"limit": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except services.PostingError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        posted = [result for result in results if result["status"] == "posted"]
+        return Response(
+            {
+                "message": "Bulk transfer processed.",
+                "batch_reference": batch_reference,
+                "posted": len(posted),
+                "failed": len(results) - len(posted),
+                "total_amount": sum(result["amount"] for result in posted),
+                "current_balance": wallet.total_balance(),
+                "results": results,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
 @extend_schema(
     tags=["Transactions"],
     summary="View all transactions related to the logged-in user",\
-    description="Fetch a list of transaction related to your wallet (sent and received).",
-    responses={200: TransactionSerializer(many=True)},
+    description=(
+        "Fetch a list of transaction related to your wallet (sent and received), newest first.\n\n"
+        "Results are cursor-paginated: follow the `next` / `previous` links to move between pages.\n\n"
+        "Responses carry an `ETag`; send it back in `If-None-Match` to get an empty 304 while nothing has changed."
+    ),
+    responses={200: TransactionSerializer(many=True), 304: None},
 )
-class TransactionHistoryView(generics.ListAPIView):
+class TransactionHistoryView(ConditionalWalletMixin, generics.ListAPIView):
 
-    serializer_class = TransactionSerializer
+    serializer_class = TransactionReadSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TransactionCursorPagination
+
+    def get(self, request, *args, **kwargs):
+        return self.conditional_get(request, super().get, *args, **kwargs)
 
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
             return Transaction.objects.none()
         wallet = self.request.user.wallet
-        return Transaction.objects.filter(Q(sender=wallet) | Q(receiver=wallet)).order_by("-transaction_time")
+        # Rows are projected straight into dicts for the lightweight read serializer
+        return (
+            Transaction.objects.filter(Q(sender=wallet) | Q(receiver=wallet))
+            .order_by("-transaction_time")
+            .values(*TransactionReadSerializer.VALUES)
+        )
+
+    def get_keyset_branches(self):
+        # Sent and received history are read from their own (wallet, transaction_time, id) indexes
+        wallet = self.request.user.wallet
+        return [Transaction.objects.filter(sender=wallet), Transaction.objects.filter(receiver=wallet)]
+
+    def get_keyset_archive(self):
+        # Only wallets with archived rows ever read the archive table
+        wallet = self.request.user.wallet
+        if wallet.archived_until is None:
+            return None
+        archived = ArchivedTransaction.objects.filter(Q(sender=wallet) | Q(receiver=wallet)).values(*TransactionReadSerializer.VALUES)
+        branches = [ArchivedTransaction.objects.filter(sender=wallet), ArchivedTransaction.objects.filter(receiver=wallet)]
+        return wallet.archived_until, archived, branches
+
+
+@extend_schema(
+    tags=["Transactions"],
+    summary="Export a statement of your wallet as CSV or NDJSON",
+    description=(
+        "Streams every transaction on the logged-in user's wallet between `start` and `end` (inclusive dates), "
+        "oldest first, with a running balance column. The response is written while rows are read, so "
+        "large statements start downloading immediately."
+    ),
+    parameters=[
+        OpenApiParameter(name="start", type=str, description="First day of the statement (YYYY-MM-DD)."),
+        OpenApiParameter(name="end", type=str, description="Last day of the statement (YYYY-MM-DD)."),
+        OpenApiParameter(name="output", type=str, enum=["csv", "ndjson"], description="File format, csv by default."),
+    ],
+    responses={200: bytes, 400: dict},
+)
+class StatementExportView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+    def get(self, request):
+        query = StatementQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        start, end, output = query.validated_data.get("start"), query.validated_data.get("end"), query.validated_data["output"]
+        wallet = request.user.wallet
+
+        # Dates are whole days in the active timezone; the end bound is exclusive at the next midnight
+        start_at = timezone.make_aware(datetime.combine(start, time.min)) if start else None
+        end_at = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)) if end else None
+
+        rows = statements.statement_rows(wallet, start_at, end_at)
+        body = statements.stream_csv(rows) if output == "csv" else statements.stream_ndjson(rows)
+        response = StreamingHttpResponse(body, content_type=self.CONTENT_TYPES[output])
+        filename = f"statement-{wallet.account_number}-{start or 'start'}-{end or timezone.localdate()}.{output}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
 
 
 @extend_schema(
@@ -93,27 +382,148 @@ class TransactionDetailView(generics.RetrieveAPIView):
 
     def get_queryset(self):
         wallet = self.request.user.wallet
-        return Transaction.objects.filter(Q(sender=wallet) | Q(receiver=wallet))
-    
+        return Transaction.objects.filter(Q(sender=wallet) | Q(receiver=wallet)).select_related("sender", "receiver")
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            # Old transactions may have been moved to the archive table (they keep their id)
+            wallet = self.request.user.wallet
+            if wallet.archived_until is None:
+                raise
+            archived = ArchivedTransaction.objects.filter(Q(sender=wallet) | Q(receiver=wallet)).select_related("sender", "receiver")
+            return get_object_or_404(archived, pk=self.kwargs["pk"])
+
+
+@extend_schema(
+    tags=["Transactions"],
+    summary="Admin-only: Reverse a transaction",
+    description=(
+        "Posts a compensating transaction that gives every wallet back exactly what the original moved, "
+        "linked to the original through `reversal_of`. A transaction can only be reversed once (**409** after that), "
+        "reversals cannot be reversed, and the reversal fails with **400** if the wallet that has to give the money "
+        "back no longer holds it. Requires admin privileges."
+    ),
+    request=ReversalSerializer,
+    responses={201: TransactionSerializer, 400: dict, 404: dict, 409: dict},
+)
+class ReverseTransactionView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def post(self, request, pk):
+        original = get_object_or_404(Transaction, pk=pk)
+        serializer = ReversalSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            reversal = services.reverse_transaction(original, serializer.validated_data["reason"])
+        except services.AlreadyReversed as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        except services.InsufficientFunds:
+            return Response({"balance": "The receiving wallet no longer holds enough funds to reverse this transaction."}, status=status.HTTP_400_BAD_REQUEST)
+        except services.PostingError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(TransactionSerializer(reversal, context={"request": request}).data, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(
+    tags=["Transactions"],
+    summary="Admin-only: Reverse a whole bulk transfer",
+    description=(
+        "Reverses every transaction of the bulk transfer with this `batch_reference` that has not been reversed yet, "
+        "in one database transaction: either all of them are reversed or none is. The reversals share a new "
+        "batch reference of their own. Requires admin privileges."
+    ),
+    request=ReversalSerializer,
+    responses={201: dict, 400: dict},
+)
+class ReverseBatchView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def post(self, request, batch_reference):
+        serializer = ReversalSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            reversal_reference, reversals = services.reverse_batch(batch_reference, serializer.validated_data["reason"])
+        except services.AlreadyReversed as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        except services.InsufficientFunds:
+            return Response({"balance": "A receiving wallet no longer holds enough funds; nothing was reversed."}, status=status.HTTP_400_BAD_REQUEST)
+        except services.PostingError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {
+                "message": "Batch reversed.",
+                "batch_reference": batch_reference,
+                "reversal_batch_reference": reversal_reference,
+                "reversed": len(reversals),
+                "total_amount": sum(reversal.converted_amount or reversal.amount for reversal in reversals),
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
 
-class AdminTransactionPagination(PageNumberPagination):
-    page_size = 10   
 @extend_schema(
     tags=["Transactions"],
     summary="Admin-only: View all transactions in the system",
-    description="List all transactions for administrative purposes. Requires admin privileges.",
+    description=(
+        "List all transactions for administrative purposes. Requires admin privileges.\n\n"
+        "`search` finds transactions whose description contains every given word (the last one may be the start of a word) "
+        "through a full-text index, and can be combined with the `transaction_type`, `sender` and `receiver` filters.\n\n"
+        "`ordering` sorts by `transaction_time` or `amount` (prefix `-` for descending; default `-transaction_time`). "
+        "Pages are cursor-based: follow `next` / `previous`; no total count is computed."
+    ),
     responses={200: TransactionSerializer(many=True)},
 )
 
 class AdminTransactionListView(generics.ListAPIView):
-    queryset = Transaction.objects.all().order_by("-transaction_time")
-    serializer_class = TransactionSerializer
+    queryset = Transaction.objects.order_by("-transaction_time").values(*TransactionReadSerializer.VALUES)
+    serializer_class = TransactionReadSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdmin]
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, TransactionSearchFilter, OrderingFilter]
     filterset_fields = ["transaction_type", "sender", "receiver"]
     search_fields = ["description"]
     ordering_fields = ["transaction_time", "amount"]
-    pagination_class = AdminTransactionPagination
+    pagination_class = TransactionCursorPagination
 
     def get_queryset(self):
-        return Transaction.objects.all().order_by("-transaction_time")
+        return Transaction.objects.order_by("-transaction_time").values(*TransactionReadSerializer.VALUES)
+
+
+@extend_schema(
+    tags=["Transactions"],
+    summary="Admin-only: Transaction volume, count and average over time",
+    description=(
+        "Totals per day (or hour), transaction type and currency, served from pre-computed hourly rollups. "
+        "Defaults to the last 7 days. Requires admin privileges."
+    ),
+    parameters=[
+        OpenApiParameter(name="start", type=str, description="First day (YYYY-MM-DD)."),
+        OpenApiParameter(name="end", type=str, description="Last day (YYYY-MM-DD)."),
+        OpenApiParameter(name="granularity", type=str, enum=["day", "hour"]),
+        OpenApiParameter(name="transaction_type", type=str, enum=["credit", "debit", "transfer"]),
+        OpenApiParameter(name="currency", type=str, enum=["NGN", "USD", "EUR"]),
+    ],
+    responses={200: dict, 400: dict},
+)
+class AdminTransactionAnalyticsView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        query = AnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        end = params.get("end") or timezone.localdate()
+        start = params.get("start") or end - timedelta(days=6)
+        results = analytics.summary(
+            timezone.make_aware(datetime.combine(start, time.min)),
+            timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+            granularity=params["granularity"],
+            transaction_type=params.get("transaction_type"),
+            currency=params.get("currency"),
+        )
+        return Response(
+            {"start": start, "end": end, "granularity": params["granularity"], "results": results},
+            status=status.HTTP_200_OK,
+        )
@@ -0,0 +1,89 @@
+import threading
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from .models import AccountNumberSequence, Wallet
+
+
+# NUBAN-style account numbers: a 9-digit serial from AccountNumberSequence followed by a check
+# digit computed over the institution code and the serial. Serials are never reused, so a new
+# number needs no uniqueness lookup, and a mistyped digit fails the check without a query.
+
+SEQUENCE = "wallet"
+
+SERIAL_DIGITS = 9
+
+# Serial plus check digit
+ACCOUNT_NUMBER_DIGITS = SERIAL_DIGITS + 1
+
+# Wallets opened before the allocator kept their random numbers, 10**9 and up, so a serial below
+# 10**8 (a number starting with 0) can never collide with one. Serials stop there.
+SERIAL_LIMIT = 10**(SERIAL_DIGITS - 1)
+
+# NUBAN weights, repeated over the institution code and serial digits
+WEIGHTS = (3, 7, 3)
+
+# Serials reserved in one go by allocate(); whatever a process doesn't use is simply skipped
+BLOCK_SIZE = settings.ACCOUNT_NUMBER_BLOCK_SIZE
+
+_spare = []
+_lock = threading.Lock()
+
+
+def check_digit(serial):
+    digits = f"{settings.ACCOUNT_NUMBER_INSTITUTION_CODE}{serial:0{SERIAL_DIGITS}d}"
+    total = sum(int(digit) * WEIGHTS[index % len(WEIGHTS)] for index, digit in enumerate(digits))
+    return (10 - total % 10) % 10
+
+
+def format_account_number(serial):
+    return f"{serial:0{SERIAL_DIGITS}d}{check_digit(serial)}"
+
+
+def is_valid(account_number):
+    # True for numbers issued by this allocator (wallets opened before it keep their random numbers)
+    if len(account_number) != ACCOUNT_NUMBER_DIGITS or not account_number.isdigit():
+        return False
+    return check_digit(int(account_number[:SERIAL_DIGITS])) == int(account_number[-1])
+
+
+def _create_sequence():
+    # Migration 0011 creates the counter row, but flushing the database removes it. It comes back
+    # starting past the highest serial any wallet already has; a concurrent creator is ignored.
+    newest = Wallet.objects.filter(account_number__lt="1").order_by("-account_number").values_list("account_number", flat=True).first()
+    next_serial = int(newest[:SERIAL_DIGITS]) + 1 if newest else 0
+    AccountNumberSequence.objects.bulk_create([AccountNumberSequence(name=SEQUENCE, next_serial=next_serial)], ignore_conflicts=True)
+
+
+def reserve(count):
+    # Reserve `count` consecutive serials with one UPDATE and return their account numbers, for
+    # bulk provisioning. The row stays locked until the caller's transaction ends, so the value
+    # read back is ours.
+    with transaction.atomic(savepoint=False):
+        rows = AccountNumberSequence.objects.filter(name=SEQUENCE)
+        if not rows.update(next_serial=F("next_serial") + count):
+            _create_sequence()
+            rows.update(next_serial=F("next_serial") + count)
+        end = rows.values_list("next_serial", flat=True).get()
+        if end > SERIAL_LIMIT:
+            # Raised inside the block, so the bump is rolled back with it
+            raise ValueError("No account numbers left to allocate.")
+    return [format_account_number(serial) for serial in range(end - count, end)]
+
+
+def allocate():
+    # One account number, from this process's spare block when it has one
+    with _lock:
+        if _spare:
+            return _spare.pop()
+    if connection.in_atomic_block:
+        # A reservation made inside the caller's transaction rolls back with it, and another process
+        # could then reserve the same serials, so no spare block can be kept from it. Taking just
+        # the one number keeps wallets created in a long transaction (an import) from using up a
+        # whole block each.
+        return reserve(1)[0]
+    numbers = reserve(BLOCK_SIZE)
+    with _lock:
+        # Stored reversed so pop() hands them out in order
+        _spare.extend(numbers[:0:-1])
+    return numbers[0]
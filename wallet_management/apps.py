@@ -7,3 +7,5 @@ class WalletManagementConfig(AppConfig):
 
     def ready(self):
         import wallet_management.signals
+        # Keeps the account number cache in step with wallet and owner saves
+        import wallet_management.resolver
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:55
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet_management', '0007_alter_wallet_options_alter_wallet_balance_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='balance_slots',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='BalanceSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='wallet_management.wallet')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('wallet', 'slot'), name='unique_wallet_balance_slot')],
+            },
+        ),
+    ]
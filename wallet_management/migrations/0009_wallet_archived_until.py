@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet_management', '0008_balance_slots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='archived_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:15
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet_management', '0009_wallet_archived_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='held_balance',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:19
+
+from django.db import migrations, models
+
+
+def create_sequence(apps, schema_editor):
+    # Serials start at 0, so the first 100 million numbers begin with a 0 and can never clash with
+    # the random numbers (10**9 and up) given to wallets opened before the sequence
+    AccountNumberSequence = apps.get_model('wallet_management', 'AccountNumberSequence')
+    AccountNumberSequence.objects.get_or_create(name='wallet', defaults={'next_serial': 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet_management', '0010_wallet_held_balance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountNumberSequence',
+            fields=[
+                ('name', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('next_serial', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_sequence, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,5 @@
-import random
 from django.db import models
+from django.db.models import Sum
 from user.models import User
 from decimal import Decimal
 from django.core.validators import MinValueValidator
@@ -17,7 +17,17 @@ class Wallet(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='wallet')
     account_number = models.CharField(max_length=10, unique=True, editable=False, null=False, blank=False)
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), validators=[MinValueValidator(Decimal('0.00'))])
+    # Money reserved by authorized payment holds (see transactions_management Hold). Still part of
+    # the ledger balance, but no debit may spend it: available = total balance - held_balance.
+    held_balance = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
     currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default="NGN")
+    # Opt-in for high-traffic receivers while settings.BALANCE_SHARDING is on: credits land on one
+    # of this many BalanceSlot rows instead of the wallet row itself. 0 means every posting
+    # updates `balance` directly.
+    balance_slots = models.PositiveSmallIntegerField(default=0)
+    # Newest transaction_time moved to the archive table for this wallet (see archive_transactions);
+    # history reads only look at the archive for ranges reaching back this far
+    archived_until = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -28,20 +38,31 @@ class Wallet(models.Model):
 
     @staticmethod
     def generate_account_number():
-        while True:
-            acct_number = str(random.randint(10**9, 10**10 - 1))
-            if not Wallet.objects.filter(account_number=acct_number).exists():
-                return acct_number
+        # Handed out from a reserved block of the account number sequence, so no lookup is needed
+        from . import accounts
+        return accounts.allocate()
             
-    def credit(self, amount):
-        self.balance += Decimal(amount)
-        self.save(update_fields=['balance'])
+    def total_balance(self):
+        # `balance` plus whatever credits are still sitting in the wallet's balance slots
+        if not self.balance_slots:
+            return self.balance
+        return self.balance + (self.slots.aggregate(total=Sum("balance"))["total"] or Decimal("0.00"))
 
-    def debit(self, amount):
-        if self.balance < Decimal(amount):
+    def available_balance(self):
+        # What debits and transfers may spend: the ledger balance less money held for merchants
+        return self.total_balance() - self.held_balance
+
+    def credit(self, amount, description=""):
+        # Posted through the transaction engine so the change is journaled like any other
+        from transactions_management import services
+        return services.credit(self, amount, description)
+
+    def debit(self, amount, description=""):
+        from transactions_management import services
+        try:
+            return services.debit(self, amount, description)
+        except services.InsufficientFunds:
             raise ValueError("Insufficient funds in wallet.")
-        self.balance -= Decimal(amount)
-        self.save(update_fields=['balance'])
             
     def __str__(self):
         return f"{self.user.email} - {self.account_number}"
@@ -50,3 +71,29 @@ class Wallet(models.Model):
         verbose_name = "Wallet"
         verbose_name_plural = "Wallets"
         ordering = ['-created_at']
+
+
+class BalanceSlot(models.Model):
+    # One shard of a sharded wallet's balance. Credits pick a slot at random so concurrent
+    # receivers spread their writes over several rows; debits sweep the slots back into the wallet.
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="slots")
+    slot = models.PositiveSmallIntegerField()
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+
+    def __str__(self):
+        return f"{self.wallet_id}#{self.slot} - {self.balance}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["wallet", "slot"], name="unique_wallet_balance_slot"),
+        ]
+
+
+class AccountNumberSequence(models.Model):
+    # Next unused account number serial (see accounts.py). Serials are reserved in blocks by
+    # bumping `next_serial` in one UPDATE, so two wallets can never be handed the same number.
+    name = models.CharField(max_length=20, primary_key=True)
+    next_serial = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_serial}"
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from user.models import User
+from .models import Wallet
+
+
+# Account number -> wallet lookups for transfer receivers and name enquiry. Each process keeps the most recently
+# resolved wallets in a bounded LRU (settings.ACCOUNT_RESOLVER_CACHE_SIZE); entries expire after
+# settings.ACCOUNT_RESOLVER_CACHE_TTL seconds and are dropped when the wallet or its owner is
+# saved. Only lookup data is cached: who the number belongs to, and the currency name enquiry
+# shows. Anything a posting depends on (balances, currency, balance slots) is read by the posting
+# engine itself, inside its transaction.
+
+ResolvedAccount = namedtuple("ResolvedAccount", "wallet_id user_id account_number name currency role")
+
+COLUMNS = ("id", "user_id", "account_number", "user__first_name", "user__last_name", "currency", "user__role")
+
+_entries = OrderedDict()
+_by_user = {}
+# Bumped by every invalidation, so a lookup that raced with one doesn't cache what it read
+_state = {"generation": 0, "hits": 0, "misses": 0}
+_lock = threading.Lock()
+
+
+def _account(row):
+    wallet_id, user_id, account_number, first_name, last_name, currency, role = row
+    name = " ".join(part for part in (first_name, last_name) if part)
+    return ResolvedAccount(wallet_id, user_id, account_number, name, currency, role)
+
+
+def _store(account, generation):
+    with _lock:
+        if generation != _state["generation"]:
+            return
+        _entries[account.account_number] = (time.monotonic() + settings.ACCOUNT_RESOLVER_CACHE_TTL, account)
+        _entries.move_to_end(account.account_number)
+        _by_user[account.user_id] = account.account_number
+        while len(_entries) > settings.ACCOUNT_RESOLVER_CACHE_SIZE:
+            _, (_, evicted) = _entries.popitem(last=False)
+            _by_user.pop(evicted.user_id, None)
+
+
+def resolve_many(account_numbers):
+    # {account_number: ResolvedAccount} for the given numbers that belong to a wallet; the
+    # ones not cached are read with a single query
+    found, missing = {}, []
+    with _lock:
+        now = time.monotonic()
+        for account_number in account_numbers:
+            cached = _entries.get(account_number)
+            if cached is not None and cached[0] > now:
+                _entries.move_to_end(account_number)
+                _state["hits"] += 1
+                found[account_number] = cached[1]
+            else:
+                _state["misses"] += 1
+                missing.append(account_number)
+        generation = _state["generation"]
+    if missing:
+        for row in Wallet.objects.filter(account_number__in=missing).values_list(*COLUMNS):
+            account = _account(row)
+            found[account.account_number] = account
+            _store(account, generation)
+    return found
+
+
+def resolve(account_number):
+    # The ResolvedAccount for `account_number`, or None when no wallet has it
+    return resolve_many([account_number]).get(account_number)
+
+
+def mask_name(name):
+    # Name enquiry shows enough of the owner's name to confirm the receiver, not all of it:
+    # "John Doe" -> "JO** DO*"
+    return " ".join(part[:2] + "*" * (len(part) - 2) for part in name.upper().split())
+
+
+def wallet(account):
+    # A Wallet instance for a resolved account without reading the row. Only the identifying fields
+    # are set; the cached currency is left out so nothing mistakes it for the row's, and every
+    # other field loads from the database on access.
+    return Wallet.from_db(
+        None, ["id", "user_id", "account_number"], [account.wallet_id, account.user_id, account.account_number]
+    )
+
+
+def invalidate(account_number=None, user_id=None):
+    with _lock:
+        _state["generation"] += 1
+        if user_id is not None:
+            account_number = _by_user.pop(user_id, account_number)
+        cached = _entries.pop(account_number, None)
+        if cached is not None:
+            _by_user.pop(cached[1].user_id, None)
+
+
+def clear():
+    with _lock:
+        _state["generation"] += 1
+        _entries.clear()
+        _by_user.clear()
+
+
+def stats():
+    with _lock:
+        return {"hits": _state["hits"], "misses": _state["misses"], "size": len(_entries)}
+
+
+def _invalidate_now_and_on_commit(**keys):
+    # Dropped right away for this connection's own reads, and again once committed, so a
+    # concurrent lookup cannot cache the old row in between
+    invalidate(**keys)
+    transaction.on_commit(lambda: invalidate(**keys))
+
+
+@receiver(post_save, sender=Wallet)
+@receiver(post_delete, sender=Wallet)
+def invalidate_wallet(sender, instance, **kwargs):
+    _invalidate_now_and_on_commit(account_number=instance.account_number)
+
+
+@receiver(post_save, sender=User)
+def invalidate_owner(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which isn't cached
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    _invalidate_now_and_on_commit(user_id=instance.pk)
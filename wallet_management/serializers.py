@@ -1,12 +1,19 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Wallet
+from . import accounts, resolver
 
 class WalletSerializer(serializers.ModelSerializer):
+    # Includes credits still held in the wallet's balance slots
+    balance = serializers.DecimalField(source="total_balance", max_digits=12, decimal_places=2, read_only=True)
+    # Balance less the money reserved by payment holds
+    available_balance = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
     class Meta:
         model = Wallet
-        fields = ["id", "user","balance","currency","created_at","updated_at", "account_number"]
+        fields = ["id", "user","balance","held_balance","available_balance","currency","created_at","updated_at", "account_number"]
 
-        read_only_fields = ["id", "user", "created_at", "updated_at", "balance", "account_number"]
+        read_only_fields = ["id", "user", "created_at", "updated_at", "balance", "held_balance", "available_balance", "account_number"]
 
     def validate_currency(self, value):
         
@@ -14,5 +21,45 @@ class WalletSerializer(serializers.ModelSerializer):
         if value not in allowed_currencies:
             raise serializers.ValidationError(f"Currency must be one of: {', '.join(allowed_currencies)}")
         return value
-    
-    
+
+
+def account_number_text(data):
+    # Account numbers are strings, and new ones start with 0. A client that sends one as a JSON
+    # number has lost those zeros, so integers are padded back to the full length.
+    if isinstance(data, int) and not isinstance(data, bool) and 0 <= data < 10**accounts.ACCOUNT_NUMBER_DIGITS:
+        return f"{data:0{accounts.ACCOUNT_NUMBER_DIGITS}d}"
+    return str(data)
+
+
+class AccountNumberTextField(serializers.CharField):
+    # An account number that isn't resolved to a wallet here (bulk transfer lines, batch name enquiry)
+    def __init__(self, **kwargs):
+        kwargs.setdefault("max_length", accounts.ACCOUNT_NUMBER_DIGITS)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        return super().to_internal_value(account_number_text(data))
+
+
+class AccountNumberField(serializers.SlugRelatedField):
+    # A wallet given by account number, looked up through the resolver cache instead of one query
+    # per request. `role` limits it to wallets of users with that role.
+    def __init__(self, role=None, **kwargs):
+        self.role = role
+        kwargs.setdefault("slug_field", "account_number")
+        kwargs.setdefault("queryset", Wallet.objects.filter(user__role=role) if role else Wallet.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        data = account_number_text(data)
+        account = resolver.resolve(data)
+        if account is None or (self.role and account.role != self.role):
+            self.fail("does_not_exist", slug_name=self.slug_field, value=str(data))
+        return resolver.wallet(account)
+
+
+class AccountResolveSerializer(serializers.Serializer):
+    account_numbers = serializers.ListField(
+        child=AccountNumberTextField(), allow_empty=False, max_length=settings.ACCOUNT_RESOLVE_BATCH_LIMIT
+    )
+
@@ -1,3 +1,178 @@
-from django.test import TestCase
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from user.models import User
+from .models import Wallet, AccountNumberSequence
+from .serializers import AccountNumberField
+from . import accounts, resolver
+
+
+class AccountNumberAllocatorTests(TestCase):
+    def setUp(self):
+        accounts._spare.clear()
+
+    def test_numbers_carry_a_check_digit(self):
+        number = accounts.format_account_number(123456789)
+        self.assertEqual((len(number), number[:9]), (10, "123456789"))
+        self.assertTrue(accounts.is_valid(number))
+        for index in range(10):
+            # Any single mistyped digit is caught
+            digit = str((int(number[index]) + 1) % 10)
+            self.assertFalse(accounts.is_valid(number[:index] + digit + number[index + 1:]))
+        self.assertFalse(accounts.is_valid("12345"))
+
+    def test_reserve_hands_out_consecutive_blocks(self):
+        start = AccountNumberSequence.objects.get(name=accounts.SEQUENCE).next_serial
+        with self.assertNumQueries(2):
+            first = accounts.reserve(500)
+        second = accounts.reserve(3)
+        self.assertEqual(first[0], accounts.format_account_number(start))
+        self.assertEqual(second, [accounts.format_account_number(serial) for serial in range(start + 500, start + 503)])
+        self.assertEqual(len(set(first + second)), 503)
+
+    def test_serials_stop_below_the_legacy_random_range(self):
+        AccountNumberSequence.objects.filter(name=accounts.SEQUENCE).update(next_serial=accounts.SERIAL_LIMIT - 2)
+        last = accounts.reserve(2)
+        self.assertEqual(last[-1], accounts.format_account_number(10**8 - 1))
+        # Still below every random number wallets were given before the allocator
+        self.assertLess(int(last[-1]), 10**9)
+        with self.assertRaises(ValueError), transaction.atomic():
+            accounts.reserve(1)
+        self.assertEqual(AccountNumberSequence.objects.get(name=accounts.SEQUENCE).next_serial, accounts.SERIAL_LIMIT)
+
+    def test_sequence_row_is_recreated_after_a_flush(self):
+        wallet = User.objects.create_user(email="early@example.com", password="Str0ngPass!", role="customer").wallet
+        AccountNumberSequence.objects.all().delete()
+        accounts._spare.clear()
+        later = User.objects.create_user(email="late@example.com", password="Str0ngPass!", role="customer").wallet
+        # Numbering resumes after the wallets that already exist
+        self.assertEqual(later.account_number, accounts.format_account_number(int(wallet.account_number[:9]) + 1))
+
+    def test_wallets_created_in_a_transaction_reserve_one_number_each(self):
+        # Inside the test's transaction a block could roll back, so none is reserved or kept
+        start = AccountNumberSequence.objects.get(name=accounts.SEQUENCE).next_serial
+        numbers = [Wallet.generate_account_number() for _ in range(3)]
+        self.assertEqual(numbers, [accounts.format_account_number(serial) for serial in range(start, start + 3)])
+        self.assertEqual(AccountNumberSequence.objects.get(name=accounts.SEQUENCE).next_serial, start + 3)
+        self.assertEqual(accounts._spare, [])
+
+
+class AccountNumberBlockTests(TransactionTestCase):
+    def setUp(self):
+        accounts._spare.clear()
+        self.addCleanup(accounts._spare.clear)
+
+    def test_new_wallets_draw_from_the_reserved_block(self):
+        first = User.objects.create_user(email="first@example.com", password="Str0ngPass!", role="customer").wallet
+        self.assertTrue(accounts.is_valid(first.account_number))
+        self.assertEqual(len(accounts._spare), accounts.BLOCK_SIZE - 1)
+
+        # Later wallets need no sequence or uniqueness query at all
+        with self.assertNumQueries(0):
+            numbers = [Wallet.generate_account_number() for _ in range(5)]
+        serial = int(first.account_number[:9])
+        self.assertEqual(numbers, [accounts.format_account_number(serial + offset) for offset in range(1, 6)])
+
+
+class AccountResolverTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.merchant = User.objects.create_user(
+            email="till@example.com", password="Str0ngPass!", first_name="Corner", last_name="Shop", role="merchant"
+        ).wallet
+
+    def test_repeat_lookups_are_served_from_the_cache(self):
+        before = resolver.stats()
+        account = resolver.resolve(self.merchant.account_number)
+        self.assertEqual((account.wallet_id, account.name, account.role), (self.merchant.pk, "Corner Shop", "merchant"))
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver.resolve(self.merchant.account_number), account)
+        after = resolver.stats()
+        self.assertEqual((after["hits"] - before["hits"], after["misses"] - before["misses"]), (1, 1))
+        self.assertIsNone(resolver.resolve("0000000000"))
+
+        # The receiver field resolves the same way and still enforces its role
+        with self.assertNumQueries(0):
+            wallet = AccountNumberField(role="merchant").to_internal_value(self.merchant.account_number)
+        self.assertEqual(wallet, self.merchant)
+        # Nothing a posting depends on comes from the cache
+        self.assertTrue({"currency", "balance_slots", "balance"} <= wallet.get_deferred_fields())
+        with self.assertRaises(serializers.ValidationError):
+            AccountNumberField(role="customer").to_internal_value(self.merchant.account_number)
+        # New numbers start with 0; one sent as a JSON number still resolves
+        self.assertTrue(self.merchant.account_number.startswith("0"))
+        self.assertEqual(AccountNumberField().to_internal_value(int(self.merchant.account_number)), self.merchant)
+
+    def test_saves_invalidate_entries(self):
+        resolver.resolve(self.merchant.account_number)
+        self.merchant.currency = "USD"
+        self.merchant.save()
+        self.assertEqual(resolver.resolve(self.merchant.account_number).currency, "USD")
+
+        owner = self.merchant.user
+        owner.first_name = "Village"
+        owner.save()
+        self.assertEqual(resolver.resolve(self.merchant.account_number).name, "Village Shop")
+
+        # Logins don't evict the entry
+        owner.save(update_fields=["last_login"])
+        with self.assertNumQueries(0):
+            resolver.resolve(self.merchant.account_number)
+
+    @override_settings(ACCOUNT_RESOLVER_CACHE_SIZE=2)
+    def test_least_recently_used_entries_are_evicted(self):
+        others = [
+            User.objects.create_user(email=f"payee{i}@example.com", password="Str0ngPass!", role="customer").wallet
+            for i in range(2)
+        ]
+        resolver.clear()
+        resolver.resolve(self.merchant.account_number)
+        resolver.resolve(others[0].account_number)
+        resolver.resolve(self.merchant.account_number)
+        resolver.resolve(others[1].account_number)
+        self.assertEqual(resolver.stats()["size"], 2)
+        with self.assertNumQueries(0):
+            resolver.resolve(self.merchant.account_number)
+        with self.assertNumQueries(1):
+            resolver.resolve(others[0].account_number)
+
+    @override_settings(ACCOUNT_RESOLVER_CACHE_TTL=0)
+    def test_entries_expire(self):
+        resolver.resolve(self.merchant.account_number)
+        with self.assertNumQueries(1):
+            resolver.resolve(self.merchant.account_number)
+
+
+class NameEnquiryTests(TestCase):
+    def setUp(self):
+        resolver.clear()
+        self.payee = User.objects.create_user(
+            email="john@example.com", password="Str0ngPass!", first_name="John", last_name="Doe", role="customer"
+        ).wallet
+        sender = User.objects.create_user(email="sender@example.com", password="Str0ngPass!", role="customer")
+        self.client = APIClient()
+        self.client.force_authenticate(sender)
+
+    def test_resolve_single_account(self):
+        url = reverse("wallet_resolve", args=[self.payee.account_number])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"], {"account_number": self.payee.account_number, "name": "JO** DO*", "currency": "NGN"})
+        # Answered from the cache the second time
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(reverse("wallet_resolve", args=["0000000000"])).status_code, 404)
+
+    def test_resolve_batch(self):
+        numbers = [self.payee.account_number, "0000000000", self.payee.account_number]
+        response = self.client.post(reverse("wallet_resolve_batch"), {"account_numbers": numbers}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["account_number"] for row in response.data["data"]], [self.payee.account_number])
+        self.assertEqual(response.data["not_found"], ["0000000000"])
+
+        for numbers in ([], [self.payee.account_number] * 501):
+            response = self.client.post(reverse("wallet_resolve_batch"), {"account_numbers": numbers}, format="json")
+            self.assertEqual(response.status_code, 400)
 
-# Create your tests here.
@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import WalletManagement
+from .views import WalletManagement, AccountResolveView, AccountBatchResolveView
 
 urlpatterns = [
     path('retrieve/', WalletManagement.as_view(), name='wallet'),
     path('retrieve/detail/<int:id>/', WalletManagement.as_view(), name='wallet_detail'),
+    path('resolve/', AccountBatchResolveView.as_view(), name='wallet_resolve_batch'),
+    path('resolve/<str:account_number>/', AccountResolveView.as_view(), name='wallet_resolve'),
 
 ]
\ No newline at end of file
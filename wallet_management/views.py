@@ -2,17 +2,24 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from .models import Wallet
-from .serializers import WalletSerializer
+from .serializers import WalletSerializer, AccountResolveSerializer
+from . import resolver
+from transactions_management.etags import ConditionalWalletMixin
 from drf_spectacular.utils import extend_schema,OpenApiExample
-from user.permissions import CanCreateWallet
+from user.permissions import CanCreateWallet, CanTransact
 
 
 @extend_schema(
     tags=["Wallet Management"],
     summary="Retrieve user wallet or specific wallet by ID and prevent deletion of user wallet",
+    description=(
+        "Your own wallet comes with an `ETag`; send it back in `If-None-Match` to get an empty 304 "
+        "while nothing has changed."
+    ),
     request=WalletSerializer,
     responses={
         200: WalletSerializer,
+        304: None,
         400: dict,
         404: dict,
         405: dict
@@ -34,10 +41,16 @@ from user.permissions import CanCreateWallet
         ),
     ]
 )
-class WalletManagement(APIView):
+class WalletManagement(ConditionalWalletMixin, APIView):
     permission_classes = [permissions.IsAuthenticated, CanCreateWallet]
 
     def get(self, request, id=None):
+        if id is None:
+            # Your own wallet is polled often: unchanged since If-None-Match means 304
+            return self.conditional_get(request, self.retrieve)
+        return self.retrieve(request, id)
+
+    def retrieve(self, request, id=None):
         # Retrieve wallet by ID or the logged-in user's wallet
         try:
             if id:
@@ -68,3 +81,61 @@ class WalletManagement(APIView):
                 {"message": "Wallet deletion is not allowed."},
                 status=status.HTTP_405_METHOD_NOT_ALLOWED
             )
+
+
+def enquiry(account):
+    # What name enquiry reveals about a wallet
+    return {"account_number": account.account_number, "name": resolver.mask_name(account.name), "currency": account.currency}
+
+
+@extend_schema(
+    tags=["Wallet Management"],
+    summary="Name enquiry: confirm who owns an account number before sending money",
+    description="Returns the owner's masked name and the wallet currency, served from the account number cache.",
+    request=None,
+    responses={200: dict, 404: dict},
+    examples=[
+        OpenApiExample(
+            name="Resolved account",
+            value={"message": "Account resolved.", "data": {"account_number": "0000000014", "name": "JO** DO*", "currency": "NGN"}},
+            response_only=True,
+        ),
+    ],
+)
+class AccountResolveView(APIView):
+    permission_classes = [permissions.IsAuthenticated, CanTransact]
+
+    def get(self, request, account_number):
+        account = resolver.resolve(account_number)
+        if account is None:
+            return Response({"message": "Account not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"message": "Account resolved.", "data": enquiry(account)}, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    tags=["Wallet Management"],
+    summary="Batch name enquiry for many account numbers",
+    description=(
+        "Resolves up to 500 account numbers in one call. Numbers already cached cost no query; the rest are "
+        "read together in one. Unknown numbers are listed under `not_found`."
+    ),
+    request=AccountResolveSerializer,
+    responses={200: dict, 400: dict},
+)
+class AccountBatchResolveView(APIView):
+    permission_classes = [permissions.IsAuthenticated, CanTransact]
+
+    def post(self, request):
+        serializer = AccountResolveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        account_numbers = list(dict.fromkeys(serializer.validated_data["account_numbers"]))
+        found = resolver.resolve_many(account_numbers)
+        return Response(
+            {
+                "message": f"{len(found)} of {len(account_numbers)} accounts resolved.",
+                "data": [enquiry(found[number]) for number in account_numbers if number in found],
+                "not_found": [number for number in account_numbers if number not in found],
+            },
+            status=status.HTTP_200_OK,
+        )
+